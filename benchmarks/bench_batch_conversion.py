@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Benchmark: per-item conversion requests vs one batch conversion request
+
+Prices the same price table (every supported pair x a range of amounts
+spanning the low-amount and volume tiers) through
+GET /api/exchange-rates/convert/ once per item and through a single
+POST /api/exchange-rates/convert/batch/, using Django's in-process test
+client (no network). Also checks both paths return identical figures.
+
+Usage:
+    python benchmarks/bench_batch_conversion.py --amounts 200 --rounds 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fastestexchange_apis.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.test import Client  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from fastest_exchange.quidax_exchange_service import QuidaxExchangeRateService  # noqa: E402
+
+
+def build_items(amounts):
+    step = Decimal('20000') / amounts
+    values = [(step * i + Decimal('1')).quantize(Decimal('0.01')) for i in range(amounts)]
+    return [
+        {'from_currency': from_currency, 'to_currency': to_currency, 'amount': str(amount)}
+        for from_currency, to_currency in QuidaxExchangeRateService.FALLBACK_PAIRS
+        for amount in values
+    ]
+
+
+def per_item(client, items):
+    results = []
+    for item in items:
+        response = client.get('/api/exchange-rates/convert/', item)
+        body = response.json()
+        results.append((body['converted_amount'], body['exchange_rate']))
+    return results
+
+
+def batch(client, items):
+    response = client.post('/api/exchange-rates/convert/batch/', data=json.dumps({'items': items}),
+                           content_type='application/json')
+    body = response.json()
+    assert not body['errors'], body['errors']
+    return list(zip(body['converted_amount'], body['exchange_rate']))
+
+
+def timed(label, func, client, items, rounds):
+    samples = []
+    result = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = func(client, items)
+        samples.append(time.perf_counter() - started)
+    median = statistics.median(samples)
+    print(f"{label:<10} {median * 1000:9.1f}ms per table  "
+          f"({median / len(items) * 1e6:7.1f}us per item, best {min(samples) * 1000:.1f}ms)")
+    return result, median
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--amounts', type=int, default=100, help='Amounts per currency pair')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    items = build_items(args.amounts)
+    print(f"{len(items)} items ({len(QuidaxExchangeRateService.FALLBACK_PAIRS)} pairs x {args.amounts} amounts), "
+          f"median of {args.rounds} rounds\n")
+
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        client = Client()
+        batch(client, items)  # warm the rate snapshot for both paths
+
+        single_results, single_time = timed('per-item', per_item, client, items, args.rounds)
+        batch_results, batch_time = timed('batch', batch, client, items, args.rounds)
+
+    assert single_results == batch_results, 'batch and per-item results differ'
+    print(f"\nidentical results, batch is {single_time / batch_time:.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
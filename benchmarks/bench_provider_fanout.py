@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Benchmark: sequential vs hedged external rate provider lookups
+
+Starts three local stub providers (Fixer, ExchangeRate-API and
+CurrencyAPI formats) with a slow tail on the first provider and
+compares the latency distribution of the old sequential walk with
+the hedged upstream group of the shared rate pipeline
+(ExchangeRateService._fetch_external_rate).
+
+Usage:
+    python benchmarks/bench_provider_fanout.py --requests 100
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fastestexchange_apis.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from fastest_exchange.exchange_rate_service import ExchangeRateService  # noqa: E402
+from fastest_exchange.rate_pipeline import rate_pipeline  # noqa: E402
+from fastest_exchange.rate_providers import rate_providers  # noqa: E402
+from stub_servers import StubRateProvider  # noqa: E402
+
+
+STUBBED = ('fixer', 'exchangerate_api', 'currencyapi')
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, samples):
+    print(f"{label:<12} p50={percentile(samples, 50) * 1000:8.1f}ms "
+          f"p95={percentile(samples, 95) * 1000:8.1f}ms "
+          f"p99={percentile(samples, 99) * 1000:8.1f}ms "
+          f"max={max(samples) * 1000:8.1f}ms "
+          f"mean={statistics.mean(samples) * 1000:8.1f}ms")
+
+
+def sequential_lookup(from_currency, to_currency):
+    """The previous implementation: walk providers one by one with a 10s timeout"""
+    for name in STUBBED:
+        rate_info = rate_providers.get(name).fetch(from_currency, to_currency, timeout=10)
+        if rate_info:
+            return rate_info
+    return None
+
+
+def run(label, lookup, requests):
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        result = lookup('USD', 'NGN')
+        samples.append(time.perf_counter() - started)
+        assert result, f"{label}: no rate returned"
+    report(label, samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--slow-ratio', type=float, default=0.1,
+                        help='Fraction of first-provider requests that hit the slow tail')
+    parser.add_argument('--slow-latency', type=float, default=1.5)
+    parser.add_argument('--hedge-delay', type=float, default=rate_pipeline.hedge_delay)
+    args = parser.parse_args()
+
+    fixer = StubRateProvider(latency=0.04, slow_latency=args.slow_latency, slow_ratio=args.slow_ratio, seed=1).start()
+    exchangerate = StubRateProvider(latency=0.08, error_ratio=0.05, seed=2).start()
+    currencyapi = StubRateProvider(latency=0.12, seed=3).start()
+
+    urls = (f'{fixer.url}/api/latest', f'{exchangerate.url}/v6', f'{currencyapi.url}/v3/latest')
+    for provider in rate_providers:
+        # Only the stubbed plugins take part
+        provider.enabled = provider.name in STUBBED
+        if provider.name in STUBBED:
+            provider.url, provider.key = urls[STUBBED.index(provider.name)], 'stub'
+    rate_pipeline.hedge_delay = args.hedge_delay
+
+    print(f"{args.requests} lookups, first provider slow ({args.slow_latency}s) "
+          f"for {args.slow_ratio:.0%} of requests, hedge delay {args.hedge_delay}s\n")
+    try:
+        run('sequential', sequential_lookup, args.requests)
+        run('hedged', ExchangeRateService._fetch_external_rate, args.requests)
+    finally:
+        for stub in (fixer, exchangerate, currencyapi):
+            stub.stop()
+
+
+if __name__ == '__main__':
+    main()
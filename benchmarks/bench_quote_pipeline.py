@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark: cost of pricing one quote, float pipeline vs fixed-scale Decimal pipeline
+
+"before" replays the previous per-quote steps on a published rate: float
+margin/volume arithmetic, then float -> str -> Decimal -> quantize for the
+rate, Decimal multiply + quantize for the amount, and float() on the way
+out. "after" is RateEntry.price(), whose tier rates are already Decimals
+at the fixed pricing scale, so a quote is one bisect, one multiply and
+one quantize. Also times the full ExchangeRateService.calculate_conversion
+on a warm snapshot and counts quotes where the two pipelines disagree
+(float rounding at the 6th rate decimal).
+
+Usage:
+    python benchmarks/bench_quote_pipeline.py --quotes 20000 --rounds 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from bisect import bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fastestexchange_apis.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from fastest_exchange.exchange_rate_service import ExchangeRateService  # noqa: E402
+from fastest_exchange.pricing import pricing_rules  # noqa: E402
+from fastest_exchange.rate_snapshot import RateEntry  # noqa: E402
+
+RATE_INFO = {'pair': 'USD_NGN', 'rate': 1551.37, 'source': 'benchmark', 'timestamp': None,
+             'low_amount': 1549.5, 'low_amount_limit': 100.0}
+
+
+class FloatEntry:
+    """
+    The previous float pipeline: (threshold, multiplier, final rate) floats per tier
+    """
+
+    def __init__(self, rate_info, pricing):
+        self.info = dict(rate_info)
+        low_limit = Decimal(str(rate_info['low_amount_limit']))
+        self.breakpoints = tuple(sorted(set(pricing.breakpoints) | {low_limit}))
+        self.tiers = []
+        for lower in (Decimal('0'),) + self.breakpoints:
+            margin, factor, multiplier = pricing.at(lower)
+            base = rate_info['low_amount'] if lower < low_limit else rate_info['rate']
+            self.tiers.append((base, float(margin), float(multiplier), base * float(factor) * float(multiplier)))
+
+    def convert(self, amount):
+        base_rate, margin, multiplier, final_rate = self.tiers[bisect_right(self.breakpoints, amount)]
+        rate_info = dict(self.info)
+        rate_info.update({'original_rate': base_rate, 'margin_applied': margin,
+                          'volume_discount': 1 - multiplier, 'final_rate': final_rate, 'rate': final_rate})
+        conversion_rate = Decimal(str(rate_info['rate'])).quantize(Decimal('0.000001'), rounding=ROUND_HALF_UP)
+        converted_amount = (amount * conversion_rate).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return float(converted_amount), float(conversion_rate)
+
+
+def fixed_scale(entry, amount):
+    rate_info, conversion_rate, converted_amount = entry.price(amount)
+    return float(converted_amount), float(conversion_rate)
+
+
+def timed(label, func, amounts, rounds):
+    samples = []
+    results = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        results = [func(amount) for amount in amounts]
+        samples.append(time.perf_counter() - started)
+    median = statistics.median(samples)
+    print(f"{label:<28} {median / len(amounts) * 1e6:6.2f}us per quote (best {min(samples) / len(amounts) * 1e6:.2f}us)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quotes', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    amounts = [Decimal(rng.randrange(1, 2_000_000)) / 100 for _ in range(args.quotes)]
+    pricing = pricing_rules.for_pair('USD', 'NGN')
+    float_entry = FloatEntry(RATE_INFO, pricing)
+    entry = RateEntry(RATE_INFO, pricing, ttl=3600)
+
+    print(f"{args.quotes} quotes, median of {args.rounds} rounds\n")
+    before = timed('before: float pipeline', float_entry.convert, amounts, args.rounds)
+    after = timed('after: fixed-scale Decimal', lambda amount: fixed_scale(entry, amount), amounts, args.rounds)
+
+    ExchangeRateService.snapshot.publish(RATE_INFO, 3600, pricing)
+    timed('calculate_conversion (warm)',
+          lambda amount: ExchangeRateService.calculate_conversion('USD', 'NGN', amount), amounts, args.rounds)
+
+    differing = sum(1 for b, a in zip(before, after) if b != a)
+    print(f"\n{differing} of {len(amounts)} quotes differ between the pipelines (float rounding)")
+
+
+if __name__ == '__main__':
+    main()
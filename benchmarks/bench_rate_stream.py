@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark: fan-out of one rate change to many idle SSE connections
+
+Opens --connections in-process ASGI streams on the rate stream path (no
+network, the ASGI send callable records the chunks), then publishes rate
+changes to the Quidax snapshot from another thread, as a request or the
+update command would, and times until every connection has received
+each change. Also reports the memory held per idle connection.
+
+Usage:
+    python benchmarks/bench_rate_stream.py --connections 5000 --updates 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fastestexchange_apis.settings')
+
+from fastestexchange_apis.asgi import application  # noqa: E402  (sets Django up)
+from fastest_exchange.pricing import pricing_rules  # noqa: E402
+from fastest_exchange.quidax_exchange_service import QuidaxExchangeRateService  # noqa: E402
+
+
+def publish(rate):
+    QuidaxExchangeRateService.snapshot.publish(
+        {'pair': 'USD_NGN', 'rate': rate, 'source': 'benchmark', 'timestamp': None},
+        3600, pricing_rules.for_pair('USD', 'NGN'))
+
+
+async def connection(received, closed):
+    async def receive():
+        await closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            received.append(message['body'])
+
+    scope = {'type': 'http', 'method': 'GET', 'path': '/api/exchange-rates/stream/',
+             'query_string': b'pairs=USD_NGN', 'headers': []}
+    await application(scope, receive, send)
+
+
+async def run(connections, updates):
+    closed = asyncio.Event()
+    inboxes = [[] for _ in range(connections)]
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [asyncio.create_task(connection(inbox, closed)) for inbox in inboxes]
+    while any(len(inbox) < 2 for inbox in inboxes):
+        await asyncio.sleep(0.01)
+    per_connection = (tracemalloc.get_traced_memory()[0] - before) / connections
+    tracemalloc.stop()
+
+    samples = []
+    for update in range(updates):
+        marker = f'"exchange_rate":{1501.0 + update}'.encode()
+        started = time.perf_counter()
+        threading.Thread(target=publish, args=(1501.0 + update,)).start()
+        while not all(inbox and marker in inbox[-1] for inbox in inboxes):
+            await asyncio.sleep(0.001)
+        samples.append(time.perf_counter() - started)
+
+    closed.set()
+    await asyncio.gather(*tasks)
+    print(f"{connections} idle connections, ~{per_connection / 1024:.1f} KiB each")
+    print(f"one change to all connections: median {statistics.median(samples) * 1000:.1f}ms "
+          f"(best {min(samples) * 1000:.1f}ms) over {updates} updates")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, default=5000)
+    parser.add_argument('--updates', type=int, default=5)
+    args = parser.parse_args()
+    # Published up front so connections start primed
+    publish(1500.0)
+    asyncio.run(run(args.connections, args.updates))
+
+
+if __name__ == '__main__':
+    main()
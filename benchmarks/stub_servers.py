@@ -0,0 +1,170 @@
+"""
+Local stand-in HTTP servers for benchmarks and manual testing
+
+StubRateProvider answers in the Fixer, ExchangeRate-API and CurrencyAPI
+response formats with a configurable latency profile, so the provider
+fan-out can be exercised without network access or paid API keys.
+
+StubQuidaxTicker imitates the Quidax market endpoints with a price that
+random-walks on every request, for running the ticker ingestion worker:
+
+    python benchmarks/stub_servers.py quidax --port 8765
+    python manage.py ingest_quidax_tickers --base-url http://127.0.0.1:8765
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Rates relative to USD used by every stub
+USD_RATES = {'USD': 1.0, 'NGN': 1550.0, 'UGX': 3700.0, 'EUR': 0.92}
+
+
+def cross_rates(base):
+    base_value = USD_RATES[base]
+    return {symbol: value / base_value for symbol, value in USD_RATES.items()}
+
+
+class StubRateProvider:
+    """
+    Threaded HTTP server imitating one rate provider
+
+    Args:
+        latency: Typical response latency in seconds
+        slow_latency: Latency used for the slow tail
+        slow_ratio: Fraction of requests served with slow_latency
+        error_ratio: Fraction of requests answered with HTTP 500
+        port: Port to listen on (0 picks a free one)
+    """
+
+    def __init__(self, latency=0.05, slow_latency=2.0, slow_ratio=0.0, error_ratio=0.0, seed=None, port=0):
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.slow_ratio = slow_ratio
+        self.error_ratio = error_ratio
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.requests += 1
+                slow = stub.random.random() < stub.slow_ratio
+                fail = stub.random.random() < stub.error_ratio
+                time.sleep(stub.slow_latency if slow else stub.latency)
+
+                if fail:
+                    self._send(500, {'error': 'stub failure'})
+                    return
+                self._send(200, stub.payload(self.path))
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def payload(self, path):
+        parsed = urlparse(path)
+        params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+
+        # ExchangeRate-API: /<key>/latest/<BASE>
+        if '/latest/' in parsed.path:
+            base = parsed.path.rsplit('/', 1)[-1]
+            return {'result': 'success', 'base_code': base, 'conversion_rates': cross_rates(base)}
+
+        # CurrencyAPI: ?base_currency=&currencies=
+        if 'base_currency' in params:
+            rates = cross_rates(params['base_currency'])
+            wanted = params.get('currencies', '').split(',') if params.get('currencies') else rates
+            return {'data': {code: {'code': code, 'value': rates[code]} for code in wanted if code in rates}}
+
+        # Fixer: ?base=&symbols=
+        rates = cross_rates(params.get('base', 'EUR'))
+        if params.get('symbols'):
+            rates = {code: rates[code] for code in params['symbols'].split(',') if code in rates}
+        return {'success': True, 'base': params.get('base', 'EUR'), 'rates': rates}
+
+
+class StubQuidaxTicker(StubRateProvider):
+    """
+    Quidax market endpoints (/markets and /markets/<market>/tickers)
+
+    Args:
+        prices: Starting last_price per market
+        drift: Maximum relative price move per request
+    """
+
+    def __init__(self, prices=None, drift=0.001, latency=0.02, error_ratio=0.0, seed=None, port=0):
+        super().__init__(latency=latency, error_ratio=error_ratio, seed=seed, port=port)
+        self.prices = dict(prices or {'USDTNGN': USD_RATES['NGN']})
+        self.drift = drift
+        self.lock = threading.Lock()
+
+    def payload(self, path):
+        parts = urlparse(path).path.strip('/').split('/')
+        if parts[-1] == 'markets':
+            return {'status': 'success', 'data': [{'id': market.lower(), 'name': market} for market in self.prices]}
+
+        market = parts[-2].upper() if len(parts) >= 2 else ''
+        with self.lock:
+            if market not in self.prices:
+                return {'status': 'error', 'message': f'Unknown market {market}'}
+            price = self.prices[market] * (1 + self.random.uniform(-self.drift, self.drift))
+            self.prices[market] = price
+        return {
+            'status': 'success',
+            'data': {
+                'market': market.lower(),
+                'last_price': f"{price:.2f}",
+                'at': int(time.time()),
+            }
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a stand-in server in the foreground')
+    parser.add_argument('kind', choices=['rates', 'quidax'])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    stub_class = StubQuidaxTicker if args.kind == 'quidax' else StubRateProvider
+    stub = stub_class(latency=args.latency, port=args.port)
+    print(f"Serving {args.kind} stub on {stub.url} (Ctrl+C to stop)")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from .models import (
@@ -15,6 +16,7 @@ from .models import (
     CreatePassword,
     CreatePin,
     ExchangeRate,
+    PricingRule,
     Login,
     TransactionHistory,
     TransactionDownload,
@@ -26,6 +28,7 @@ from .models import (
     
     # Transaction Engine models
     Transaction,
+    TransactionStats,
     TransactionStatusHistory,
 )
 
@@ -96,8 +99,38 @@ class TransactionHistoryAdmin(admin.ModelAdmin):
 
 @admin.register(ExchangeRate)
 class ExchangeRateAdmin(admin.ModelAdmin):
-    list_display = ['currency_from', 'currency_to', 'rate', 'low_amount', 'low_amount_limit']
+    list_display = ['currency_from', 'currency_to', 'rate', 'low_amount', 'low_amount_limit', 'created_at']
+    list_filter = ['currency_from', 'currency_to']
     search_fields = ['currency_from', 'currency_to']
+    ordering = ['-created_at']
+    fields = ['currency_from', 'currency_to', 'rate', 'low_amount', 'low_amount_limit', 'created_at']
+    readonly_fields = ['created_at']
+
+    def save_model(self, request, obj, form, change):
+        # Append a new tick through the rate pipeline: moves the pair's latest
+        # pointer, folds the candles and drops the cached rate everywhere
+        from .exchange_rate_service import ExchangeRateService
+
+        tick = ExchangeRateService.update_exchange_rate(
+            obj.currency_from, obj.currency_to, obj.rate, obj.low_amount, obj.low_amount_limit
+        )
+        obj.pk = tick.pk
+        obj.created_at = tick.created_at
+
+    # Ticks are append-only history: recorded ticks can be viewed but not changed or deleted
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(PricingRule)
+class PricingRuleAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'currency_from', 'currency_to', 'min_amount', 'value', 'is_active', 'updated_at']
+    list_filter = ['kind', 'is_active']
+    list_editable = ['value', 'is_active']
+    search_fields = ['currency_from', 'currency_to']
+
 
 @admin.register(TransactionDownload)
 class TransactionDownloadAdmin(admin.ModelAdmin):
@@ -253,10 +286,11 @@ class TransactionAdmin(admin.ModelAdmin):
     user_email.admin_order_field = 'user__email'
     
     def mark_as_completed(self, request, queryset):
-        from django.utils import timezone
+        now = timezone.now()
         updated = queryset.update(
             status='COMPLETED',
-            completed_at=timezone.now()
+            completed_at=now,
+            updated_at=now
         )
         # Create status history for each transaction
         for transaction in queryset:
@@ -267,11 +301,12 @@ class TransactionAdmin(admin.ModelAdmin):
                 changed_by=request.user,
                 reason='Bulk action by admin'
             )
+        self.rebuild_stats(queryset)
         self.message_user(request, f'{updated} transaction(s) marked as completed.')
     mark_as_completed.short_description = 'Mark selected transactions as completed'
     
     def mark_as_failed(self, request, queryset):
-        updated = queryset.update(status='FAILED')
+        updated = queryset.update(status='FAILED', updated_at=timezone.now())
         for transaction in queryset:
             TransactionStatusHistory.objects.create(
                 transaction=transaction,
@@ -280,11 +315,12 @@ class TransactionAdmin(admin.ModelAdmin):
                 changed_by=request.user,
                 reason='Bulk action by admin'
             )
+        self.rebuild_stats(queryset)
         self.message_user(request, f'{updated} transaction(s) marked as failed.')
     mark_as_failed.short_description = 'Mark selected transactions as failed'
     
     def mark_as_pending(self, request, queryset):
-        updated = queryset.update(status='PENDING')
+        updated = queryset.update(status='PENDING', updated_at=timezone.now())
         for transaction in queryset:
             TransactionStatusHistory.objects.create(
                 transaction=transaction,
@@ -293,8 +329,13 @@ class TransactionAdmin(admin.ModelAdmin):
                 changed_by=request.user,
                 reason='Bulk action by admin'
             )
+        self.rebuild_stats(queryset)
         self.message_user(request, f'{updated} transaction(s) marked as pending.')
     mark_as_pending.short_description = 'Mark selected transactions as pending'
+    
+    def rebuild_stats(self, queryset):
+        # Bulk updates bypass the signals that keep TransactionStats current
+        TransactionStats.objects.rebuild(set(queryset.values_list('user_id', flat=True)))
 
 @admin.register(TransactionStatusHistory)
 class TransactionStatusHistoryAdmin(admin.ModelAdmin):
@@ -1,4 +1,21 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+
+# Programs whose workers serve requests and should warm up at start
+SERVER_PROGRAMS = ('gunicorn', 'uvicorn', 'daphne', 'hypercorn', 'uwsgi')
+
+
+def is_server_process() -> bool:
+    """
+    Whether this process serves requests (not a management command, test run or script)
+    """
+    program = sys.argv[0] if sys.argv else ''
+    if os.path.basename(program) in ('manage.py', 'django-admin'):
+        return sys.argv[1:2] == ['runserver']
+    return any(name in program for name in SERVER_PROGRAMS)
 
 
 class FastestExchangeConfig(AppConfig):
@@ -7,4 +24,9 @@ class FastestExchangeConfig(AppConfig):
 
     def ready(self) -> None:
         import fastest_exchange.signals
+
+        # Load shared and stored rates before the first request (readiness: /api/health/ready/)
+        if getattr(settings, 'RATE_WARMUP_ON_START', True) and is_server_process():
+            from .rate_pipeline import rate_pipeline
+            rate_pipeline.start_warm_up()
         return super().ready()
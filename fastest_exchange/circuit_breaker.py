@@ -0,0 +1,291 @@
+"""
+Upstream Circuit Breakers
+
+Tracks the recent error rate and latency of every external rate provider
+(Fixer, ExchangeRate-API, CurrencyAPI, Quidax) and stops calling one
+that keeps failing:
+
+- closed:    calls pass through; outcomes are recorded in a sliding window
+- open:      calls fail fast with CircuitOpenError until reset_timeout elapses
+- half_open: a limited number of probe calls are let through; a success
+             closes the circuit again, a failure re-opens it
+
+Every admitted call is tagged with how it was admitted (normal or probe,
+and in which open period), so only the result of a current probe moves
+a half-open circuit. A call admitted while closed that finishes after
+the circuit tripped is recorded but cannot close it.
+
+Providers are ordered by a health score derived from error rate and p95
+latency (only latency above the budget counts against a provider), so
+the fan-out tries the healthiest upstream first. State is kept per
+process.
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# How a call was admitted
+NORMAL = 'normal'
+PROBE = 'probe'
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a provider whose circuit is open
+    """
+
+    def __init__(self, name: str, retry_in: float):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(f"Circuit for {name} is open; retry in {retry_in:.1f}s")
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker and health tracker for one upstream provider
+
+    Args:
+        name: Provider name
+        window: Number of recent calls used for error rate and latency
+        window_seconds: Age in seconds after which a recorded call is forgotten
+        min_calls: Calls required in the window before the error rate can trip it
+        error_rate_threshold: Error rate (0-1) that opens the circuit
+        consecutive_failures: Back-to-back failures that open the circuit
+        reset_timeout: Seconds the circuit stays open before probing
+        half_open_max_calls: Concurrent probe calls allowed while half-open
+        latency_budget: p95 latency in seconds above which the health score drops
+    """
+
+    def __init__(self, name: str, window: int = 20, window_seconds: float = 300, min_calls: int = 5,
+                 error_rate_threshold: float = 0.5, consecutive_failures: int = 3,
+                 reset_timeout: float = 30, half_open_max_calls: int = 1,
+                 latency_budget: float = 1.0):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.consecutive_failure_threshold = consecutive_failures
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.latency_budget = latency_budget
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)  # (ok, latency seconds, recorded at)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._consecutive_failures = 0
+        self._probes = 0
+        # Bumped whenever the circuit opens or resets; probes of older periods are stale
+        self._generation = 0
+        self._total_calls = 0
+        self._total_failures = 0
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def available(self) -> bool:
+        """
+        Whether a call would currently be let through (does not reserve a probe)
+        """
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and self._probes < self.half_open_max_calls)
+
+    def call(self, func: Callable[[], Any], is_success: Callable[[Any], bool] = lambda result: True) -> Any:
+        """
+        Run func through the breaker and record its outcome
+
+        Raises:
+            CircuitOpenError: If the circuit is open or no probe slot is free
+        """
+        admission = self._admit()
+        started = time.monotonic()
+        try:
+            result = func()
+        except Exception:
+            self._record(False, time.monotonic() - started, admission)
+            raise
+        self._record(bool(is_success(result)), time.monotonic() - started, admission)
+        return result
+
+    def error_rate(self) -> float:
+        with self._lock:
+            return self._error_rate()
+
+    def p95_latency(self) -> float:
+        with self._lock:
+            return self._p95_latency()
+
+    def health_score(self) -> float:
+        """
+        0 for an open circuit, otherwise success rate discounted by p95 latency
+        """
+        with self._lock:
+            return self._health_score(self._current_state())
+
+    def reset(self):
+        with self._lock:
+            self._outcomes.clear()
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._probes = 0
+            self._generation += 1
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            state = self._current_state()
+            retry_in = max(0.0, self._opened_at + self.reset_timeout - time.monotonic()) if state == OPEN else 0.0
+            return {
+                'name': self.name,
+                'state': state,
+                'health_score': round(self._health_score(state), 4),
+                'error_rate': round(self._error_rate(), 4),
+                'p95_latency_ms': round(self._p95_latency() * 1000, 1),
+                'window_calls': len(self._recent()),
+                'consecutive_failures': self._consecutive_failures,
+                'total_calls': self._total_calls,
+                'total_failures': self._total_failures,
+                'rejected_calls': self._rejected,
+                'retry_in_seconds': round(retry_in, 1),
+            }
+
+    def _admit(self) -> Tuple[str, int]:
+        """
+        Reserve a slot for a call; returns how it was admitted (NORMAL or PROBE, generation)
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return NORMAL, self._generation
+            if state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return PROBE, self._generation
+            self._rejected += 1
+            retry_in = max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+        raise CircuitOpenError(self.name, retry_in)
+
+    def _record(self, ok: bool, latency: float, admission: Tuple[str, int]):
+        with self._lock:
+            self._outcomes.append((ok, latency, time.monotonic()))
+            self._total_calls += 1
+            kind, generation = admission
+            # Only a probe of the current half-open period may close or re-open the circuit
+            probe = kind == PROBE and generation == self._generation and self._state == HALF_OPEN
+            if probe:
+                self._probes -= 1
+
+            if ok:
+                self._consecutive_failures = 0
+                if probe:
+                    logger.info(f"Circuit for {self.name} closed after successful probe")
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    self._outcomes.append((ok, latency, time.monotonic()))
+                return
+
+            self._total_failures += 1
+            self._consecutive_failures += 1
+            if probe:
+                self._trip('probe failed')
+            elif self._state == CLOSED:
+                if self._consecutive_failures >= self.consecutive_failure_threshold:
+                    self._trip(f"{self._consecutive_failures} consecutive failures")
+                elif len(self._recent()) >= self.min_calls and self._error_rate() >= self.error_rate_threshold:
+                    self._trip(f"error rate {self._error_rate():.0%}")
+
+    def _trip(self, reason: str):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._generation += 1
+        logger.warning(f"Circuit for {self.name} opened ({reason}); "
+                       f"skipping it for {self.reset_timeout}s")
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def _health_score(self, state: str) -> float:
+        if state == OPEN:
+            return 0.0
+        p95 = self._p95_latency()
+        score = 1 - self._error_rate()
+        if p95 > self.latency_budget:
+            score *= self.latency_budget / p95
+        return score / 2 if state == HALF_OPEN else score
+
+    def _recent(self):
+        cutoff = time.monotonic() - self.window_seconds
+        while self._outcomes and self._outcomes[0][2] < cutoff:
+            self._outcomes.popleft()
+        return self._outcomes
+
+    def _error_rate(self) -> float:
+        outcomes = self._recent()
+        if not outcomes:
+            return 0.0
+        return sum(1 for ok, _, _ in outcomes if not ok) / len(outcomes)
+
+    def _p95_latency(self) -> float:
+        outcomes = self._recent()
+        if not outcomes:
+            return 0.0
+        latencies = sorted(latency for _, latency, _ in outcomes)
+        return latencies[min(len(latencies) - 1, math.ceil(0.95 * len(latencies)) - 1)]
+
+
+class CircuitBreakerRegistry:
+    """
+    Lazily created breakers keyed by provider name
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    breaker = self._breakers[name] = CircuitBreaker(
+                        name,
+                        window=getattr(settings, 'PROVIDER_BREAKER_WINDOW', 20),
+                        window_seconds=getattr(settings, 'PROVIDER_BREAKER_WINDOW_SECONDS', 300),
+                        min_calls=getattr(settings, 'PROVIDER_BREAKER_MIN_CALLS', 5),
+                        error_rate_threshold=getattr(settings, 'PROVIDER_BREAKER_ERROR_RATE', 0.5),
+                        consecutive_failures=getattr(settings, 'PROVIDER_BREAKER_CONSECUTIVE_FAILURES', 3),
+                        reset_timeout=getattr(settings, 'PROVIDER_BREAKER_RESET_TIMEOUT', 30),
+                        latency_budget=getattr(settings, 'PROVIDER_BREAKER_LATENCY_BUDGET', 1.0),
+                    )
+        return breaker
+
+    def ordered(self, names: Iterable[str]) -> List[str]:
+        """
+        Names whose circuit admits calls, healthiest first (ties keep the given order)
+        """
+        candidates = [name for name in names if self.get(name).available()]
+        return sorted(candidates, key=lambda name: -self.get(name).health_score())
+
+    def as_list(self) -> List[Dict]:
+        return [breaker.as_dict() for _, breaker in sorted(self._breakers.items())]
+
+
+# Shared breakers for every outbound rate provider
+provider_breakers = CircuitBreakerRegistry()
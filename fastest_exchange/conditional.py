@@ -0,0 +1,90 @@
+"""
+Conditional GET Support
+
+Read endpoints compute validators (an ETag and/or a Last-Modified time)
+from a cheap version stamp: a rate snapshot entry, a row count or a
+MAX(updated_at). A request whose If-None-Match / If-Modified-Since still
+matches is answered 304 Not Modified before the view runs, so nothing is
+queried in full or serialized. Successful responses carry the validators
+and their Cache-Control policy.
+
+Function views use the conditional_get decorator (below @api_view, so
+DRF authentication and permissions run first); generic class-based views
+use ConditionalGetMixin.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Optional, Tuple
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+Validators = Tuple[Optional[str], Optional[datetime]]
+
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag of a version stamp
+    """
+    return f'"{hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()}"'
+
+
+def _respond(request, validators: Validators, view: Callable, cache_control: dict, vary=None):
+    etag, last_modified = validators if request.method in ('GET', 'HEAD') else (None, None)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+
+    response = None
+    if etag or timestamp:
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = view()
+        if not 200 <= response.status_code < 300:
+            # Errors are neither validated nor cached
+            return response
+
+    if etag:
+        response.headers['ETag'] = etag
+    if timestamp:
+        response.headers['Last-Modified'] = http_date(timestamp)
+    patch_cache_control(response, **cache_control)
+    if vary:
+        patch_vary_headers(response, vary)
+    return response
+
+
+def conditional_get(validators: Callable[..., Validators], vary=None, **cache_control):
+    """
+    Decorate a DRF function view with validators(request, *args, **kwargs) -> (etag, last_modified)
+
+    Either validator may be None; the view runs normally when both are.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return _respond(
+                request, validators(request, *args, **kwargs),
+                lambda: view(request, *args, **kwargs), cache_control, vary
+            )
+        return wrapper
+    return decorator
+
+
+class ConditionalGetMixin:
+    """
+    Conditional GET for generic views; subclasses implement get_validators()
+    """
+
+    # Per-user data: cacheable by the client only, always revalidated
+    cache_control = {'private': True, 'no_cache': True}
+    vary_headers = ('Authorization',)
+
+    def get_validators(self, request, *args, **kwargs) -> Validators:
+        return None, None
+
+    def get(self, request, *args, **kwargs):
+        return _respond(
+            request, self.get_validators(request, *args, **kwargs),
+            lambda: super(ConditionalGetMixin, self).get(request, *args, **kwargs),
+            self.cache_control, self.vary_headers
+        )
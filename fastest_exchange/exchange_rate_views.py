@@ -10,18 +10,65 @@ from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
 from django.utils import timezone
+from datetime import timedelta
 from decimal import Decimal, InvalidOperation
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.openapi import OpenApiTypes
 
-from .models import ExchangeRate, Currency
+from .models import ExchangeRate, Currency, LatestExchangeRate, RateCandle
 from .quidax_exchange_service import QuidaxExchangeRateService
+from .circuit_breaker import provider_breakers
+from .conditional import conditional_get, make_etag
+from .http_client import http_client
+from .quote_tokens import issue_quote
+from .rate_pipeline import rate_pipeline
+from .rate_providers import rate_providers
+from .pricing import DEFAULT_MARGINS, pricing_rules
 from .serializers import ExchangeRateSerializer, ExchangeRateUpdateSerializer
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on items priced by one batch conversion request
+BATCH_CONVERSION_MAX_ITEMS = getattr(settings, 'EXCHANGE_BATCH_CONVERSION_MAX_ITEMS', 1000)
+# Upper bound on candles or raw ticks returned by one history request
+RATE_HISTORY_MAX_POINTS = getattr(settings, 'EXCHANGE_RATE_HISTORY_MAX_POINTS', 1000)
+# Cache-Control max-age of the public rate and market routes (clients and CDNs)
+RATE_HTTP_MAX_AGE = getattr(settings, 'EXCHANGE_RATE_HTTP_MAX_AGE', 5)
+PAIRS_HTTP_MAX_AGE = getattr(settings, 'EXCHANGE_PAIRS_HTTP_MAX_AGE', 300)
+MARKETS_HTTP_MAX_AGE = getattr(settings, 'QUIDAX_MARKETS_HTTP_MAX_AGE', 60)
+
+
+def _rate_validators(request):
+    """
+    ETag of the published snapshot entry of the requested pair
+    """
+    from_currency = request.query_params.get('from_currency', '').upper()
+    to_currency = request.query_params.get('to_currency', '').upper()
+    if not from_currency or not to_currency or from_currency == to_currency:
+        return None, None
+    entry = QuidaxExchangeRateService._get_rate_entry(from_currency, to_currency)
+    return (entry.etag if entry is not None else None), None
+
+
+def _pairs_validators(request):
+    """
+    ETag of the in-memory supported pairs registry
+    """
+    return QuidaxExchangeRateService.pair_registry.etag, None
+
+
+def _markets_validators(request):
+    """
+    ETag of the cached Quidax market list
+    """
+    markets = QuidaxExchangeRateService.get_quidax_markets()
+    if 'error' in markets:
+        return None, None
+    return make_etag('markets', markets['timestamp']), None
+
 
 @extend_schema(
     tags=['Exchange Rate Management'],
@@ -35,6 +82,7 @@ logger = logging.getLogger(__name__)
 )
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@conditional_get(_rate_validators, public=True, max_age=RATE_HTTP_MAX_AGE)
 def get_exchange_rate(request):
     """
     Get current exchange rate for a currency pair
@@ -87,7 +135,7 @@ def get_exchange_rate(request):
 @extend_schema(
     tags=['Exchange Rate Management'],
     summary='Calculate currency conversion',
-    description='Calculate complete currency conversion with detailed breakdown',
+    description='Calculate complete currency conversion with detailed breakdown. Signed-in users also get a quote_token to execute the swap at this price',
     parameters=[
         OpenApiParameter('from_currency', OpenApiTypes.STR, description='Source currency code'),
         OpenApiParameter('to_currency', OpenApiTypes.STR, description='Target currency code'),
@@ -117,15 +165,21 @@ def calculate_conversion(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
+        priced = QuidaxExchangeRateService.price_conversion(from_currency, to_currency, amount)
         conversion_result = QuidaxExchangeRateService.calculate_conversion(
             from_currency=from_currency,
             to_currency=to_currency,
-            amount=amount
+            amount=amount,
+            priced=priced
         )
         
         if 'error' in conversion_result:
             return Response(conversion_result, status=status.HTTP_404_NOT_FOUND)
         
+        # Signed quote the user can pass to the swap endpoint to execute at this price
+        if request.user.is_authenticated:
+            conversion_result.update(issue_quote(request.user.pk, from_currency, to_currency, amount, priced))
+        
         return Response(conversion_result, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -135,6 +189,73 @@ def calculate_conversion(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@extend_schema(
+    tags=['Exchange Rate Management'],
+    summary='Calculate many currency conversions',
+    description=(
+        'Price a batch of (pair, amount) items in one request. Body: '
+        '{"items": [{"from_currency": "USD", "to_currency": "NGN", "amount": "100"}, ...]} '
+        '(or "pair": "USD_NGN" per item). The response is columnar: one array per field, '
+        'aligned with the input, plus per-pair rate info and per-index errors.'
+    ),
+    request=OpenApiTypes.OBJECT,
+    responses={200: OpenApiTypes.OBJECT}
+)
+@api_view(['POST'])
+@permission_classes([permissions.AllowAny])
+def calculate_conversion_batch(request):
+    """
+    Calculate many currency conversions in one pass
+    """
+    items = request.data.get('items') if isinstance(request.data, dict) else None
+    if not isinstance(items, list) or not items:
+        return Response({
+            'error': 'items must be a non-empty list'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if len(items) > BATCH_CONVERSION_MAX_ITEMS:
+        return Response({
+            'error': f'At most {BATCH_CONVERSION_MAX_ITEMS} items are allowed per request'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    parsed = []
+    invalid = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            invalid[index] = 'Item must be an object'
+            parsed.append(('', '', Decimal('0')))
+            continue
+        
+        if item.get('pair'):
+            from_currency, _, to_currency = str(item['pair']).upper().partition('_')
+        else:
+            from_currency = str(item.get('from_currency', '')).upper()
+            to_currency = str(item.get('to_currency', '')).upper()
+        
+        try:
+            amount = Decimal(str(item.get('amount')))
+            if not amount.is_finite() or amount < 0:
+                raise InvalidOperation
+        except (InvalidOperation, ValueError):
+            invalid[index] = 'Invalid amount format'
+            amount = Decimal('0')
+        
+        if not from_currency or not to_currency:
+            invalid[index] = 'from_currency and to_currency (or pair) are required'
+        parsed.append((from_currency, to_currency, amount))
+    
+    try:
+        result = QuidaxExchangeRateService.calculate_conversions(parsed, errors=invalid)
+        
+        return Response(result, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        logger.error(f"Error calculating batch conversion: {e}")
+        return Response({
+            'error': 'Internal server error'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @extend_schema(
     tags=['Exchange Rate Management'],
     summary='Get supported currency pairs',
@@ -142,6 +263,7 @@ def calculate_conversion(request):
 )
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@conditional_get(_pairs_validators, public=True, max_age=PAIRS_HTTP_MAX_AGE)
 def get_supported_pairs(request):
     """
     Get list of supported currency pairs
@@ -214,23 +336,28 @@ class ExchangeRateManagementView(APIView):
     description='Get list of all configured exchange rates (Admin only)'
 )
 class ExchangeRateListView(generics.ListAPIView):
-    """List all configured exchange rates"""
+    """List the current rate of every configured pair (newest tick per pair)"""
     
     serializer_class = ExchangeRateSerializer
     permission_classes = [permissions.IsAdminUser]
     
     def get_queryset(self):
-        return ExchangeRate.objects.all().order_by('-created_at')
+        return ExchangeRate.objects.filter(
+            pk__in=LatestExchangeRate.objects.values('tick_id')
+        ).order_by('-created_at')
 
 
 @extend_schema(
     tags=['Exchange Rate Management'],
     summary='Get exchange rate history',
-    description='Get historical exchange rates for a currency pair',
+    description='Get historical exchange rates for a currency pair as OHLC candles '
+                '(1m, 1h or 1d) or, with resolution=raw, as the most recent raw ticks',
     parameters=[
         OpenApiParameter('from_currency', OpenApiTypes.STR, description='Source currency code'),
         OpenApiParameter('to_currency', OpenApiTypes.STR, description='Target currency code'),
-        OpenApiParameter('days', OpenApiTypes.INT, description='Number of days to look back (default: 7)')
+        OpenApiParameter('days', OpenApiTypes.INT, description='Number of days to look back (default: 7)'),
+        OpenApiParameter('resolution', OpenApiTypes.STR,
+                         description='1m, 1h, 1d, raw or auto (default: finest candles within the point limit)')
     ]
 )
 @api_view(['GET'])
@@ -238,43 +365,98 @@ class ExchangeRateListView(generics.ListAPIView):
 def get_rate_history(request):
     """
     Get historical exchange rates for a currency pair
+
+    Candles are read from the RateCandle rollups, so a 90 day chart is
+    90 daily rows however many ticks were stored.
     """
     from_currency = request.query_params.get('from_currency', '').upper()
     to_currency = request.query_params.get('to_currency', '').upper()
-    days = int(request.query_params.get('days', 7))
-    
+    resolution = request.query_params.get('resolution', 'auto').lower()
+
     if not from_currency or not to_currency:
         return Response({
             'error': 'Both from_currency and to_currency parameters are required'
         }, status=status.HTTP_400_BAD_REQUEST)
-    
-    from datetime import timedelta
-    cutoff_date = timezone.now() - timedelta(days=days)
-    
+
     try:
-        rates = ExchangeRate.objects.filter(
-            currency_from=from_currency,
-            currency_to=to_currency,
-            created_at__gte=cutoff_date
-        ).order_by('-created_at')
-        
-        rate_history = []
-        for rate in rates:
-            rate_history.append({
-                'rate': str(rate.rate),
-                'low_amount': str(rate.low_amount) if rate.low_amount else None,
-                'low_amount_limit': str(rate.low_amount_limit) if rate.low_amount_limit else None,
-                'created_at': rate.created_at
-            })
-        
+        days = int(request.query_params.get('days', 7))
+    except ValueError:
+        days = 0
+    if days <= 0:
+        return Response({
+            'error': 'days must be a positive integer'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    window = timedelta(days=days)
+    if resolution == 'auto':
+        # Finest resolution whose bucket count over the window fits the limit
+        resolution = next(
+            (r for r, size in RateCandle.BUCKET_SIZES.items() if window / size <= RATE_HISTORY_MAX_POINTS),
+            RateCandle.Resolution.DAY
+        )
+    elif resolution != 'raw' and resolution not in RateCandle.Resolution.values:
+        return Response({
+            'error': f"resolution must be one of: {', '.join(RateCandle.Resolution.values)}, raw, auto"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    elif resolution != 'raw' and window / RateCandle.BUCKET_SIZES[resolution] > RATE_HISTORY_MAX_POINTS:
+        return Response({
+            'error': f'{days} days at {resolution} exceeds {RATE_HISTORY_MAX_POINTS} points, '
+                     f'use a coarser resolution or fewer days'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    cutoff_date = timezone.now() - window
+
+    try:
+        if resolution == 'raw':
+            # Newest ticks only; long ranges should be read as candles
+            rates = ExchangeRate.objects.filter(
+                currency_from=from_currency,
+                currency_to=to_currency,
+                created_at__gte=cutoff_date
+            ).order_by('-created_at')[:RATE_HISTORY_MAX_POINTS]
+
+            rate_history = []
+            for rate in rates:
+                rate_history.append({
+                    'rate': str(rate.rate),
+                    'low_amount': str(rate.low_amount) if rate.low_amount else None,
+                    'low_amount_limit': str(rate.low_amount_limit) if rate.low_amount_limit else None,
+                    'created_at': rate.created_at
+                })
+
+            return Response({
+                'from_currency': from_currency,
+                'to_currency': to_currency,
+                'history_days': days,
+                'resolution': resolution,
+                'rate_history': rate_history,
+                'total_records': len(rate_history),
+                'truncated': len(rate_history) == RATE_HISTORY_MAX_POINTS
+            }, status=status.HTTP_200_OK)
+
+        candles = [
+            {
+                'time': candle['bucket_start'],
+                'open': str(candle['open']),
+                'high': str(candle['high']),
+                'low': str(candle['low']),
+                'close': str(candle['close']),
+                'ticks': candle['tick_count'],
+            }
+            for candle in RateCandle.objects.series(
+                from_currency, to_currency, resolution, cutoff_date
+            ).values('bucket_start', 'open', 'high', 'low', 'close', 'tick_count')
+        ]
+
         return Response({
             'from_currency': from_currency,
             'to_currency': to_currency,
             'history_days': days,
-            'rate_history': rate_history,
-            'total_records': len(rate_history)
+            'resolution': resolution,
+            'candles': candles,
+            'total_records': len(candles)
         }, status=status.HTTP_200_OK)
-        
+
     except Exception as e:
         logger.error(f"Error getting rate history: {e}")
         return Response({
@@ -294,8 +476,6 @@ def refresh_rates_from_apis(request):
     Force refresh of exchange rates from external APIs
     """
     try:
-        from django.core.cache import cache
-        
         # Currency pairs to refresh
         pairs_to_refresh = [
             ('NGN', 'USD'), ('USD', 'NGN'),
@@ -307,9 +487,9 @@ def refresh_rates_from_apis(request):
         failed_pairs = []
         
         for from_currency, to_currency in pairs_to_refresh:
-            # Clear cache for this pair
-            cache_key = f"quidax_rate_{from_currency}_{to_currency}"
-            cache.delete(cache_key)
+            # Clear the shared cache and snapshot entry for this pair
+            QuidaxExchangeRateService.rate_cache.delete(f"{from_currency}_{to_currency}")
+            QuidaxExchangeRateService.snapshot.invalidate(f"{from_currency}_{to_currency}")
             
             # Try to fetch fresh rate from Quidax API
             api_rate = QuidaxExchangeRateService._fetch_quidax_rate(from_currency, to_currency)
@@ -365,7 +545,13 @@ def get_rate_service_config(request):
             'base_url': QuidaxExchangeRateService.BASE_URL,
             'api_configured': bool(QuidaxExchangeRateService.API_KEY),
             'sandbox_mode': QuidaxExchangeRateService.SANDBOX_MODE,
-            'default_margins': QuidaxExchangeRateService.DEFAULT_MARGINS
+            'default_margins': DEFAULT_MARGINS,
+            'pricing_rules': pricing_rules.as_list(),
+            'snapshot_version': QuidaxExchangeRateService.snapshot.version,
+            'snapshot_pairs': sorted(QuidaxExchangeRateService.snapshot.current.entries),
+            'rate_providers': rate_providers.as_list(),
+            'circuit_breakers': provider_breakers.as_list(),
+            'outbound_http': http_client.metrics()
         }
         
         return Response(config, status=status.HTTP_200_OK)
@@ -384,6 +570,7 @@ def get_rate_service_config(request):
 )
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@conditional_get(_markets_validators, public=True, max_age=MARKETS_HTTP_MAX_AGE)
 def get_quidax_markets(request):
     """
     Get all available markets from Quidax
@@ -437,3 +624,21 @@ def get_market_ticker(request):
         return Response({
             'error': 'Internal server error'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@extend_schema(
+    tags=['Health'],
+    summary='Readiness probe',
+    description='200 once this worker has warmed its rate snapshot, 503 while it is warming, '
+                'when warm-up failed (it is retried) or when warm-up is disabled'
+)
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def rate_readiness(request):
+    """
+    Report whether this worker has warmed its rates
+    """
+    state = rate_pipeline.warm_status()
+    if state['state'] != 'warm':
+        return Response(state, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response(state, status=status.HTTP_200_OK)
@@ -1,6 +1,8 @@
 from django_filters import rest_framework as df_filters
 from rest_framework import filters
 
+from fastest_exchange.transaction_search import transaction_search
+
 # from fastest_exchange.models import Transaction
 
 
@@ -12,6 +14,15 @@ class SearchFilter(filters.SearchFilter):
     pass
 
 
+class TransactionSearchFilter(filters.SearchFilter):
+    """
+    ?search= over the user's transactions through the search index (prefix terms)
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        return transaction_search.search(queryset, request.user.pk, request.query_params.get(self.search_param, ''))
+
+
 class OrderingFilter(filters.OrderingFilter):
     pass
 
@@ -0,0 +1,232 @@
+"""
+Shared Outbound HTTP Client
+
+One client for every third-party call (rate providers, Quidax, Prembly,
+Termii). Instead of a fresh TCP+TLS handshake per request it keeps a
+keep-alive connection pool per host and adds:
+
+- bounded concurrency per host (callers wait for a slot up to their deadline)
+- retries with exponential backoff and jitter on connection errors and
+  429/502/503/504 responses (non-idempotent methods are only retried when
+  the connection could not be established)
+- a per-call deadline covering every attempt, backoff and slot wait
+- per-host metrics: requests, errors, retries, latency and connections opened
+
+Responses and exceptions are plain `requests` objects, so existing
+`except requests.RequestException` handlers keep working.
+"""
+import random
+import threading
+import time
+from collections import deque
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+
+class DeadlineExceeded(requests.Timeout):
+    """
+    The per-call deadline ran out before a response was received
+    """
+
+
+class HostMetrics:
+    """
+    Counters and recent latencies for one upstream host
+    """
+
+    def __init__(self, samples: int = 200):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.statuses: Dict[int, int] = {}
+        self.latencies = deque(maxlen=samples)
+
+    def started(self):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+
+    def finished(self, latency: float, status: Optional[int] = None, error: bool = False):
+        with self.lock:
+            self.in_flight -= 1
+            self.latencies.append(latency)
+            if error:
+                self.errors += 1
+            if status is not None:
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def count(self, field: str):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def as_dict(self, connections_opened: int) -> Dict:
+        with self.lock:
+            latencies = sorted(self.latencies)
+            statuses = dict(self.statuses)
+        p95 = latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'in_flight': self.in_flight,
+            'statuses': statuses,
+            'avg_latency_ms': round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            'p95_latency_ms': round(p95 * 1000, 1),
+            'connections_opened': connections_opened,
+        }
+
+
+class _HostPool:
+    """
+    Keep-alive session, concurrency limit and metrics for one scheme://host
+    """
+
+    def __init__(self, max_connections: int):
+        self.session = requests.Session()
+        # Sessions are shared across threads; never carry cookies between callers
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.metrics = HostMetrics()
+
+    def connections_opened(self) -> int:
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys() if key in pools)
+
+
+class HttpClient:
+    """
+    Pooled HTTP client with retries, deadlines and per-host metrics
+
+    Args:
+        max_connections_per_host: Keep-alive pool size and concurrency limit per host
+        retries: Extra attempts after the first one
+        backoff: Base backoff in seconds (doubled per attempt, with jitter)
+    """
+
+    def __init__(self, max_connections_per_host: int = 10, retries: int = 2, backoff: float = 0.2):
+        self.max_connections_per_host = max_connections_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._pools: Dict[str, _HostPool] = {}
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method: str, url: str, timeout: float = 10, deadline: Optional[float] = None,
+                retries: Optional[int] = None, **kwargs) -> requests.Response:
+        """
+        Send a request through the host's pool
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            timeout: Connect/read timeout for a single attempt
+            deadline: Total budget in seconds for all attempts (defaults to timeout)
+            retries: Override the client's retry count for this call
+            **kwargs: Passed to requests (params, json, data, headers, ...)
+
+        Raises:
+            requests.RequestException: When every attempt failed
+            DeadlineExceeded: When the deadline ran out first
+        """
+        method = method.upper()
+        host = self._host(url)
+        pool = self._pool(host)
+        metrics = pool.metrics
+        expires = time.monotonic() + (deadline if deadline is not None else timeout)
+        attempts = 1 + (self.retries if retries is None else retries)
+
+        for attempt in range(attempts):
+            remaining = expires - time.monotonic()
+            if remaining <= 0 or not pool.slots.acquire(timeout=remaining):
+                metrics.count('errors')
+                raise DeadlineExceeded(f"Deadline exceeded calling {host}")
+
+            metrics.started()
+            started = time.monotonic()
+            try:
+                response = pool.session.request(
+                    method, url, timeout=min(timeout, max(expires - started, 0.001)), **kwargs
+                )
+            except requests.RequestException as e:
+                pool.slots.release()
+                metrics.finished(time.monotonic() - started, error=True)
+                # Only retry a non-idempotent request if it never reached the server
+                retryable = (isinstance(e, (requests.ConnectionError, requests.Timeout))
+                             if method in IDEMPOTENT_METHODS else isinstance(e, requests.ConnectTimeout))
+                if not retryable or attempt == attempts - 1 or not self._sleep_before_retry(attempt, expires):
+                    raise
+                metrics.count('retries')
+                logger.info(f"Retrying {method} {host} after {type(e).__name__}")
+                continue
+            except BaseException:
+                pool.slots.release()
+                metrics.finished(time.monotonic() - started, error=True)
+                raise
+
+            pool.slots.release()
+            metrics.finished(time.monotonic() - started, status=response.status_code)
+            if (response.status_code in RETRY_STATUSES and method in IDEMPOTENT_METHODS
+                    and attempt < attempts - 1 and self._sleep_before_retry(attempt, expires)):
+                metrics.count('retries')
+                logger.info(f"Retrying {method} {host} after HTTP {response.status_code}")
+                response.close()
+                continue
+            return response
+
+    def metrics(self) -> Dict[str, Dict]:
+        with self._lock:
+            pools = dict(self._pools)
+        return {host: pool.metrics.as_dict(pool.connections_opened()) for host, pool in sorted(pools.items())}
+
+    def _sleep_before_retry(self, attempt: int, expires: float) -> bool:
+        """
+        Back off before the next attempt; False if the deadline leaves no room
+        """
+        delay = self.backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+        if time.monotonic() + delay >= expires:
+            return False
+        time.sleep(delay)
+        return True
+
+    def _pool(self, host: str) -> _HostPool:
+        pool = self._pools.get(host)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(host)
+                if pool is None:
+                    pool = self._pools[host] = _HostPool(self.max_connections_per_host)
+        return pool
+
+    @staticmethod
+    def _host(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+
+# Shared client for all outbound integrations
+http_client = HttpClient(
+    max_connections_per_host=getattr(settings, 'OUTBOUND_HTTP_MAX_CONNECTIONS_PER_HOST', 10),
+    retries=getattr(settings, 'OUTBOUND_HTTP_RETRIES', 2),
+    backoff=getattr(settings, 'OUTBOUND_HTTP_BACKOFF', 0.2),
+)
@@ -0,0 +1,185 @@
+"""
+Last-known-good Rates
+
+The degraded-mode rate source. Every successful refresh (a rate resolved
+from the database or an upstream, a ticker, a recorded tick) updates a
+compact file (EXCHANGE_LAST_KNOWN_GOOD_PATH):
+
+    {"version": 42, "written_at": 1767225600.0,
+     "rates": {"USD_NGN": {"rate": 1551.37, "source": "database", "timestamp": "..."}}}
+
+The file is read once, on first use or during warm-up, and then served
+from memory, so when stored rates are stale and every provider fails,
+quotes fall back to the most recent real rate without touching the
+database. Pairs never quoted on this host start from the stored rates
+(one query when the file does not exist yet) and then from
+EXCHANGE_SEED_RATES.
+
+Writes are merged under an flock (newest timestamp per pair wins) and
+rewritten at most every WRITE_INTERVAL seconds per pair unless the rate
+moved.
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ExchangeRate
+from .shared_snapshot import read_json, update_locked
+import logging
+
+logger = logging.getLogger(__name__)
+
+LAST_KNOWN_GOOD_PATH = getattr(settings, 'EXCHANGE_LAST_KNOWN_GOOD_PATH', '')
+
+# Bootstrap rates ("USD_NGN": units of NGN per USD) for pairs never quoted on this host
+SEED_RATES = getattr(settings, 'EXCHANGE_SEED_RATES', {})
+
+# Sources that are not a refresh and never replace a last-known-good rate
+DERIVED_SOURCES = ('last_known_good', 'seed', 'triangulated')
+
+
+class LastKnownGoodRates:
+    """
+    In-memory last-known-good rate per pair, persisted to one file
+    """
+
+    # A pair whose rate did not move is rewritten at most this often (seconds)
+    WRITE_INTERVAL = 60
+
+    def __init__(self, path: Optional[str], seed_rates: Dict[str, float]):
+        self.path = path
+        self.seed_rates = seed_rates
+        self.version = 0
+        self.written_at = None
+        self._rates: Optional[Dict[str, Dict]] = None
+        # pair -> monotonic time it was last written
+        self._written: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def rates(self) -> Dict[str, Dict]:
+        if self._rates is None:
+            self.load()
+        return self._rates
+
+    @property
+    def pairs(self) -> List[Tuple[str, str]]:
+        return sorted(tuple(pair.split('_')) for pair in self.rates)
+
+    def load(self):
+        """
+        Read the file once; without one, start from the stored rates and the seed rates
+        """
+        with self._lock:
+            if self._rates is not None:
+                return
+            data = {}
+            if self.path:
+                try:
+                    data = read_json(self.path)
+                except Exception as e:
+                    logger.error(f"Error reading last-known-good rates {self.path}: {e}")
+            rates = {pair: {'rate': rate, 'source': 'seed', 'timestamp': None}
+                     for pair, rate in self.seed_rates.items()}
+            if data:
+                rates.update(data.get('rates', {}))
+                self.version = data.get('version', 0)
+                self.written_at = data.get('written_at')
+            else:
+                stored = self._stored_rates()
+                rates.update(stored)
+                # Persist them so that later loads need no query
+                self._write(stored)
+            self._rates = rates
+            logger.info(f"Loaded {len(rates)} last-known-good rate(s) (version {self.version})")
+
+    def get(self, from_currency: str, to_currency: str) -> Optional[Dict]:
+        """
+        Rate info for a pair from memory, or None
+        """
+        pair = f"{from_currency}_{to_currency}"
+        known = self.rates.get(pair)
+        if known is None:
+            return None
+        return {
+            'rate': known['rate'],
+            'source': 'last_known_good',
+            'timestamp': known['timestamp'],
+            'pair': pair,
+            'last_source': known['source'],
+        }
+
+    def record(self, rate_infos: Iterable[Dict]):
+        """
+        Keep refreshed rates (derived and last-known-good rates are ignored) and persist changes
+        """
+        now = time.monotonic()
+        changed = {}
+        rates = self.rates
+        for rate_info in rate_infos:
+            source = rate_info.get('source')
+            if source in DERIVED_SOURCES or not rate_info.get('rate'):
+                continue
+            pair = rate_info['pair']
+            known = rates.get(pair)
+            if (known is not None and known['rate'] == rate_info['rate']
+                    and now - self._written.get(pair, 0) < self.WRITE_INTERVAL):
+                continue
+            changed[pair] = {
+                'rate': rate_info['rate'],
+                'source': source,
+                'timestamp': rate_info.get('timestamp') or timezone.now().isoformat(),
+            }
+            self._written[pair] = now
+        if not changed:
+            return
+
+        rates.update(changed)
+        self._write(changed)
+
+    def _write(self, changed: Dict[str, Dict]):
+        if not self.path:
+            return
+
+        def merge(data):
+            stored = data.get('rates', {})
+            for pair, known in changed.items():
+                current = stored.get(pair)
+                # Another process may have written a newer rate meanwhile
+                if current is None or self._newer(known, current):
+                    stored[pair] = known
+            self.version = data.get('version', 0) + 1
+            self.written_at = time.time()
+            return {'version': self.version, 'written_at': self.written_at, 'rates': stored}
+        try:
+            update_locked(self.path, merge)
+        except Exception as e:
+            logger.error(f"Error writing last-known-good rates {self.path}: {e}")
+
+    @staticmethod
+    def _newer(known: Dict, current: Dict) -> bool:
+        known_at = parse_datetime(known['timestamp']) if known.get('timestamp') else None
+        current_at = parse_datetime(current['timestamp']) if current.get('timestamp') else None
+        return current_at is None or (known_at is not None and known_at >= current_at)
+
+    @staticmethod
+    def _stored_rates() -> Dict[str, Dict]:
+        try:
+            return {
+                f"{from_currency}_{to_currency}": {
+                    'rate': float(tick.rate),
+                    'source': 'database',
+                    'timestamp': tick.created_at.isoformat(),
+                }
+                for (from_currency, to_currency), tick in ExchangeRate.objects.latest_for_pairs().items()
+            }
+        except Exception as e:
+            logger.error(f"Error loading stored rates for last-known-good rates: {e}")
+            return {}
+
+
+last_known_good = LastKnownGoodRates(LAST_KNOWN_GOOD_PATH, SEED_RATES)
@@ -0,0 +1,153 @@
+"""
+Django Management Command: Ingest Quidax Tickers
+
+Long-running worker that polls the Quidax market tickers and pushes every
+changed last_price into the rate store, so user requests are answered
+from the cache and never wait on Quidax. Run it next to the web workers
+with QUIDAX_TICKER_INGESTION=True and a shared cache backend (e.g. Redis);
+with --persist the prices are also written to the database.
+
+Usage:
+    python manage.py ingest_quidax_tickers
+    python manage.py ingest_quidax_tickers --markets USDTNGN --interval 1
+    python manage.py ingest_quidax_tickers --persist
+    python manage.py ingest_quidax_tickers --base-url http://127.0.0.1:8765 --once
+
+A local stand-in ticker server for testing is provided by
+benchmarks/stub_servers.py (`python benchmarks/stub_servers.py quidax`).
+"""
+
+import signal
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from fastest_exchange.quidax_exchange_service import QuidaxExchangeRateService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Continuously ingest Quidax market tickers into the rate cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--markets',
+            nargs='+',
+            type=str,
+            help='Quidax markets to follow (default: every market in MARKET_PAIRS)',
+            default=None
+        )
+
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=QuidaxExchangeRateService.TICKER_INTERVAL,
+            help='Seconds between polls of each market',
+        )
+
+        parser.add_argument(
+            '--base-url',
+            type=str,
+            default=None,
+            help='Override the Quidax API base URL (e.g. a local stand-in server)',
+        )
+
+        parser.add_argument(
+            '--persist',
+            action='store_true',
+            help='Also write changed prices to the database',
+        )
+
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Poll every market once and exit',
+        )
+
+    def handle(self, *args, **options):
+        service = QuidaxExchangeRateService
+        markets = [m.upper() for m in (options['markets'] or service.MARKET_PAIRS)]
+        unknown = [m for m in markets if m not in service.MARKET_PAIRS]
+        if unknown:
+            raise CommandError(f"Unsupported market(s): {', '.join(unknown)}. "
+                               f"Known: {', '.join(service.MARKET_PAIRS)}")
+        if options['interval'] <= 0:
+            raise CommandError('--interval must be positive')
+
+        if options['base_url']:
+            service.BASE_URL = options['base_url'].rstrip('/')
+
+        backend = settings.CACHES['default']['BACKEND']
+        if ('locmem' in backend or 'dummy' in backend) and not options['persist']:
+            self.stdout.write(self.style.WARNING(
+                'The default cache is process-local; web workers will not see ingested '
+                'tickers. Configure a shared cache or pass --persist.'
+            ))
+
+        self.stop_event = threading.Event()
+        if not options['once']:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, lambda *_: self.stop_event.set())
+
+        self.stdout.write(self.style.SUCCESS(
+            '[{}] Ingesting {} from {} every {}s'.format(
+                timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
+                ', '.join(markets), service.BASE_URL, options['interval']
+            )
+        ))
+
+        # market -> (last_price, monotonic time it was last pushed)
+        self.pushed = {}
+        self.updates = 0
+        while True:
+            started = time.monotonic()
+            for market in markets:
+                self.poll_market(market, options['persist'])
+
+            if options['once'] or self.stop_event.wait(max(0.0, options['interval'] - (time.monotonic() - started))):
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'Stopped after {self.updates} ticker update(s)'))
+
+    def poll_market(self, market, persist=False):
+        """
+        Fetch one ticker and push it if the price changed or is about to expire
+        """
+        service = QuidaxExchangeRateService
+        result = service.get_market_ticker(market)
+        if 'error' in result:
+            logger.warning(f"Ticker poll for {market} failed: {result['error']}")
+            return
+
+        ticker = result['ticker']
+        price = ticker.get('last_price')
+        if price is None:
+            logger.warning(f"Ticker for {market} has no last_price: {ticker}")
+            return
+
+        last_price, pushed_at = self.pushed.get(market, (None, 0.0))
+        changed = price != last_price
+        # Re-push an unchanged price before its cache entry goes stale
+        if not changed and time.monotonic() - pushed_at < service.TICKER_TTL / 2:
+            return
+
+        if changed and persist:
+            base, quote = service.MARKET_PAIRS[market]
+            rate = Decimal(str(price))
+            service.update_exchange_rate(base, quote, rate)
+            service.update_exchange_rate(quote, base, (Decimal('1') / rate).quantize(Decimal('0.00000001')))
+
+        ingested = service.ingest_ticker(market, ticker)
+        if not ingested:
+            logger.warning(f"Could not derive rates from {market} ticker: {ticker}")
+            return
+
+        self.pushed[market] = (price, time.monotonic())
+        if changed:
+            self.updates += 1
+            self.stdout.write(f"  {market}: {last_price} -> {price}")
@@ -0,0 +1,90 @@
+"""
+Django Management Command: Rebuild Rate Candles
+
+Recomputes the OHLC candles (RateCandle) from the stored rate ticks.
+New ticks are rolled up as they are written, so this is only needed once
+after upgrading (to roll up ticks recorded before candles existed) or to
+repair candles after ticks were edited or deleted by hand.
+
+Usage:
+    python manage.py rebuild_rate_candles
+    python manage.py rebuild_rate_candles --currency-pairs NGN_USD USD_NGN
+    python manage.py rebuild_rate_candles --days 90
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from fastest_exchange.models import ExchangeRate, RateCandle
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Recompute OHLC rate candles from the stored rate ticks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--currency-pairs',
+            nargs='+',
+            type=str,
+            help='Only rebuild these pairs (e.g., NGN_USD USD_NGN)',
+            default=None
+        )
+
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Only rebuild candles from this many days back (default: all ticks)',
+        )
+
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Ticks folded per write',
+        )
+
+    def handle(self, *args, **options):
+        ticks = ExchangeRate.objects.all()
+        candles = RateCandle.objects.all()
+
+        if options['currency_pairs']:
+            pair_filter = Q()
+            for pair in options['currency_pairs']:
+                if '_' not in pair:
+                    raise CommandError(f'Invalid currency pair format: {pair}. Use FORMAT: FROM_TO')
+                from_curr, to_curr = pair.upper().split('_', 1)
+                pair_filter |= Q(currency_from=from_curr, currency_to=to_curr)
+            ticks = ticks.filter(pair_filter)
+            candles = candles.filter(pair_filter)
+
+        if options['days'] is not None:
+            # Start on a day boundary so no rebuilt candle is missing its earlier ticks
+            since = RateCandle.bucket_for(timezone.now() - timedelta(days=options['days']), RateCandle.Resolution.DAY)
+            ticks = ticks.filter(created_at__gte=since)
+            candles = candles.filter(bucket_start__gte=since)
+
+        chunk_size = options['chunk_size']
+        total = 0
+        with transaction.atomic():
+            deleted, _ = candles.delete()
+            chunk = []
+            for tick in ticks.order_by('created_at', 'id').iterator(chunk_size=chunk_size):
+                chunk.append(tick)
+                if len(chunk) >= chunk_size:
+                    RateCandle.objects.record_ticks(chunk)
+                    total += len(chunk)
+                    chunk = []
+            if chunk:
+                RateCandle.objects.record_ticks(chunk)
+                total += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {total} tick(s) into {candles.count()} candle(s) (replaced {deleted})'
+        ))
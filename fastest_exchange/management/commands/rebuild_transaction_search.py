@@ -0,0 +1,40 @@
+"""
+Django Management Command: Rebuild Transaction Search
+
+Refills the transaction search index (fastest_exchange.transaction_search)
+from the transactions and their linked records. Migration 0008 indexes
+the transactions that exist when it runs and entries are kept in sync as
+transactions are written, so this is only needed to repair the index
+after rows were changed outside the ORM.
+
+Usage:
+    python manage.py rebuild_transaction_search
+    python manage.py rebuild_transaction_search --chunk-size 5000
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from fastest_exchange.models import Transaction
+from fastest_exchange.transaction_search import transaction_search
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the transaction search index from the transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Transactions indexed per write',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            transaction_search.clear()
+            total = transaction_search.rebuild(Transaction.objects.all(), options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} transaction(s)'))
@@ -0,0 +1,42 @@
+"""
+Django Management Command: Rebuild Transaction Stats
+
+Recomputes the per-user transaction stats (TransactionStats) from the
+transactions with one conditional-aggregation query. Stats are kept up to
+date as transactions are written and are built on a user's first stats
+read, so this is only needed to backfill after upgrading or to repair
+stats after transactions were changed outside the ORM.
+
+Usage:
+    python manage.py rebuild_transaction_stats
+    python manage.py rebuild_transaction_stats --users 12 57
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from fastest_exchange.models import TransactionStats
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-user transaction stats from the transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            nargs='+',
+            type=int,
+            help='Only rebuild these user ids (default: every user with transactions)',
+            default=None
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['users'] is None:
+                # Users whose transactions were all deleted keep no stale row
+                TransactionStats.objects.filter(user__transactions__isnull=True).delete()
+            stats = TransactionStats.objects.rebuild(options['users'])
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt transaction stats of {len(stats)} user(s)'))
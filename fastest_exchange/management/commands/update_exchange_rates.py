@@ -2,18 +2,39 @@
 Django Management Command: Update Exchange Rates
 
 This command fetches the latest exchange rates from external APIs
-and updates the database. Can be run manually or via cron job.
+and updates the database. Run it once (e.g. from cron) or keep it
+running with --daemon.
 
 Usage:
     python manage.py update_exchange_rates
     python manage.py update_exchange_rates --currency-pairs NGN_USD USD_NGN
     python manage.py update_exchange_rates --force-refresh
+    python manage.py update_exchange_rates --per-pair --workers 8
+    python manage.py update_exchange_rates --daemon --interval 60 --jitter 0.1
+    python manage.py update_exchange_rates --notify
+
+By default all pairs are derived from one upstream response per base
+currency (see ExchangeRateService.fetch_rate_matrix); --per-pair falls
+back to one upstream lookup per currency pair, run concurrently.
+
+Every run compares the fetched rates against one prefetched map of the
+latest stored rates, writes all changed pairs in a single transaction
+and invalidates the rate caches once. With --notify the changed rates
+are emailed to users subscribed to rate alerts (FxRateNotifier).
 """
 
+import random
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
 from django.utils import timezone
 from decimal import Decimal
 from fastest_exchange.exchange_rate_service import ExchangeRateService
+from fastest_exchange.messaging.fx_rate import FxRateNotifier
 from fastest_exchange.models import ExchangeRate
 import logging
 
@@ -23,6 +44,9 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = 'Update exchange rates from external APIs'
 
+    # Rates that moved less than this (in percent) are not recorded
+    MIN_CHANGE_PCT = Decimal('0.1')
+
     def add_arguments(self, parser):
         parser.add_argument(
             '--currency-pairs',
@@ -31,19 +55,58 @@ class Command(BaseCommand):
             help='Specific currency pairs to update (e.g., NGN_USD USD_NGN)',
             default=None
         )
-        
+
         parser.add_argument(
             '--force-refresh',
             action='store_true',
             help='Force refresh all rates, ignoring cache',
         )
-        
+
+        parser.add_argument(
+            '--per-pair',
+            action='store_true',
+            help='Fetch each pair separately instead of deriving them from one call per base currency',
+        )
+
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Concurrent upstream lookups with --per-pair',
+        )
+
         parser.add_argument(
             '--dry-run',
             action='store_true',
             help='Show what would be updated without making changes',
         )
-        
+
+        parser.add_argument(
+            '--daemon',
+            action='store_true',
+            help='Keep running and update every --interval seconds',
+        )
+
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60,
+            help='Seconds between updates in --daemon mode',
+        )
+
+        parser.add_argument(
+            '--jitter',
+            type=float,
+            default=0.1,
+            help='Randomise each --daemon wait by up to this fraction of --interval',
+        )
+
+        parser.add_argument(
+            '--notify',
+            action='store_true',
+            help='Email changed rates to users subscribed to rate alerts',
+        )
+
         parser.add_argument(
             '--verbose',
             action='store_true',
@@ -54,12 +117,13 @@ class Command(BaseCommand):
         self.verbosity = 1
         if options['verbose']:
             self.verbosity = 2
-            
-        self.stdout.write(
-            self.style.SUCCESS('[{}] Starting exchange rate update...'.format(
-                timezone.now().strftime('%Y-%m-%d %H:%M:%S')
-            ))
-        )
+
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        if options['daemon'] and options['interval'] <= 0:
+            raise CommandError('--interval must be positive')
+        if not 0 <= options['jitter'] < 1:
+            raise CommandError('--jitter must be between 0 and 1')
 
         # Determine which currency pairs to update
         if options['currency_pairs']:
@@ -83,122 +147,183 @@ class Command(BaseCommand):
         if self.verbosity >= 2:
             self.stdout.write(f'Currency pairs to update: {pairs_to_update}')
 
+        if not options['daemon']:
+            self.update_rates(pairs_to_update, options)
+            return
+
+        stop_event = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop_event.set())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Updating {len(pairs_to_update)} pair(s) every {options['interval']}s "
+            f"(±{options['jitter'] * 100:.0f}% jitter)"
+        ))
+        while not stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.update_rates(pairs_to_update, options)
+            except Exception as e:
+                logger.exception(f"Exchange rate update failed: {e}")
+                self.stdout.write(self.style.ERROR(f'Exchange rate update failed: {e}'))
+            finally:
+                # Long-running process: drop connections that hit CONN_MAX_AGE or broke
+                close_old_connections()
+
+            # Jitter keeps several daemons (or replicas) from hitting providers in lockstep
+            wait = options['interval'] * (1 + random.uniform(-options['jitter'], options['jitter']))
+            stop_event.wait(max(0.0, wait - (time.monotonic() - started)))
+
+        self.stdout.write(self.style.SUCCESS('Stopped'))
+
+    def update_rates(self, pairs_to_update, options):
+        """
+        Fetch, compare and record one round of rates
+        """
+        dry_run = options['dry_run']
+        self.stdout.write(
+            self.style.SUCCESS('[{}] Starting exchange rate update...'.format(
+                timezone.now().strftime('%Y-%m-%d %H:%M:%S')
+            ))
+        )
+
+        pair_keys = [f"{from_curr}_{to_curr}" for from_curr, to_curr in pairs_to_update]
+
         # Clear cache if force refresh is requested
         if options['force_refresh']:
             self.stdout.write('Force refresh enabled - clearing rate cache...')
-            from django.core.cache import cache
-            for from_curr, to_curr in pairs_to_update:
-                cache_key = f"exchange_rate_{from_curr}_{to_curr}"
-                cache.delete(cache_key)
+            ExchangeRateService.invalidate_rates(*pair_keys)
+
+        if options['per_pair']:
+            fetched = self.fetch_per_pair(pairs_to_update, options['workers'])
+        else:
+            # Derive the whole matrix from one upstream response per base currency
+            currencies = list(dict.fromkeys(c for pair in pairs_to_update for c in pair))
+            fetched = ExchangeRateService.fetch_rate_matrix(currencies)
+            if self.verbosity >= 2:
+                self.stdout.write(f'Derived {len(fetched)} pairs for currencies: {", ".join(currencies)}')
+
+        # One query for the current rate of every pair
+        current = ExchangeRate.objects.latest_for_pairs(pairs_to_update)
 
-        # Update rates
         updated_rates = []
         failed_pairs = []
-        
-        for from_currency, to_currency in pairs_to_update:
+        rows = []
+        for (from_currency, to_currency), pair in zip(pairs_to_update, pair_keys):
+            row = self.compare_pair(from_currency, to_currency, fetched.get(pair), current.get((from_currency, to_currency)), dry_run)
+            if row is False:
+                failed_pairs.append(pair)
+                continue
+            updated_rates.append(pair)
+            if row is not None:
+                rows.append(row)
+
+        if rows and not dry_run:
             try:
-                success = self.update_currency_pair(
-                    from_currency, 
-                    to_currency, 
-                    options['dry_run']
-                )
-                
-                if success:
-                    updated_rates.append(f"{from_currency}_{to_currency}")
-                else:
-                    failed_pairs.append(f"{from_currency}_{to_currency}")
-                    
+                # Single transaction for every changed pair, then one cache invalidation
+                ExchangeRateService.update_exchange_rates(rows)
             except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'Error updating {from_currency}->{to_currency}: {e}')
-                )
-                failed_pairs.append(f"{from_currency}_{to_currency}")
+                self.stdout.write(self.style.ERROR(f'Error recording rates: {e}'))
+                written = {f"{row['currency_from']}_{row['currency_to']}" for row in rows}
+                failed_pairs.extend(pair for pair in updated_rates if pair in written)
+                updated_rates = [pair for pair in updated_rates if pair not in written]
+            else:
+                if options['notify']:
+                    self.notify_subscribers(rows)
 
         # Summary
         self.stdout.write('\n' + '='*50)
         self.stdout.write(self.style.SUCCESS(f'Exchange rate update completed!'))
-        self.stdout.write(f'Successfully updated: {len(updated_rates)} pairs')
+        self.stdout.write(f'Successfully updated: {len(updated_rates)} pairs ({len(rows)} changed)')
         self.stdout.write(f'Failed: {len(failed_pairs)} pairs')
-        
+
         if updated_rates:
             self.stdout.write(self.style.SUCCESS(f'Updated pairs: {", ".join(updated_rates)}'))
-            
+
         if failed_pairs:
             self.stdout.write(self.style.WARNING(f'Failed pairs: {", ".join(failed_pairs)}'))
 
-        if options['dry_run']:
+        if dry_run:
             self.stdout.write(self.style.WARNING('DRY RUN MODE - No actual changes were made'))
 
         self.stdout.write('='*50)
 
-    def update_currency_pair(self, from_currency, to_currency, dry_run=False):
-        """Update a single currency pair"""
-        
+    def notify_subscribers(self, rows):
+        """
+        Email the recorded rates to subscribed users
+        """
+        try:
+            result = FxRateNotifier.broadcast(rows)
+        except Exception as e:
+            logger.exception(f"FX rate notification failed: {e}")
+            self.stdout.write(self.style.ERROR(f'FX rate notification failed: {e}'))
+            return
+        self.stdout.write(
+            f"Notified {result['sent']} of {result['recipients']} subscriber(s) ({result['failed']} failed)"
+        )
+
+    def fetch_per_pair(self, pairs_to_update, workers):
+        """
+        Look every pair up with its own upstream call, concurrently
+        """
+        def fetch(pair):
+            try:
+                return ExchangeRateService._fetch_external_rate(*pair)
+            except Exception as e:
+                logger.error(f"Error fetching {pair[0]}->{pair[1]}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(pairs_to_update) or 1)) as executor:
+            results = executor.map(fetch, pairs_to_update)
+            return {
+                f"{from_currency}_{to_currency}": result
+                for (from_currency, to_currency), result in zip(pairs_to_update, results)
+                if result
+            }
+
+    def compare_pair(self, from_currency, to_currency, api_rate, current, dry_run=False):
+        """
+        Row to record for a pair, None if unchanged, or False if no rate was fetched
+        """
         if self.verbosity >= 2:
             self.stdout.write(f'Updating {from_currency} -> {to_currency}...')
 
-        try:
-            # Try to fetch from external APIs
-            api_rate = ExchangeRateService._fetch_external_rate(from_currency, to_currency)
-            
-            if not api_rate or 'error' in api_rate:
-                if self.verbosity >= 2:
-                    self.stdout.write(
-                        self.style.WARNING(f'  No API rate available for {from_currency}->{to_currency}')
-                    )
-                return False
-
-            new_rate = Decimal(str(api_rate['rate']))
-            source = api_rate.get('source', 'unknown')
-            
-            # Get current rate for comparison
-            current_rate_obj = ExchangeRate.objects.filter(
-                currency_from=from_currency,
-                currency_to=to_currency
-            ).order_by('-created_at').first()
-            
-            current_rate = current_rate_obj.rate if current_rate_obj else None
-            
-            # Check if rate has changed significantly (more than 0.1% change)
-            rate_changed = True
-            if current_rate:
-                change_pct = abs((new_rate - current_rate) / current_rate * 100)
-                rate_changed = change_pct >= 0.1  # Update if change is >= 0.1%
-                
-                if self.verbosity >= 2:
-                    self.stdout.write(
-                        f'  Current: {current_rate}, New: {new_rate}, Change: {change_pct:.2f}%'
-                    )
-            
-            if not rate_changed and not dry_run:
-                if self.verbosity >= 2:
-                    self.stdout.write(f'  Rate change too small, skipping update')
-                return True
-
-            # Update the rate
-            if not dry_run:
-                rate_obj = ExchangeRateService.update_exchange_rate(
-                    from_currency=from_currency,
-                    to_currency=to_currency,
-                    rate=new_rate
-                )
-                
+        if not api_rate or 'error' in api_rate:
+            if self.verbosity >= 2:
                 self.stdout.write(
-                    self.style.SUCCESS(
-                        f'  ✓ Updated {from_currency}->{to_currency}: {new_rate} (from {source})'
-                    )
+                    self.style.WARNING(f'  No API rate available for {from_currency}->{to_currency}')
                 )
-            else:
+            return False
+
+        new_rate = Decimal(str(api_rate['rate'])).quantize(Decimal('0.00000001'))
+        source = api_rate.get('source', 'unknown')
+        current_rate = current.rate if current else None
+
+        # Check if rate has changed significantly (more than 0.1% change)
+        if current_rate:
+            change_pct = abs((new_rate - current_rate) / current_rate * 100)
+
+            if self.verbosity >= 2:
                 self.stdout.write(
-                    self.style.SUCCESS(
-                        f'  [DRY RUN] Would update {from_currency}->{to_currency}: {new_rate} (from {source})'
-                    )
+                    f'  Current: {current_rate}, New: {new_rate}, Change: {change_pct:.2f}%'
                 )
-                
-            return True
-            
-        except Exception as e:
+
+            if change_pct < self.MIN_CHANGE_PCT and not dry_run:
+                if self.verbosity >= 2:
+                    self.stdout.write(f'  Rate change too small, skipping update')
+                return None
+
+        if dry_run:
             self.stdout.write(
-                self.style.ERROR(f'  ✗ Failed to update {from_currency}->{to_currency}: {e}')
+                self.style.SUCCESS(
+                    f'  [DRY RUN] Would update {from_currency}->{to_currency}: {new_rate} (from {source})'
+                )
             )
-            return False
+            return None
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'  ✓ Updated {from_currency}->{to_currency}: {new_rate} (from {source})'
+            )
+        )
+        return {'currency_from': from_currency, 'currency_to': to_currency, 'rate': new_rate}
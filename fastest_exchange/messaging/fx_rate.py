@@ -0,0 +1,137 @@
+"""
+FX Rate Notifications
+
+Emails every user subscribed to rate alerts (Notification.fx_rate) when
+rates change. Subscribers are streamed from the notice_fx_rate_idx
+partial index with .iterator() in batches, the email is rendered once
+for the whole broadcast, and batches are sent by a fixed MailPool whose
+workers each reuse one SMTP connection, so a broadcast to any number of
+users uses a constant number of threads, connections and memory.
+
+A user is emailed at most once per FX_RATE_NOTIFICATION_COOLDOWN
+seconds (Notification.fx_rate_notified_at is stamped once sent).
+"""
+from collections import deque
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from ..models import Notification
+from .notification import MailPool
+import logging
+
+logger = logging.getLogger(__name__)
+
+FX_RATE_NOTIFICATION_COOLDOWN = getattr(settings, 'FX_RATE_NOTIFICATION_COOLDOWN', 6 * 3600)
+FX_RATE_NOTIFICATION_WORKERS = getattr(settings, 'FX_RATE_NOTIFICATION_WORKERS', 4)
+FX_RATE_NOTIFICATION_BATCH_SIZE = getattr(settings, 'FX_RATE_NOTIFICATION_BATCH_SIZE', 200)
+
+TEMPLATE = 'fastest_exchange/email/fx_rate_update.html'
+
+
+class FxRateNotifier:
+    """
+    Rate-change email broadcast to subscribed users
+    """
+
+    @classmethod
+    def subscribers(cls, now=None):
+        """
+        (notification id, email) of subscribed users outside their cool-down
+        """
+        cutoff = (now or timezone.now()) - timedelta(seconds=FX_RATE_NOTIFICATION_COOLDOWN)
+        return (
+            Notification.objects
+            # fx_rate=True is the condition of the notice_fx_rate_idx partial index
+            .filter(fx_rate=True)
+            .filter(Q(fx_rate_notified_at__isnull=True) | Q(fx_rate_notified_at__lt=cutoff))
+            .filter(user__is_active=True)
+            .exclude(user__email__isnull=True)
+            .exclude(user__email='')
+            .values_list('id', 'user__email')
+        )
+
+    @classmethod
+    def render(cls, rates: List[Dict], now=None):
+        """
+        (subject, html) of the email for rows of currency_from, currency_to and rate
+        """
+        if len(rates) == 1:
+            rate = rates[0]
+            subject = f"Exchange rate update: {rate['currency_from']}/{rate['currency_to']} {rate['rate']}"
+        else:
+            subject = f"Exchange rate update: {len(rates)} currency pairs"
+        html = render_to_string(TEMPLATE, {'rates': rates, 'as_of': now or timezone.now()})
+        return subject, html
+
+    @classmethod
+    def broadcast(cls, rates: List[Dict], workers: Optional[int] = None,
+                  batch_size: Optional[int] = None, dry_run: bool = False) -> Dict:
+        """
+        Email the changed rates to every subscriber outside the cool-down
+
+        Returns:
+            Dict with recipients, sent and failed counts
+        """
+        if not rates:
+            return {'recipients': 0, 'sent': 0, 'failed': 0}
+
+        workers = workers or FX_RATE_NOTIFICATION_WORKERS
+        batch_size = batch_size or FX_RATE_NOTIFICATION_BATCH_SIZE
+        now = timezone.now()
+        subject, html = cls.render(rates, now)
+        subscribers = cls.subscribers(now).iterator(chunk_size=batch_size)
+
+        if dry_run:
+            return {'recipients': sum(1 for _ in subscribers), 'sent': 0, 'failed': 0}
+
+        # Filled by the pool workers, stamped by this thread (whose connection
+        # also holds the subscriber cursor)
+        delivered_ids = deque()
+
+        def on_sent(batch, delivered):
+            delivered_ids.extend(message.notification_id for message in delivered)
+
+        recipients = 0
+        pool = MailPool(workers, on_sent=on_sent)
+        try:
+            batch = []
+            for notification_id, email in subscribers:
+                batch.append(cls._message(subject, html, email, notification_id))
+                if len(batch) >= batch_size:
+                    recipients += len(batch)
+                    pool.submit(batch)
+                    batch = []
+                    cls._stamp(delivered_ids, now, batch_size)
+            if batch:
+                recipients += len(batch)
+                pool.submit(batch)
+        finally:
+            pool.close()
+            cls._stamp(delivered_ids, now, batch_size)
+
+        logger.info(f"FX rate notification sent to {pool.sent} of {recipients} subscriber(s)")
+        return {'recipients': recipients, 'sent': pool.sent, 'failed': pool.failed}
+
+    @staticmethod
+    def _message(subject: str, html: str, email: str, notification_id: int) -> EmailMessage:
+        message = EmailMessage(subject=subject, body=html, to=[email])
+        message.content_subtype = "html"
+        message.notification_id = notification_id
+        return message
+
+    @staticmethod
+    def _stamp(delivered_ids: deque, now, batch_size: int):
+        """
+        Start the cool-down of users emailed so far
+        """
+        while delivered_ids:
+            ids = []
+            while delivered_ids and len(ids) < batch_size:
+                ids.append(delivered_ids.popleft())
+            Notification.objects.filter(id__in=ids).update(fx_rate_notified_at=now)
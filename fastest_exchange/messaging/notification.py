@@ -1,6 +1,11 @@
+import logging
+import queue
 import threading
+from typing import Callable, Iterable, List, Optional
 
-from django.core.mail import EmailMessage, send_mail
+from django.core.mail import EmailMessage, get_connection, send_mail
+
+logger = logging.getLogger(__name__)
 
 
 class EmailThread(threading.Thread):
@@ -22,6 +27,88 @@ class EmailThread(threading.Thread):
             print(e)
 
 
+class MailPool:
+    """
+    Fixed number of sender threads, each sending over one reused SMTP connection
+
+    submit() takes a batch of messages and blocks while `workers * 2`
+    batches are already waiting, so producers streaming recipients from
+    the database never hold more than a few batches in memory.
+    on_sent(batch, sent) is called from the worker with the messages
+    that were delivered.
+    """
+
+    def __init__(self, workers: int = 4, on_sent: Optional[Callable[[List, List], None]] = None):
+        self.on_sent = on_sent
+        self.sent = 0
+        self.failed = 0
+        self._counts_lock = threading.Lock()
+        self._batches = queue.Queue(maxsize=workers * 2)
+        self._threads = [
+            threading.Thread(target=self._work, name=f"mail-pool-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, batch: Iterable[EmailMessage]):
+        self._batches.put(list(batch))
+
+    def close(self):
+        """
+        Wait for every submitted batch to be sent and stop the workers
+        """
+        for _ in self._threads:
+            self._batches.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _work(self):
+        connection = get_connection()
+        try:
+            while True:
+                batch = self._batches.get()
+                if batch is None:
+                    return
+                delivered = self._send_batch(connection, batch)
+                with self._counts_lock:
+                    self.sent += len(delivered)
+                    self.failed += len(batch) - len(delivered)
+                if self.on_sent is not None:
+                    try:
+                        self.on_sent(batch, delivered)
+                    except Exception as e:
+                        logger.error(f"Error recording sent e-mails: {e}")
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _send_batch(connection, batch: List[EmailMessage]) -> List[EmailMessage]:
+        delivered = []
+        for message in batch:
+            try:
+                # Opened explicitly so send_messages() keeps it open afterwards
+                connection.open()
+            except Exception as e:
+                logger.error(f"Error connecting to the mail server, skipping the rest of the batch: {e}")
+                break
+            message.connection = connection
+            try:
+                if connection.send_messages([message]):
+                    delivered.append(message)
+            except Exception as e:
+                logger.error(f"Error sending e-mail to {', '.join(message.to)}: {e}")
+                # Continue on a fresh connection
+                connection.close()
+        return delivered
+
+
 class Messenger:
 
     @staticmethod
@@ -0,0 +1,59 @@
+# Append-only exchange rate ticks with a latest-per-pair pointer table
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def point_pairs_at_latest_tick(apps, schema_editor):
+    ExchangeRate = apps.get_model('fastest_exchange', 'ExchangeRate')
+    LatestExchangeRate = apps.get_model('fastest_exchange', 'LatestExchangeRate')
+
+    # Existing rows share the migration timestamp; the highest id is the newest
+    latest = {}
+    for pk, currency_from, currency_to in ExchangeRate.objects.order_by('id').values_list(
+        'id', 'currency_from', 'currency_to'
+    ):
+        latest[(currency_from, currency_to)] = pk
+
+    LatestExchangeRate.objects.bulk_create([
+        LatestExchangeRate(currency_from=currency_from, currency_to=currency_to, tick_id=pk)
+        for (currency_from, currency_to), pk in latest.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fastest_exchange', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exchangerate',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterModelOptions(
+            name='exchangerate',
+            options={'get_latest_by': ['created_at', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='exchangerate',
+            index=models.Index(fields=['currency_from', 'currency_to', '-created_at'], name='rate_pair_created_idx'),
+        ),
+        migrations.CreateModel(
+            name='LatestExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency_from', models.CharField(choices=[('BWP', 'Bwp'), ('RMB', 'Rmb'), ('ETB', 'Etb'), ('GHC', 'Ghc')], max_length=10)),
+                ('currency_to', models.CharField(choices=[('BWP', 'Bwp'), ('RMB', 'Rmb'), ('ETB', 'Etb'), ('GHC', 'Ghc')], max_length=10)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tick', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='fastest_exchange.exchangerate')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('currency_from', 'currency_to'), name='latest_rate_pair_uniq')],
+            },
+        ),
+        migrations.RunPython(point_pairs_at_latest_tick, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# OHLC rollups of exchange rate ticks (filled by ExchangeRateManager.bulk_append;
+# existing ticks are rolled up with `manage.py rebuild_rate_candles`)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fastest_exchange', '0002_exchange_rate_ticks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateCandle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency_from', models.CharField(choices=[('BWP', 'Bwp'), ('RMB', 'Rmb'), ('ETB', 'Etb'), ('GHC', 'Ghc')], max_length=10)),
+                ('currency_to', models.CharField(choices=[('BWP', 'Bwp'), ('RMB', 'Rmb'), ('ETB', 'Etb'), ('GHC', 'Ghc')], max_length=10)),
+                ('resolution', models.CharField(choices=[('1m', '1 minute'), ('1h', '1 hour'), ('1d', '1 day')], max_length=2)),
+                ('bucket_start', models.DateTimeField()),
+                ('open', models.DecimalField(decimal_places=8, max_digits=20)),
+                ('high', models.DecimalField(decimal_places=8, max_digits=20)),
+                ('low', models.DecimalField(decimal_places=8, max_digits=20)),
+                ('close', models.DecimalField(decimal_places=8, max_digits=20)),
+                ('tick_count', models.PositiveIntegerField(default=0)),
+                ('first_tick_at', models.DateTimeField()),
+                ('last_tick_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('currency_from', 'currency_to', 'resolution', 'bucket_start'), name='rate_candle_bucket_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# DB-configurable margin and volume-discount tiers (compiled by fastest_exchange.pricing)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fastest_exchange', '0003_rate_candles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PricingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('margin', 'Margin'), ('volume_discount', 'Volume discount')], max_length=20)),
+                ('currency_from', models.CharField(blank=True, default='', help_text='Blank matches any currency', max_length=10)),
+                ('currency_to', models.CharField(blank=True, default='', help_text='Blank matches any currency', max_length=10)),
+                ('min_amount', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('value', models.DecimalField(decimal_places=6, help_text='Fraction of the rate, e.g. 0.02 for 2%', max_digits=8)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['kind', 'currency_from', 'currency_to', 'min_amount'],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'currency_from', 'currency_to', 'min_amount'), name='pricing_rule_tier_uniq')],
+            },
+        ),
+    ]
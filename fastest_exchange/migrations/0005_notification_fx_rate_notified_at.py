@@ -0,0 +1,18 @@
+# Per-user cool-down for rate-change emails (fastest_exchange.messaging.fx_rate)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fastest_exchange', '0004_pricing_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='fx_rate_notified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Per-user MAX(updated_at) lookups for conditional GETs of the transaction list
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fastest_exchange', '0005_notification_fx_rate_notified_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'updated_at'], name='fastest_exc_user_id_5736df_idx'),
+        ),
+    ]
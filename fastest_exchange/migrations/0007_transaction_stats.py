@@ -0,0 +1,32 @@
+# Per-user transaction stats read model (rows are built on first read or by rebuild_transaction_stats)
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fastest_exchange', '0006_transaction_user_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='transaction_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_count', models.IntegerField(default=0)),
+                ('status_counts', models.JSONField(default=dict)),
+                ('type_counts', models.JSONField(default=dict)),
+                ('amount_sent_total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('amount_sent_count', models.IntegerField(default=0)),
+                ('daily_counts', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'Transaction Stats',
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Transaction search index (fastest_exchange.transaction_search): an FTS5 table on SQLite,
+# a pg_trgm-indexed table on PostgreSQL, filled with the existing transactions.
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SEARCH_TABLE = 'fastest_exchange_transaction_search'
+
+
+def create_search_table(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+            "owner, reference, document, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE TABLE {SEARCH_TABLE} ("
+            "rowid bigint PRIMARY KEY, owner varchar(32) NOT NULL, "
+            "reference varchar(32) NOT NULL, document text NOT NULL)"
+        )
+        for column in ('reference', 'document'):
+            schema_editor.execute(
+                f"CREATE INDEX {SEARCH_TABLE}_{column}_trgm ON {SEARCH_TABLE} USING gin ({column} gin_trgm_ops)"
+            )
+
+
+def index_existing_transactions(apps, schema_editor):
+    # Later writes are indexed by signals; index what is already there
+    from fastest_exchange.transaction_search import transaction_search
+
+    Transaction = apps.get_model('fastest_exchange', 'Transaction')
+    transaction_search.rebuild(Transaction.objects.using(schema_editor.connection.alias))
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fastest_exchange', '0007_transaction_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSearchEntry',
+            fields=[
+                ('transaction', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='fastest_exchange.transaction')),
+                ('owner', models.CharField(max_length=32)),
+                ('reference', models.CharField(max_length=32)),
+                ('document', models.TextField()),
+            ],
+            options={
+                'verbose_name_plural': 'Transaction Search Entries',
+                'db_table': 'fastest_exchange_transaction_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_table, drop_search_table),
+        migrations.RunPython(index_existing_transactions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Replay store of signed quote tokens: one row per quote executed by a swap
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fastest_exchange', '0008_transaction_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RedeemedQuote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nonce', models.CharField(max_length=32, unique=True)),
+                ('redeemed_at', models.DateTimeField(auto_now_add=True)),
+                ('swap', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='quote', to='fastest_exchange.swapengine')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redeemed_quotes', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
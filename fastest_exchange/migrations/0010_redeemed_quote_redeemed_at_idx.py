@@ -0,0 +1,17 @@
+# Index for pruning expired redeemed quotes
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fastest_exchange', '0009_redeemed_quote'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='redeemedquote',
+            index=models.Index(fields=['redeemed_at'], name='redeemed_quote_at_idx'),
+        ),
+    ]
@@ -406,6 +406,8 @@ class Notification(models.Model):
         User, related_name="notification", on_delete=models.CASCADE
     )
     fx_rate = models.BooleanField(default=False)
+    # Last rate-change email, for the per-user cool-down (fastest_exchange/messaging/fx_rate.py)
+    fx_rate_notified_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         indexes = [
@@ -505,16 +507,396 @@ class OperatingAccount(EditableModel):
 #         return "%s: B:%.2f S:%.2f" % (self.currency_pair.replace('_', "/"), self.buy, self.sell)
 
 
+class ExchangeRateManager(models.Manager):
+    """
+    Append-only access to rate ticks
+
+    Every rate change is a new ExchangeRate row; LatestExchangeRate keeps a
+    pointer to the newest tick of each pair so "current rate" reads are a
+    single unique-key lookup instead of a scan.
+    """
+
+    def append(self, currency_from, currency_to, rate, low_amount=None, low_amount_limit=None,
+               created_at=None):
+        """
+        Record a new tick for a pair and move its latest pointer
+
+        Low-amount tier fields that are not given are carried over from the
+        pair's previous tick.
+        """
+        return self.bulk_append([{
+            'currency_from': currency_from,
+            'currency_to': currency_to,
+            'rate': rate,
+            'low_amount': low_amount,
+            'low_amount_limit': low_amount_limit,
+            'created_at': created_at,
+        }])[0]
+
+    def bulk_append(self, rows, batch_size=500):
+        """
+        Insert many ticks in one transaction and update the latest pointers
+
+        Args:
+            rows: Dicts with currency_from, currency_to, rate and optionally
+                low_amount, low_amount_limit and created_at
+        """
+        from django.db import transaction
+
+        rows = list(rows)
+        if not rows:
+            return []
+
+        now = timezone.now()
+        with transaction.atomic(using=self.db):
+            # Newest known tick per pair; ticks older than it (backfills) do not move the pointer
+            newest = self.latest_for_pairs({(row['currency_from'], row['currency_to']) for row in rows})
+            ticks = []
+            for row in rows:
+                pair = (row['currency_from'], row['currency_to'])
+                carried = newest.get(pair)
+                tick = self.model(
+                    currency_from=pair[0],
+                    currency_to=pair[1],
+                    rate=row['rate'],
+                    low_amount=self._carry(row.get('low_amount'), carried, 'low_amount'),
+                    low_amount_limit=self._carry(row.get('low_amount_limit'), carried, 'low_amount_limit'),
+                    created_at=row.get('created_at') or now,
+                )
+                ticks.append(tick)
+                if carried is None or tick.created_at >= carried.created_at:
+                    newest[pair] = tick
+
+            self.bulk_create(ticks, batch_size=batch_size)
+
+            inserted = {id(tick) for tick in ticks}
+            pointers = []
+            for (currency_from, currency_to), tick in newest.items():
+                if id(tick) not in inserted:
+                    continue
+                if tick.pk is None:
+                    # Backends that cannot return primary keys from bulk inserts
+                    tick.pk = self.filter(
+                        currency_from=currency_from, currency_to=currency_to, created_at=tick.created_at
+                    ).order_by('-id').values_list('id', flat=True).first()
+                pointers.append(LatestExchangeRate(
+                    currency_from=currency_from, currency_to=currency_to, tick_id=tick.pk, updated_at=now
+                ))
+            LatestExchangeRate.objects.using(self.db).bulk_create(
+                pointers,
+                update_conflicts=True,
+                unique_fields=['currency_from', 'currency_to'],
+                update_fields=['tick', 'updated_at'],
+            )
+            RateCandle.objects.db_manager(self.db).record_ticks(ticks)
+        return ticks
+
+    def latest_for_pair(self, currency_from, currency_to):
+        """
+        Newest tick of a pair via its latest pointer, or None
+        """
+        pointer = LatestExchangeRate.objects.using(self.db).select_related('tick').filter(
+            currency_from=currency_from, currency_to=currency_to
+        ).first()
+        return pointer.tick if pointer else None
+
+    def latest_for_pairs(self, pairs=None):
+        """
+        {(currency_from, currency_to): newest tick} for the given pairs (or all)
+        """
+        pointers = LatestExchangeRate.objects.using(self.db).select_related('tick')
+        if pairs is not None:
+            pairs = set(pairs)
+            pointers = pointers.filter(
+                currency_from__in={p[0] for p in pairs}, currency_to__in={p[1] for p in pairs}
+            )
+        return {
+            (pointer.currency_from, pointer.currency_to): pointer.tick
+            for pointer in pointers
+            if pairs is None or (pointer.currency_from, pointer.currency_to) in pairs
+        }
+
+    @staticmethod
+    def _carry(value, previous, field):
+        if value is not None:
+            return value
+        return getattr(previous, field) if previous is not None else 0
+
+
 class ExchangeRate(models.Model):
+    """
+    One rate tick: ticks are only ever appended (see ExchangeRateManager)
+    """
     currency_from = models.CharField(choices=Currency.choices, max_length=10)
     currency_to = models.CharField(choices=Currency.choices, max_length=10)
     rate = models.DecimalField(max_digits=20, decimal_places=8)
     low_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
     low_amount_limit = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = ExchangeRateManager()
+
+    class Meta:
+        get_latest_by = ['created_at', 'id']
+        indexes = [
+            # Pair history and "newest tick of a pair" are index range reads
+            models.Index(
+                fields=["currency_from", "currency_to", "-created_at"],
+                name="rate_pair_created_idx",
+            ),
+        ]
     
     def __str__(self) -> str:
         return "%s to %s @%.2f" % (self.currency_from, self.currency_to, self.rate)
 
+
+class LatestExchangeRate(models.Model):
+    """
+    Pointer to the newest ExchangeRate tick of each currency pair
+    """
+    currency_from = models.CharField(choices=Currency.choices, max_length=10)
+    currency_to = models.CharField(choices=Currency.choices, max_length=10)
+    tick = models.ForeignKey(ExchangeRate, related_name="+", on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["currency_from", "currency_to"],
+                name="latest_rate_pair_uniq",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return "%s to %s -> tick %s" % (self.currency_from, self.currency_to, self.tick_id)
+
+
+class RateCandleManager(models.Manager):
+    """
+    Incrementally maintained OHLC rollups of rate ticks
+    """
+
+    def record_ticks(self, ticks):
+        """
+        Fold new ticks into their 1m, 1h and 1d candles
+
+        Ticks are first folded in memory, so a batch touches each candle
+        once: one read of the affected candles, then one bulk update and
+        one bulk insert. Out-of-order (backfilled) ticks only move a
+        candle's open/close when they are earlier/later than what it holds.
+        """
+        from django.db import IntegrityError, transaction
+
+        folded = {}
+        for tick in ticks:
+            for resolution in RateCandle.Resolution.values:
+                candle = self.model.from_tick(tick, resolution)
+                key = candle.key
+                if key in folded:
+                    folded[key].merge(candle)
+                else:
+                    folded[key] = candle
+        if not folded:
+            return 0
+
+        # A concurrent writer may insert one of our new buckets first; the
+        # retry then finds it and merges into it instead
+        for attempt in range(2):
+            try:
+                with transaction.atomic(using=self.db):
+                    return self._merge_into_stored(folded)
+            except IntegrityError:
+                if attempt:
+                    raise
+                for candle in folded.values():
+                    candle.pk = None
+
+    def _merge_into_stored(self, folded):
+        folded = dict(folded)
+        keys = list(folded)
+        stored = self.select_for_update().filter(
+            currency_from__in={key[0] for key in keys},
+            currency_to__in={key[1] for key in keys},
+            resolution__in={key[2] for key in keys},
+            bucket_start__in={key[3] for key in keys},
+        )
+        updated = []
+        for candle in stored:
+            incoming = folded.pop(candle.key, None)
+            if incoming is not None:
+                candle.merge(incoming)
+                updated.append(candle)
+
+        if updated:
+            self.bulk_update(updated, ['open', 'high', 'low', 'close', 'tick_count',
+                                       'first_tick_at', 'last_tick_at'])
+        self.bulk_create(list(folded.values()))
+        return len(updated) + len(folded)
+
+    def series(self, currency_from, currency_to, resolution, since, until=None):
+        """
+        Candles of a pair at one resolution, oldest first
+        """
+        candles = self.filter(
+            currency_from=currency_from,
+            currency_to=currency_to,
+            resolution=resolution,
+            bucket_start__gte=RateCandle.bucket_for(since, resolution),
+        )
+        if until is not None:
+            candles = candles.filter(bucket_start__lte=until)
+        return candles.order_by('bucket_start')
+
+
+class RateCandle(models.Model):
+    """
+    Open/high/low/close of a pair's rate ticks over one UTC time bucket
+    """
+
+    class Resolution(models.TextChoices):
+        MINUTE = "1m", _("1 minute")
+        HOUR = "1h", _("1 hour")
+        DAY = "1d", _("1 day")
+
+    BUCKET_SIZES = {
+        Resolution.MINUTE: datetime.timedelta(minutes=1),
+        Resolution.HOUR: datetime.timedelta(hours=1),
+        Resolution.DAY: datetime.timedelta(days=1),
+    }
+
+    currency_from = models.CharField(choices=Currency.choices, max_length=10)
+    currency_to = models.CharField(choices=Currency.choices, max_length=10)
+    resolution = models.CharField(choices=Resolution.choices, max_length=2)
+    bucket_start = models.DateTimeField()
+    open = models.DecimalField(max_digits=20, decimal_places=8)
+    high = models.DecimalField(max_digits=20, decimal_places=8)
+    low = models.DecimalField(max_digits=20, decimal_places=8)
+    close = models.DecimalField(max_digits=20, decimal_places=8)
+    tick_count = models.PositiveIntegerField(default=0)
+    first_tick_at = models.DateTimeField()
+    last_tick_at = models.DateTimeField()
+
+    objects = RateCandleManager()
+
+    class Meta:
+        constraints = [
+            # Also the index for range reads of one pair at one resolution
+            models.UniqueConstraint(
+                fields=["currency_from", "currency_to", "resolution", "bucket_start"],
+                name="rate_candle_bucket_uniq",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return "%s to %s %s @%s" % (self.currency_from, self.currency_to, self.resolution, self.bucket_start)
+
+    @classmethod
+    def bucket_for(cls, moment, resolution):
+        """
+        Start of the UTC bucket containing moment
+        """
+        moment = moment.astimezone(datetime.timezone.utc)
+        if resolution == cls.Resolution.MINUTE:
+            return moment.replace(second=0, microsecond=0)
+        if resolution == cls.Resolution.HOUR:
+            return moment.replace(minute=0, second=0, microsecond=0)
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def from_tick(cls, tick, resolution):
+        from decimal import Decimal
+
+        rate = Decimal(str(tick.rate))
+        return cls(
+            currency_from=tick.currency_from,
+            currency_to=tick.currency_to,
+            resolution=resolution,
+            bucket_start=cls.bucket_for(tick.created_at, resolution),
+            open=rate, high=rate, low=rate, close=rate,
+            tick_count=1,
+            first_tick_at=tick.created_at,
+            last_tick_at=tick.created_at,
+        )
+
+    @property
+    def key(self):
+        return (self.currency_from, self.currency_to, self.resolution, self.bucket_start)
+
+    def merge(self, other):
+        """
+        Fold another candle of the same bucket into this one
+        """
+        if other.first_tick_at < self.first_tick_at:
+            self.open, self.first_tick_at = other.open, other.first_tick_at
+        if other.last_tick_at >= self.last_tick_at:
+            self.close, self.last_tick_at = other.close, other.last_tick_at
+        self.high = max(self.high, other.high)
+        self.low = min(self.low, other.low)
+        self.tick_count += other.tick_count
+
+
+class PricingRule(models.Model):
+    """
+    One margin or volume-discount tier, compiled by fastest_exchange.pricing
+
+    A rule applies from min_amount upwards. Blank currencies match any
+    currency; for each kind a pair uses the most specific scope that has
+    rules (pair, then from-currency, then to-currency, then any), and
+    those rules replace the built-in defaults of that scope.
+    """
+
+    class Kind(models.TextChoices):
+        MARGIN = "margin", _("Margin")
+        VOLUME_DISCOUNT = "volume_discount", _("Volume discount")
+
+    kind = models.CharField(choices=Kind.choices, max_length=20)
+    currency_from = models.CharField(max_length=10, blank=True, default="", help_text=_("Blank matches any currency"))
+    currency_to = models.CharField(max_length=10, blank=True, default="", help_text=_("Blank matches any currency"))
+    min_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    value = models.DecimalField(max_digits=8, decimal_places=6, help_text=_("Fraction of the rate, e.g. 0.02 for 2%"))
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["kind", "currency_from", "currency_to", "min_amount"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "currency_from", "currency_to", "min_amount"],
+                name="pricing_rule_tier_uniq",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return "%s %s to %s from %s: %s" % (
+            self.kind, self.currency_from or "*", self.currency_to or "*", self.min_amount, self.value
+        )
+
+
+class RedeemedQuote(models.Model):
+    """
+    A signed quote token (fastest_exchange.quote_tokens) executed by a swap
+
+    The unique nonce is the replay store: it is inserted in the same
+    transaction that creates the swap, so a token is used at most once
+    across every worker process, and only by a swap that was committed.
+    Rows are pruned once their token has expired and can no longer be
+    replayed.
+    """
+
+    nonce = models.CharField(max_length=32, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="redeemed_quotes")
+    swap = models.OneToOneField(SwapEngine, on_delete=models.CASCADE, related_name="quote")
+    redeemed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Pruning deletes an index range of expired rows
+            models.Index(fields=["redeemed_at"], name="redeemed_quote_at_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return "Quote %s for swap %s" % (self.nonce, self.swap_id)
+
 class TransactionHistory(models.Model):
     STATUS_CHOICES = [
         ('processing', 'Processing'),
@@ -916,6 +1298,8 @@ class Transaction(models.Model):
         indexes = [
             models.Index(fields=['transaction_id']),
             models.Index(fields=['user', '-created_at']),
+            # MAX(updated_at) per user: conditional GET stamp of the transaction list
+            models.Index(fields=['user', 'updated_at']),
             models.Index(fields=['status']),
             models.Index(fields=['transaction_type']),
         ]
@@ -923,6 +1307,19 @@ class Transaction(models.Model):
     def __str__(self):
         return f"{self.transaction_id} - {self.transaction_type} - {self.status}"
     
+    # What the row contributes to its user's TransactionStats as last loaded or saved
+    _stats_state = None
+    
+    # Search fields of the row as last loaded or saved (TransactionSearchEntry)
+    _search_state = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stats_state = TransactionStats.state_of(instance)
+        instance._search_state = TransactionSearchEntry.state_of(instance)
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.transaction_id:
             self.transaction_id = self.generate_transaction_id()
@@ -987,3 +1384,242 @@ class TransactionStatusHistory(models.Model):
     
     def __str__(self):
         return f"{self.transaction.transaction_id}: {self.old_status} → {self.new_status}"
+
+
+class TransactionStatsManager(models.Manager):
+    """
+    Incremental maintenance and cold rebuilds of the per-user transaction stats
+    """
+
+    def for_user(self, user):
+        """
+        Stats of a user: one primary-key read, or a rebuild the first time
+        """
+        stats = self.filter(pk=user.pk).first()
+        if stats is None:
+            stats = self.rebuild([user.pk])[user.pk]
+        return stats
+
+    def record_change(self, old_state, new_state):
+        """
+        Move a transaction's contribution from old_state to new_state
+
+        Either state may be None (created / deleted transaction). A user
+        without a stats row yet gets a rebuild, which already counts the
+        change.
+        """
+        from django.db import transaction
+
+        if old_state == new_state:
+            return
+        changes = {}
+        if old_state is not None:
+            changes.setdefault(old_state[0], []).append((old_state, -1))
+        if new_state is not None:
+            changes.setdefault(new_state[0], []).append((new_state, 1))
+
+        with transaction.atomic(using=self.db):
+            for user_id, user_changes in changes.items():
+                stats = self.select_for_update().filter(pk=user_id).first()
+                if stats is None:
+                    if any(sign > 0 for _, sign in user_changes):
+                        self.rebuild([user_id])
+                    continue
+                for state, sign in user_changes:
+                    stats.apply(state, sign)
+                stats.prune()
+                stats.save()
+
+    def rebuild(self, user_ids=None):
+        """
+        Recompute stats from the transactions in one conditional-aggregation query
+
+        Args:
+            user_ids: Only these users (each gets a row, even without
+                transactions); by default every user with transactions
+
+        Returns:
+            {user_id: TransactionStats}
+        """
+        from decimal import Decimal
+
+        today = timezone.localdate()
+        days = [today - datetime.timedelta(days=offset) for offset in range(self.model.RECENT_DAYS + 1)]
+        aggregates = {
+            'total_count': models.Count('id'),
+            'amount_sent_total': models.Sum('amount_sent'),
+            'amount_sent_count': models.Count('amount_sent'),
+        }
+        for index, value in enumerate(TransactionStatus.values):
+            aggregates[f'status_{index}'] = models.Count('id', filter=models.Q(status=value))
+        for index, value in enumerate(TransactionType.values):
+            aggregates[f'type_{index}'] = models.Count('id', filter=models.Q(transaction_type=value))
+        for index, day in enumerate(days):
+            aggregates[f'day_{index}'] = models.Count('id', filter=models.Q(created_at__date=day))
+
+        transactions = Transaction.objects.using(self.db).order_by()
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            transactions = transactions.filter(user_id__in=user_ids)
+
+        stats = {user_id: self.model(user_id=user_id) for user_id in user_ids or ()}
+        for row in transactions.values('user_id').annotate(**aggregates):
+            stats[row['user_id']] = self.model(
+                user_id=row['user_id'],
+                total_count=row['total_count'],
+                status_counts=self._nonzero(TransactionStatus.values, row, 'status'),
+                type_counts=self._nonzero(TransactionType.values, row, 'type'),
+                amount_sent_total=Decimal(row['amount_sent_total'] or 0).quantize(Decimal('0.01')),
+                amount_sent_count=row['amount_sent_count'],
+                daily_counts=self._nonzero([day.isoformat() for day in days], row, 'day'),
+            )
+        if stats:
+            now = timezone.now()
+            for user_stats in stats.values():
+                user_stats.updated_at = now
+            self.using(self.db).bulk_create(
+                stats.values(),
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['total_count', 'status_counts', 'type_counts', 'amount_sent_total',
+                               'amount_sent_count', 'daily_counts', 'updated_at'],
+            )
+        return stats
+
+    @staticmethod
+    def _nonzero(keys, row, prefix):
+        return {key: row[f'{prefix}_{index}'] for index, key in enumerate(keys) if row[f'{prefix}_{index}']}
+
+
+class TransactionStats(models.Model):
+    """
+    Per-user transaction counters, kept up to date as transactions are
+    written (see the Transaction signals) so stats reads are one row
+    """
+
+    # "Recent activity" window, in days before today
+    RECENT_DAYS = 30
+
+    # Transaction fields the stats depend on
+    STATE_FIELDS = ('user_id', 'status', 'transaction_type', 'amount_sent', 'created_at')
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='transaction_stats'
+    )
+    total_count = models.IntegerField(default=0)
+    # Status / type value -> number of transactions
+    status_counts = models.JSONField(default=dict)
+    type_counts = models.JSONField(default=dict)
+    amount_sent_total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    # Transactions with an amount (the average's denominator)
+    amount_sent_count = models.IntegerField(default=0)
+    # Local creation date (ISO) -> number of transactions, for the last RECENT_DAYS days
+    daily_counts = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = TransactionStatsManager()
+
+    class Meta:
+        verbose_name_plural = "Transaction Stats"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.total_count} transaction(s)"
+
+    @classmethod
+    def state_of(cls, transaction):
+        """
+        (user_id, status, type, amount_sent, created_at) of a transaction, or None if not all loaded
+        """
+        if transaction.get_deferred_fields().intersection(cls.STATE_FIELDS):
+            return None
+        return tuple(getattr(transaction, field) for field in cls.STATE_FIELDS)
+
+    @classmethod
+    def window_start(cls):
+        return (timezone.localdate() - datetime.timedelta(days=cls.RECENT_DAYS)).isoformat()
+
+    def apply(self, state, sign):
+        """
+        Add (sign=1) or remove (sign=-1) one transaction's contribution
+        """
+        from decimal import Decimal
+
+        _, status, transaction_type, amount_sent, created_at = state
+        self.total_count += sign
+        self._bump(self.status_counts, status, sign)
+        self._bump(self.type_counts, transaction_type, sign)
+        if amount_sent is not None:
+            self.amount_sent_total = Decimal(self.amount_sent_total) + sign * Decimal(amount_sent)
+            self.amount_sent_count += sign
+        if created_at is not None:
+            day = timezone.localdate(created_at).isoformat()
+            if day >= self.window_start():
+                self._bump(self.daily_counts, day, sign)
+        self.updated_at = timezone.now()
+
+    def prune(self):
+        """
+        Forget days that left the recent-activity window
+        """
+        start = self.window_start()
+        self.daily_counts = {day: count for day, count in self.daily_counts.items() if day >= start}
+
+    @property
+    def recent_count(self):
+        start = self.window_start()
+        return sum(count for day, count in self.daily_counts.items() if day >= start)
+
+    @staticmethod
+    def _bump(counts, key, sign):
+        count = counts.get(key, 0) + sign
+        if count:
+            counts[key] = count
+        else:
+            counts.pop(key, None)
+
+
+class TransactionSearchEntry(models.Model):
+    """
+    Search document of one transaction, kept in a database-specific index
+    (an FTS5 table on SQLite, trigram-indexed on PostgreSQL) that migration
+    0008 creates; written and queried by fastest_exchange.transaction_search
+    """
+
+    # Transaction fields the document depends on
+    STATE_FIELDS = (
+        'user_id', 'transaction_id', 'notes', 'currency_from', 'currency_to', 'swap_reference_id',
+        'bank_transfer_reference_id', 'mobile_money_reference_id', 'cash_pickup_reference_id',
+        'beneficiary_reference_id',
+    )
+
+    transaction = models.OneToOneField(
+        Transaction,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='search_entry'
+    )
+    owner = models.CharField(max_length=32)
+    reference = models.CharField(max_length=32)
+    document = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'fastest_exchange_transaction_search'
+        verbose_name_plural = "Transaction Search Entries"
+
+    def __str__(self):
+        return f"{self.reference}: {self.document[:50]}"
+
+    @classmethod
+    def state_of(cls, transaction):
+        """
+        Values of the fields the document depends on, or None if not all loaded
+        """
+        if transaction.get_deferred_fields().intersection(cls.STATE_FIELDS):
+            return None
+        return tuple(getattr(transaction, field) for field in cls.STATE_FIELDS)
@@ -0,0 +1,39 @@
+"""
+Fixed-scale Money Arithmetic
+
+Every quote is priced in one Decimal context: conversion rates are held
+at RATE_QUANTUM (6 dp) and amounts at MINOR_UNIT (2 dp, i.e. integer
+minor units), always rounded half-up. Rates are brought into this scale
+once, when they are published to the rate snapshot, so pricing a quote
+is a single multiply and quantize with no float round-trips. Floats only
+appear at the JSON boundary.
+"""
+from decimal import Context, Decimal, ROUND_HALF_UP
+from typing import Union
+
+PRICING_CONTEXT = Context(prec=28, rounding=ROUND_HALF_UP)
+
+RATE_QUANTUM = Decimal('0.000001')
+MINOR_UNIT = Decimal('0.01')
+
+ONE = Decimal('1')
+
+
+def to_decimal(value: Union[Decimal, float, int, str]) -> Decimal:
+    """
+    Exact Decimal for a stored or provider value (floats via their shortest repr)
+    """
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value)) if isinstance(value, float) else Decimal(value)
+
+
+def quantize_rate(rate: Decimal) -> Decimal:
+    return rate.quantize(RATE_QUANTUM, context=PRICING_CONTEXT)
+
+
+def convert_amount(amount: Decimal, conversion_rate: Decimal) -> Decimal:
+    """
+    amount * conversion_rate in minor units
+    """
+    return PRICING_CONTEXT.multiply(amount, conversion_rate).quantize(MINOR_UNIT, context=PRICING_CONTEXT)
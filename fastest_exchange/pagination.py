@@ -1,4 +1,14 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -14,3 +24,176 @@ class StandardResultsSetPagination(PageNumberPagination):
         response.data["current_page"] = self.page.number
         response.data["total_pages"] = self.page.paginator.num_pages
         return response
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a (timestamp or number, unique id) key, descending
+
+    A page is the index range just after (or, following a previous link,
+    just before) the key of the last row seen, so page N costs the same
+    as page 1. Filters apply as usual; the total is only counted on
+    request (?count=true). Views may key a request differently (e.g. by
+    relevance) with get_pagination_ordering().
+    """
+
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    # Descending key; the second field breaks ties and must be unique
+    ordering = ('created_at', 'id')
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.key = self.get_ordering(view)
+        cursor = self.decode_cursor(request)
+        self.count = queryset.count() if self.count_requested(request) else None
+
+        field, tiebreaker = self.key
+        reverse = cursor is not None and cursor[0]
+        if cursor is not None:
+            value, last_id = cursor[1:]
+            # A range on the key (so the index seeks to it) minus the ties already seen
+            bound, seen = ('gte', 'lte') if reverse else ('lte', 'gte')
+            queryset = queryset.filter(
+                Q(**{f'{field}__{bound}': value}) & ~Q(**{field: value, f'{tiebreaker}__{seen}': last_id})
+            )
+        order = (field, tiebreaker) if reverse else (f'-{field}', f'-{tiebreaker}')
+        rows = list(queryset.order_by(*order)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        if rows:
+            self.first_key, self.last_key = self.key_of(rows[0]), self.key_of(rows[-1])
+        else:
+            # Empty page: both links continue from the cursor position
+            self.first_key = self.last_key = cursor[1:] if cursor is not None else None
+        return rows
+
+    def get_paginated_response(self, data):
+        response = {}
+        if self.count is not None:
+            response['count'] = self.count
+        response.update({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+        return Response(response)
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, view):
+        if hasattr(view, 'get_pagination_ordering'):
+            return view.get_pagination_ordering()
+        return self.ordering
+
+    def count_requested(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def get_next_link(self):
+        if not self.has_next or self.last_key is None:
+            return None
+        return self.encode_cursor(False, self.last_key)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_key is None:
+            return None
+        return self.encode_cursor(True, self.first_key)
+
+    def key_of(self, instance):
+        return tuple(getattr(instance, field) for field in self.key)
+
+    def encode_cursor(self, reverse, key):
+        value, last_id = key
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        payload = json.dumps([int(reverse), value, last_id], separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        """
+        (reverse, key value, id) of the cursor in the request, or None for the first page
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            reverse, value, last_id = json.loads(payload)
+            value = parse_datetime(value) if isinstance(value, str) else float(value)
+            if value is None:
+                raise ValueError(value)
+            return bool(reverse), value, int(last_id)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {
+                    'type': 'integer',
+                    'example': 123,
+                    'description': f'Only with ?{self.count_query_param}=true',
+                },
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                    'example': f'http://api.example.org/accounts/?{self.cursor_query_param}=WzAsIjIwMjYtMDEtMDEiLDQyXQ',
+                },
+                'previous': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value (from the next / previous links).',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Include the total number of results (one extra COUNT query).',
+                'schema': {'type': 'boolean'},
+            },
+        ]
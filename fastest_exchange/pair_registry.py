@@ -0,0 +1,160 @@
+"""
+Supported Currency Pairs Registry
+
+The list served by /api/exchange-rates/pairs/ is built once, from the
+LatestExchangeRate pointers (one row per stored pair, never the tick
+table), the pairs with a last-known-good rate and the providers, and
+then served from memory together with its ETag.
+
+Each pair carries its metadata: the sources that can price it, when its
+stored rate was last written, the advertised amount limits
+(EXCHANGE_PAIR_AMOUNT_LIMITS) and the amounts at which its price changes
+(pricing tiers and the low-amount limit).
+
+The registry is only rebuilt after rate writes or a pricing rule change.
+Writes in this process invalidate it at once; other processes notice on
+their next change check (a COUNT/MAX(updated_at) over the pointers at
+most every PAIR_REGISTRY_CHECK_INTERVAL seconds).
+"""
+import threading
+import time
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .conditional import make_etag
+from .models import LatestExchangeRate
+from .pricing import pricing_rules
+import logging
+
+logger = logging.getLogger(__name__)
+
+PAIR_REGISTRY_CHECK_INTERVAL = getattr(settings, 'PAIR_REGISTRY_CHECK_INTERVAL', 5)
+
+# Advertised amount limits per pair key: {'USD_NGN': (min, max)}, either may be None
+PAIR_AMOUNT_LIMITS = getattr(settings, 'EXCHANGE_PAIR_AMOUNT_LIMITS', {})
+
+
+class PairRegistry:
+    """
+    In-memory list of the pairs one rate service supports, with metadata
+    """
+
+    _instances: List['PairRegistry'] = []
+
+    def __init__(self, name: str, fallback_pairs: Callable[[], Iterable[Tuple[str, str]]],
+                 providers: Callable[[], Dict[str, Optional[Set[Tuple[str, str]]]]], check_interval: float):
+        """
+        Args:
+            fallback_pairs: Returns the pairs with a last-known-good rate
+            providers: Returns available provider name -> pairs it quotes, or None for any pair
+        """
+        self.name = name
+        self.fallback_pairs = fallback_pairs
+        self.providers = providers
+        self.check_interval = check_interval
+        self._pairs: Optional[List[Dict]] = None
+        self._etag: Optional[str] = None
+        self._stamp = None
+        self._table = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        PairRegistry._instances.append(self)
+
+    @classmethod
+    def invalidate_all(cls):
+        """
+        Re-check every registry on next use (called after rate writes)
+        """
+        for registry in cls._instances:
+            registry.invalidate()
+
+    def invalidate(self):
+        self._next_check = 0.0
+
+    def pairs(self) -> List[Dict]:
+        """
+        Supported pairs with their metadata (shared; callers must not modify it)
+        """
+        self._check()
+        return self._pairs
+
+    @property
+    def etag(self) -> str:
+        self._check()
+        return self._etag
+
+    def _check(self):
+        if (self._pairs is None or time.monotonic() >= self._next_check
+                or pricing_rules.table is not self._table):
+            self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        with self._lock:
+            table = pricing_rules.table
+            if (self._pairs is not None and time.monotonic() < self._next_check
+                    and table is self._table):
+                return
+            try:
+                stamp = LatestExchangeRate.objects.aggregate(count=Count('id'), changed=Max('updated_at'))
+                if self._pairs is None or stamp != self._stamp or table is not self._table:
+                    self._swap(self._build(table, stored=self._load_stored()), stamp, table)
+            except Exception as e:
+                logger.error(f"Error loading {self.name} supported pairs: {e}")
+                if self._pairs is None:
+                    self._swap(self._build(table, stored={}), None, table)
+            self._next_check = time.monotonic() + self.check_interval
+
+    def _swap(self, pairs: List[Dict], stamp, table):
+        self._pairs = pairs
+        self._etag = make_etag(self.name, pairs)
+        self._stamp = stamp
+        self._table = table
+        logger.debug(f"Rebuilt {self.name} supported pairs ({len(pairs)} pair(s))")
+
+    @staticmethod
+    def _load_stored() -> Dict[Tuple[str, str], Tuple]:
+        """
+        (updated_at, low-amount limit) of every pair with a stored rate
+        """
+        return {
+            (currency_from, currency_to): (updated_at, low_amount_limit)
+            for currency_from, currency_to, updated_at, low_amount_limit in
+            LatestExchangeRate.objects.values_list(
+                'currency_from', 'currency_to', 'updated_at', 'tick__low_amount_limit'
+            )
+        }
+
+    def _build(self, table, stored: Dict[Tuple[str, str], Tuple]) -> List[Dict]:
+        pairs = []
+        fallback_pairs = set(self.fallback_pairs())
+        providers = self.providers()
+        for from_currency, to_currency in sorted(set(stored) | fallback_pairs):
+            key = f"{from_currency}_{to_currency}"
+            updated_at, low_amount_limit = stored.get((from_currency, to_currency), (None, None))
+
+            sources = [name for name, quoted in providers.items()
+                       if quoted is None or (from_currency, to_currency) in quoted]
+            if updated_at is not None:
+                sources.append('database')
+            if (from_currency, to_currency) in fallback_pairs:
+                sources.append('last_known_good')
+
+            breakpoints = set(table.for_pair(from_currency, to_currency).breakpoints)
+            if low_amount_limit:
+                breakpoints.add(low_amount_limit)
+            min_amount, max_amount = PAIR_AMOUNT_LIMITS.get(key, (None, None))
+
+            pairs.append({
+                'from': from_currency,
+                'to': to_currency,
+                'pair': key,
+                'sources': sources,
+                'updated_at': updated_at.isoformat() if updated_at else None,
+                'min_amount': str(Decimal(str(min_amount))) if min_amount is not None else None,
+                'max_amount': str(Decimal(str(max_amount))) if max_amount is not None else None,
+                'amount_tiers': [format(amount.normalize(), 'f') for amount in sorted(breakpoints)],
+            })
+        return pairs
@@ -0,0 +1,238 @@
+"""
+Compiled Pricing Rules
+
+Margins and volume discounts are PricingRule rows (on top of built-in
+defaults) compiled into one immutable tier table per currency pair:
+sorted amount breakpoints plus the (margin, volume discount) that applies
+from each breakpoint upwards. A quote is a bisect over a handful of
+breakpoints instead of branching code, and both rate services, and
+through them SwapView, price with the same table.
+
+The table is only recompiled when the rules change. Saving or deleting a
+rule recompiles it in the saving process once the write commits; other
+processes notice within PRICING_RULES_CHECK_INTERVAL seconds, when the
+rate pipeline's background refresher runs check() (a COUNT/MAX(updated_at)
+query). Quotes never query the rules. Snapshot entries priced with a
+replaced table stop being served, so new rules apply immediately.
+"""
+import threading
+import time
+from bisect import bisect_right
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import PricingRule
+from .money import ONE, to_decimal
+
+logger = logging.getLogger(__name__)
+
+# Currencies where the customer is selling local currency (we apply the buy margin)
+LOCAL_CURRENCIES = ('NGN', 'UGX')
+
+# Margin for pairs without any margin rule, and below a pair's first margin tier
+DEFAULT_MARGIN = Decimal('0.02')
+
+# Default margins/spreads per currency pair (in percentage)
+DEFAULT_MARGINS = {
+    'NGN_USD': {'buy': 0.02, 'sell': 0.02},  # 2% margin
+    'USD_NGN': {'buy': 0.02, 'sell': 0.02},
+    'UGX_NGN': {'buy': 0.03, 'sell': 0.03},  # 3% margin
+    'NGN_UGX': {'buy': 0.03, 'sell': 0.03},
+    'USD_UGX': {'buy': 0.025, 'sell': 0.025},  # 2.5% margin
+    'UGX_USD': {'buy': 0.025, 'sell': 0.025},
+}
+
+# Volume discounts for every pair: (minimum amount, discount)
+DEFAULT_VOLUME_DISCOUNTS = (
+    (Decimal('5000'), Decimal('0.002')),   # 0.2% discount
+    (Decimal('10000'), Decimal('0.005')),  # 0.5% discount
+)
+
+PRICING_RULES_CHECK_INTERVAL = getattr(settings, 'PRICING_RULES_CHECK_INTERVAL', 5)
+
+ANY = ''
+
+
+def _default_rules() -> Dict[Tuple[str, str, str], List[Tuple[Decimal, Decimal]]]:
+    """
+    Built-in rules as {(kind, currency_from, currency_to): [(min_amount, value)]}
+    """
+    rules = {}
+    for pair, margin in DEFAULT_MARGINS.items():
+        from_currency, to_currency = pair.split('_')
+        # Only one side applies to a pair: the buy margin when the customer
+        # sells local currency, otherwise the sell margin
+        side = 'buy' if from_currency in LOCAL_CURRENCIES else 'sell'
+        rules[(PricingRule.Kind.MARGIN, from_currency, to_currency)] = [(Decimal('0'), to_decimal(margin[side]))]
+    rules[(PricingRule.Kind.VOLUME_DISCOUNT, ANY, ANY)] = list(DEFAULT_VOLUME_DISCOUNTS)
+    return rules
+
+
+class PairPricing:
+    """
+    Tier table of one currency pair
+
+    segments[i] applies to amounts from breakpoints[i - 1] (or 0) up to
+    breakpoints[i]; each segment is (margin, margin factor, volume multiplier),
+    all Decimals in the fixed-scale pricing context (fastest_exchange.money).
+    """
+
+    __slots__ = ('pair', 'breakpoints', 'segments', 'table')
+
+    def __init__(self, pair: str, breakpoints: Tuple[Decimal, ...], segments: Tuple, table: 'PricingTable'):
+        self.pair = pair
+        self.breakpoints = breakpoints
+        self.segments = segments
+        self.table = table
+
+    @property
+    def retired(self) -> bool:
+        return self.table.retired
+
+    def at(self, amount: Decimal) -> Tuple[Decimal, Decimal, Decimal]:
+        """
+        (margin, margin factor, volume multiplier) for an amount
+        """
+        return self.segments[bisect_right(self.breakpoints, amount)]
+
+
+class PricingTable:
+    """
+    Immutable set of rules, compiling per-pair tier tables on first use
+    """
+
+    def __init__(self, rules: Dict[Tuple[str, str, str], List[Tuple[Decimal, Decimal]]]):
+        self.rules = {key: sorted(tiers) for key, tiers in rules.items()}
+        self.retired = False
+        self._pairs: Dict[str, PairPricing] = {}
+
+    def for_pair(self, from_currency: str, to_currency: str) -> PairPricing:
+        pair = f"{from_currency}_{to_currency}"
+        pricing = self._pairs.get(pair)
+        if pricing is None:
+            pricing = self._pairs[pair] = self._compile(from_currency, to_currency)
+        return pricing
+
+    def _tiers(self, kind: str, from_currency: str, to_currency: str) -> List[Tuple[Decimal, Decimal]]:
+        """
+        Tiers of the most specific scope that has rules of this kind for the pair
+        """
+        for scope in ((from_currency, to_currency), (from_currency, ANY), (ANY, to_currency), (ANY, ANY)):
+            tiers = self.rules.get((kind, *scope))
+            if tiers:
+                return tiers
+        return []
+
+    def _compile(self, from_currency: str, to_currency: str) -> PairPricing:
+        margins = self._tiers(PricingRule.Kind.MARGIN, from_currency, to_currency)
+        discounts = self._tiers(PricingRule.Kind.VOLUME_DISCOUNT, from_currency, to_currency)
+        breakpoints = tuple(sorted({amount for amount, _ in margins + discounts if amount > 0}))
+        selling_local = from_currency in LOCAL_CURRENCIES
+
+        segments = []
+        for lower in (Decimal('0'),) + breakpoints:
+            margin = self._value_at(margins, lower, DEFAULT_MARGIN)
+            discount = self._value_at(discounts, lower, Decimal('0'))
+            # Lower rate when we buy, higher rate when we sell
+            margin_factor = ONE - margin if selling_local else ONE + margin
+            segments.append((margin, margin_factor, ONE - discount))
+        return PairPricing(f"{from_currency}_{to_currency}", breakpoints, tuple(segments), self)
+
+    @staticmethod
+    def _value_at(tiers: List[Tuple[Decimal, Decimal]], amount: Decimal, default: Decimal) -> Decimal:
+        value = default
+        for min_amount, tier_value in tiers:
+            if min_amount > amount:
+                break
+            value = tier_value
+        return value
+
+    def as_list(self) -> List[Dict]:
+        return [
+            {'kind': kind, 'currency_from': from_currency or '*', 'currency_to': to_currency or '*',
+             'min_amount': str(min_amount), 'value': str(value)}
+            for (kind, from_currency, to_currency), tiers in sorted(self.rules.items())
+            for min_amount, value in tiers
+        ]
+
+
+class PricingRules:
+    """
+    Current PricingTable of the process, reloaded when the rule set changes
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._table: Optional[PricingTable] = None
+        self._stamp = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def table(self) -> PricingTable:
+        # Loaded once; later changes arrive through check() and reload()
+        if self._table is None:
+            self._reload_if_changed(force=True)
+        return self._table
+
+    def for_pair(self, from_currency: str, to_currency: str) -> PairPricing:
+        return self.table.for_pair(from_currency, to_currency)
+
+    def check(self):
+        """
+        Reload the rules if they changed, at most every check_interval seconds (background refresher)
+        """
+        if time.monotonic() >= self._next_check:
+            self._reload_if_changed()
+
+    def reload(self):
+        """
+        Re-read the rules now (called when a rule is saved or deleted)
+        """
+        self._reload_if_changed(force=True)
+
+    def as_list(self) -> List[Dict]:
+        return self.table.as_list()
+
+    def _reload_if_changed(self, force: bool = False):
+        with self._lock:
+            if not force and self._table is not None and time.monotonic() < self._next_check:
+                return
+            try:
+                stamp = PricingRule.objects.aggregate(count=Count('id'), changed=Max('updated_at'))
+                if self._table is None or stamp != self._stamp:
+                    self._swap(self._load_rules(), stamp)
+            except Exception as e:
+                logger.error(f"Error loading pricing rules: {e}")
+                if self._table is None:
+                    self._swap(_default_rules(), None)
+            self._next_check = time.monotonic() + self.check_interval
+
+    def _swap(self, rules, stamp):
+        previous = self._table
+        self._table = PricingTable(rules)
+        self._stamp = stamp
+        if previous is not None:
+            previous.retired = True
+            logger.info(f"Recompiled pricing rules ({sum(len(t) for t in rules.values())} tier(s))")
+
+    @staticmethod
+    def _load_rules():
+        """
+        Built-in rules with every (kind, pair scope) that has active DB rules replaced by them
+        """
+        stored = {}
+        for rule in PricingRule.objects.filter(is_active=True):
+            key = (rule.kind, rule.currency_from.upper(), rule.currency_to.upper())
+            stored.setdefault(key, []).append((rule.min_amount, rule.value))
+        rules = _default_rules()
+        rules.update(stored)
+        return rules
+
+
+# Shared by ExchangeRateService, QuidaxExchangeRateService and SwapView
+pricing_rules = PricingRules(PRICING_RULES_CHECK_INTERVAL)
@@ -0,0 +1,100 @@
+"""
+Hedged Provider Fetcher
+
+Fans a request out across several upstream providers and returns the
+first valid answer. Providers are started in priority order; the next
+one is fired as soon as the previous fails or has been outstanding for
+longer than the hedge delay, so one slow upstream no longer stalls the
+whole lookup. Providers that have not started yet when an answer arrives
+are cancelled.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Shared worker pool for outbound provider calls
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='rate-provider')
+
+
+class ProviderCall:
+    """
+    One provider attempt: a callable plus its own timeout budget (seconds)
+    """
+
+    __slots__ = ('name', 'func', 'timeout')
+
+    def __init__(self, name: str, func: Callable[[float], Any], timeout: float):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+
+
+def fetch_first(calls: List[ProviderCall], hedge_delay: float, deadline: float,
+                is_valid: Callable[[Any], bool] = bool) -> Optional[Tuple[str, Any, float]]:
+    """
+    Run provider calls with hedging and return the first valid result
+
+    Args:
+        calls: Provider attempts in priority order
+        hedge_delay: Seconds to wait on an outstanding call before firing
+            the next provider (0 fires every provider at once)
+        deadline: Overall budget in seconds for the whole lookup
+        is_valid: Predicate deciding whether a result is usable
+
+    Returns:
+        (provider name, result, latency in seconds) or None
+    """
+    if not calls:
+        return None
+
+    started = time.monotonic()
+    expires = started + deadline
+    pending = {}
+    queue = list(calls)
+
+    def launch():
+        call = queue.pop(0)
+        future = _executor.submit(_timed, call, started)
+        pending[future] = call
+
+    try:
+        launch()
+        while queue and hedge_delay <= 0:
+            launch()
+
+        while pending:
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"Provider deadline of {deadline}s exceeded "
+                               f"({', '.join(c.name for c in pending.values())} outstanding)")
+                return None
+
+            timeout = min(hedge_delay, remaining) if queue else remaining
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                call = pending.pop(future)
+                try:
+                    result, latency = future.result()
+                except Exception as e:
+                    logger.warning(f"Provider {call.name} failed: {e}")
+                    continue
+                if is_valid(result):
+                    return call.name, result, latency
+
+            # Fire the next provider on failure or once the hedge delay elapses,
+            # unless the deadline has run out meanwhile
+            if queue and time.monotonic() < expires:
+                launch()
+        return None
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _timed(call: ProviderCall, started: float) -> Tuple[Any, float]:
+    result = call.func(call.timeout)
+    return result, time.monotonic() - started
@@ -7,12 +7,17 @@ rate caching, and fallback mechanisms.
 Based on Quidax API documentation: https://docs.quidax.ng/docs/getting-started
 """
 import requests
-from decimal import Decimal, ROUND_HALF_UP
-from typing import Dict, Optional, List
+from decimal import Decimal
+from typing import Dict, Optional, List, Tuple
 from django.core.cache import cache
 from django.utils import timezone
 from django.conf import settings
-from .models import ExchangeRate, Currency
+from .models import ExchangeRate
+from .rate_pipeline import rate_pipeline
+from .rate_providers import CACHE_TIMEOUT, FALLBACK_CACHE_TIMEOUT, quidax_provider
+from .last_known_good import SEED_RATES
+from .rate_snapshot import RateEntry
+from .money import convert_amount
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,40 +26,56 @@ logger = logging.getLogger(__name__)
 class QuidaxExchangeRateService:
     """
     Quidax-based service for managing dynamic exchange rates
+    
+    Rates come from the shared rate pipeline (fastest_exchange.rate_pipeline),
+    where Quidax is one provider plugin; this service adds the Quidax API
+    client, ticker ingestion and batch pricing.
     """
     
     # Cache timeouts in seconds
-    CACHE_TIMEOUT = 300  # 5 minutes for live rates
-    FALLBACK_CACHE_TIMEOUT = 3600  # 1 hour for fallback rates
+    CACHE_TIMEOUT = CACHE_TIMEOUT
+    FALLBACK_CACHE_TIMEOUT = FALLBACK_CACHE_TIMEOUT
     
     # Quidax API configuration
-    BASE_URL = getattr(settings, 'QUIDAX_BASE_URL', 'https://www.quidax.com/api/v1')
-    API_KEY = getattr(settings, 'QUIDAX_API_KEY', '')
+    BASE_URL = quidax_provider.base_url
+    API_KEY = quidax_provider.api_key
     SECRET_KEY = getattr(settings, 'QUIDAX_SECRET_KEY', '')
     SANDBOX_MODE = getattr(settings, 'QUIDAX_SANDBOX_MODE', True)
     
-    # Default margins/spreads per currency pair (in percentage)
-    DEFAULT_MARGINS = {
-        'NGN_USD': {'buy': 0.02, 'sell': 0.02},  # 2% margin
-        'USD_NGN': {'buy': 0.02, 'sell': 0.02},
-        'UGX_NGN': {'buy': 0.03, 'sell': 0.03},  # 3% margin
-        'NGN_UGX': {'buy': 0.03, 'sell': 0.03},
-        'USD_UGX': {'buy': 0.025, 'sell': 0.025}, # 2.5% margin
-        'UGX_USD': {'buy': 0.025, 'sell': 0.025},
-    }
+    # Quidax markets used to price fiat pairs: market -> (base, quote)
+    MARKET_PAIRS = quidax_provider.market_pairs
+    
+    # Rates pushed by the ticker ingestion worker (ingest_quidax_tickers).
+    # With TICKER_INGESTION enabled, user requests never call Quidax directly.
+    TICKER_INGESTION = not quidax_provider.enabled
+    TICKER_TTL = getattr(settings, 'QUIDAX_TICKER_TTL', 15)
+    TICKER_INTERVAL = getattr(settings, 'QUIDAX_TICKER_INTERVAL', 2)
+    
+    # Pairs covered by the seed rates (every host can quote them)
+    FALLBACK_PAIRS = sorted(tuple(pair.split('_')) for pair in SEED_RATES)
+    
+    # The market list rarely changes; cached so clients can revalidate it cheaply
+    MARKETS_CACHE_TIMEOUT = 60
+    
+    # Cache, snapshot and pair registry shared with ExchangeRateService
+    rate_cache = rate_pipeline.rate_cache
+    snapshot = rate_pipeline.snapshot
+    pair_registry = rate_pipeline.pair_registry
     
     @classmethod
     def _get_headers(cls) -> Dict[str, str]:
         """Get headers for Quidax API requests"""
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json',
-        }
+        return quidax_provider.headers()
+    
+    @classmethod
+    def _request(cls, path: str) -> requests.Response:
+        """
+        GET a Quidax API path through the provider circuit breaker
         
-        if cls.API_KEY:
-            headers['Authorization'] = f'Bearer {cls.API_KEY}'
-            
-        return headers
+        Raises CircuitOpenError without touching the network while Quidax
+        is known to be down; 5xx responses count as failures.
+        """
+        return quidax_provider.request(path)
     
     @classmethod
     def get_exchange_rate(cls, from_currency: str, to_currency: str, amount: Optional[Decimal] = None) -> Dict:
@@ -72,229 +93,76 @@ class QuidaxExchangeRateService:
         if from_currency == to_currency:
             return {'error': 'Cannot exchange the same currency'}
             
-        # Try to get cached rate first
-        cache_key = f"quidax_rate_{from_currency}_{to_currency}"
-        cached_rate = cache.get(cache_key)
-        
-        if cached_rate:
-            logger.info(f"Using cached Quidax rate for {from_currency}->{to_currency}")
-            return cls._apply_amount_based_pricing(cached_rate, amount)
-        
-        # Try to get rate from Quidax API
-        quidax_rate = cls._fetch_quidax_rate(from_currency, to_currency)
-        if quidax_rate and 'error' not in quidax_rate:
-            # Cache the Quidax rate
-            cache.set(cache_key, quidax_rate, cls.CACHE_TIMEOUT)
-            return cls._apply_amount_based_pricing(quidax_rate, amount)
-        
-        # Try to get rate from database as fallback
-        db_rate = cls._get_db_rate(from_currency, to_currency)
-        if db_rate and 'error' not in db_rate:
-            # Cache the database rate
-            cache.set(cache_key, db_rate, cls.CACHE_TIMEOUT)
-            return cls._apply_amount_based_pricing(db_rate, amount)
-        
-        # Use hardcoded fallback rates
-        fallback_rate = cls._get_fallback_rate(from_currency, to_currency)
-        if fallback_rate:
-            cache.set(cache_key, fallback_rate, cls.FALLBACK_CACHE_TIMEOUT)
-            return cls._apply_amount_based_pricing(fallback_rate, amount)
+        entry = cls._get_rate_entry(from_currency, to_currency)
+        if entry is not None:
+            return entry.quote(amount)
         
         return {
             'error': f'Exchange rate not available for {from_currency} to {to_currency}'
         }
     
     @classmethod
-    def _fetch_quidax_rate(cls, from_currency: str, to_currency: str) -> Optional[Dict]:
+    def _get_rate_entry(cls, from_currency: str, to_currency: str) -> Optional[RateEntry]:
         """
-        Fetch exchange rate from Quidax API
-        
-        Based on Quidax API documentation for getting market data
+        Published snapshot entry for a pair, resolving and publishing it if needed
         """
-        try:
-            # Quidax uses market pairs format like BTCNGN, USDTNGN etc.
-            # For fiat-to-fiat, we need to handle differently
-            
-            if from_currency == 'USD' and to_currency == 'NGN':
-                # Get USD/NGN rate from Quidax USDT/NGN market (approximation)
-                market = 'USDTNGN'
-            elif from_currency == 'NGN' and to_currency == 'USD':
-                # Get NGN/USD rate (inverse of USD/NGN)
-                market = 'USDTNGN'
-            else:
-                # For other currency pairs, we'll need to use fallback
-                logger.info(f"Quidax doesn't directly support {from_currency}/{to_currency} pair")
-                return None
-            
-            url = f"{cls.BASE_URL}/markets/{market}/tickers"
-            
-            response = requests.get(
-                url,
-                headers=cls._get_headers(),
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                if 'data' in data and 'last_price' in data['data']:
-                    rate = float(data['data']['last_price'])
-                    
-                    # If we're converting NGN to USD, we need the inverse
-                    if from_currency == 'NGN' and to_currency == 'USD':
-                        rate = 1 / rate
-                    
-                    return {
-                        'rate': rate,
-                        'source': 'quidax_api',
-                        'timestamp': timezone.now().isoformat(),
-                        'pair': f"{from_currency}_{to_currency}",
-                        'market': market,
-                        'raw_data': data['data']
-                    }
-                else:
-                    logger.error(f"Unexpected Quidax API response format: {data}")
-                    return None
-            else:
-                logger.error(f"Quidax API returned status {response.status_code}: {response.text}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Error fetching rate from Quidax API: {e}")
-            return None
+        return rate_pipeline.get_rate_entry(from_currency, to_currency)
     
     @classmethod
-    def _get_db_rate(cls, from_currency: str, to_currency: str) -> Optional[Dict]:
+    def _fetch_quidax_rate(cls, from_currency: str, to_currency: str) -> Optional[Dict]:
         """
-        Get exchange rate from database as fallback
+        Fetch exchange rate from Quidax API (the quidax provider plugin)
         """
-        try:
-            # Find the most recent rate for this currency pair
-            rate_obj = ExchangeRate.objects.filter(
-                currency_from=from_currency,
-                currency_to=to_currency
-            ).order_by('-created_at').first()
-            
-            if not rate_obj:
-                return None
-            
-            # Check if rate is too old (older than 1 hour)
-            time_diff = timezone.now() - rate_obj.created_at
-            if time_diff.total_seconds() > 3600:  # 1 hour
-                logger.warning(f"Database rate for {from_currency}->{to_currency} is outdated")
-                return None
-            
-            return {
-                'rate': float(rate_obj.rate),
-                'source': 'database_fallback',
-                'timestamp': rate_obj.created_at.isoformat(),
-                'pair': f"{from_currency}_{to_currency}"
-            }
-            
-        except Exception as e:
-            logger.error(f"Error fetching DB rate for {from_currency}->{to_currency}: {e}")
-            return None
+        return quidax_provider.fetch(from_currency, to_currency)
     
     @classmethod
-    def _get_fallback_rate(cls, from_currency: str, to_currency: str) -> Optional[Dict]:
+    def _market_for(cls, from_currency: str, to_currency: str) -> Optional[str]:
         """
-        Get hardcoded fallback static rates
+        Quidax market quoting a currency pair in either direction
         """
-        FALLBACK_RATES = {
-            'NGN_USD': 1610,  # Divide NGN by 1610 to get USD
-            'USD_NGN': 1550,  # Multiply USD by 1550 to get NGN
-            'UGX_NGN': 2.35,  # Multiply UGX by 2.35 to get NGN
-            'NGN_UGX': 2.27,  # Multiply NGN by 2.27 to get UGX
-            'USD_UGX': 3700,  # Multiply USD by 3700 to get UGX  
-            'UGX_USD': 3800,  # Divide UGX by 3800 to get USD
-        }
-        
-        pair_key = f"{from_currency}_{to_currency}"
-        
-        if pair_key in FALLBACK_RATES:
-            rate_value = FALLBACK_RATES[pair_key]
-            
-            # For division pairs (like NGN_USD, UGX_USD), rate is 1/value
-            if pair_key in ['NGN_USD', 'UGX_USD']:
-                final_rate = 1 / rate_value
-            else:
-                final_rate = rate_value
-            
-            return {
-                'rate': final_rate,
-                'source': 'fallback_static',
-                'timestamp': timezone.now().isoformat(),
-                'pair': pair_key,
-                'raw_rate': rate_value
-            }
-        
-        return None
+        return quidax_provider.market_for(from_currency, to_currency)
     
     @classmethod
-    def _apply_amount_based_pricing(cls, rate_info: Dict, amount: Optional[Decimal]) -> Dict:
+    def ingest_ticker(cls, market: str, ticker: Dict) -> List[Dict]:
         """
-        Apply amount-based tiered pricing and margins
-        """
-        if not amount:
-            return rate_info
-        
-        base_rate = rate_info['rate']
-        pair = rate_info['pair']
+        Push a ticker received outside a user request into the rate store
         
-        # Apply margins
-        margin_config = cls.DEFAULT_MARGINS.get(pair, {'buy': 0.02, 'sell': 0.02})
-        
-        # For customer buying foreign currency (we sell), apply sell margin
-        # For customer selling foreign currency (we buy), apply buy margin
-        from_currency, to_currency = pair.split('_')
-        
-        if from_currency in ['NGN', 'UGX']:  # Customer selling local currency
-            margin = margin_config['buy']
-            adjusted_rate = base_rate * (1 - margin)  # Lower rate when we buy
-        else:  # Customer buying local currency  
-            margin = margin_config['sell']
-            adjusted_rate = base_rate * (1 + margin)  # Higher rate when we sell
-        
-        # Apply volume-based discounts
-        volume_multiplier = 1.0
-        if amount >= Decimal('10000'):  # Large transactions get better rates
-            volume_multiplier = 0.995  # 0.5% discount
-        elif amount >= Decimal('5000'):  # Medium transactions
-            volume_multiplier = 0.998  # 0.2% discount
-        
-        final_rate = adjusted_rate * volume_multiplier
-        
-        rate_info.update({
-            'original_rate': base_rate,
-            'margin_applied': margin,
-            'volume_discount': 1 - volume_multiplier,
-            'final_rate': final_rate,
-            'rate': final_rate  # Override the rate with final calculated rate
-        })
-        
-        return rate_info
+        Both directions of the market's pair are written to the shared rate
+        cache for TICKER_TTL seconds, so lookups are answered without
+        calling Quidax. Used by the ingest_quidax_tickers command.
+        """
+        base, quote = cls.MARKET_PAIRS[market]
+        ingested = []
+        for from_currency, to_currency in ((base, quote), (quote, base)):
+            rate_info = quidax_provider.rate_from_ticker(from_currency, to_currency, market, ticker)
+            if rate_info is None:
+                continue
+            rate_info['source'] = 'quidax_ticker'
+            rate_pipeline.push(rate_info, cls.TICKER_TTL)
+            ingested.append(rate_info)
+        return ingested
     
     @classmethod
     def get_quidax_markets(cls) -> Dict:
         """
-        Get all available markets from Quidax
+        Get all available markets from Quidax (cached for MARKETS_CACHE_TIMEOUT)
         """
+        markets = cache.get('quidax_markets')
+        if markets is not None:
+            return markets
+        
         try:
-            url = f"{cls.BASE_URL}/markets"
-            
-            response = requests.get(
-                url,
-                headers=cls._get_headers(),
-                timeout=10
-            )
+            response = cls._request("/markets")
             
             if response.status_code == 200:
                 data = response.json()
-                return {
+                markets = {
                     'markets': data.get('data', []),
                     'source': 'quidax_api',
                     'timestamp': timezone.now().isoformat()
                 }
+                cache.set('quidax_markets', markets, cls.MARKETS_CACHE_TIMEOUT)
+                return markets
             else:
                 logger.error(f"Failed to fetch Quidax markets: {response.status_code}")
                 return {'error': 'Failed to fetch markets from Quidax'}
@@ -312,13 +180,7 @@ class QuidaxExchangeRateService:
             market: Market symbol like 'BTCNGN', 'USDTNGN'
         """
         try:
-            url = f"{cls.BASE_URL}/markets/{market}/tickers"
-            
-            response = requests.get(
-                url,
-                headers=cls._get_headers(),
-                timeout=10
-            )
+            response = cls._request(f"/markets/{market}/tickers")
             
             if response.status_code == 200:
                 data = response.json()
@@ -341,69 +203,129 @@ class QuidaxExchangeRateService:
                            low_amount: Optional[Decimal] = None, 
                            low_amount_limit: Optional[Decimal] = None) -> ExchangeRate:
         """
-        Update or create an exchange rate in the database
-        """
-        exchange_rate, created = ExchangeRate.objects.update_or_create(
-            currency_from=from_currency,
-            currency_to=to_currency,
-            defaults={
-                'rate': rate,
-                'low_amount': low_amount,
-                'low_amount_limit': low_amount_limit,
-            }
-        )
-        
-        # Clear cache for this currency pair
-        cache_key = f"quidax_rate_{from_currency}_{to_currency}"
-        cache.delete(cache_key)
-        
-        logger.info(f"{'Created' if created else 'Updated'} exchange rate: {from_currency}->{to_currency} @ {rate}")
+        Record a new exchange rate tick in the database
         
-        return exchange_rate
+        Ticks are append-only so the pair's history is kept; low-amount tier
+        fields that are not given carry over from the previous tick.
+        """
+        return rate_pipeline.record([{
+            'currency_from': from_currency,
+            'currency_to': to_currency,
+            'rate': rate,
+            'low_amount': low_amount,
+            'low_amount_limit': low_amount_limit,
+        }])[0]
     
     @classmethod
-    def get_supported_currency_pairs(cls) -> List[Dict[str, str]]:
+    def get_supported_currency_pairs(cls) -> List[Dict]:
         """
-        Get list of supported currency pairs
+        Get list of supported currency pairs with their metadata (see PairRegistry)
         """
-        # Get pairs from database
-        db_pairs = list(ExchangeRate.objects.values_list('currency_from', 'currency_to'))
-        
-        # Add fallback pairs that we support
-        fallback_pairs = [
-            ('NGN', 'USD'), ('USD', 'NGN'),
-            ('UGX', 'NGN'), ('NGN', 'UGX'),
-            ('USD', 'UGX'), ('UGX', 'USD')
-        ]
+        return cls.pair_registry.pairs()
+    
+    @classmethod
+    def price_conversion(cls, from_currency: str, to_currency: str, amount: Decimal) -> Dict:
+        """
+        Price a conversion in the fixed-scale Decimal pipeline (fastest_exchange.money)
         
-        all_pairs = list(set(db_pairs + fallback_pairs))
-        return [{'from': pair[0], 'to': pair[1]} for pair in all_pairs]
+        Returns:
+            Dict with rate_info, the Decimal exchange_rate (6 dp) and
+            converted_amount (minor units), or error
+        """
+        return rate_pipeline.price(from_currency, to_currency, amount)
     
     @classmethod
-    def calculate_conversion(cls, from_currency: str, to_currency: str, amount: Decimal) -> Dict:
+    def calculate_conversion(cls, from_currency: str, to_currency: str, amount: Decimal,
+                             priced: Optional[Dict] = None) -> Dict:
         """
         Calculate complete currency conversion with all details
-        """
-        rate_info = cls.get_exchange_rate(from_currency, to_currency, amount)
         
-        if 'error' in rate_info:
-            return rate_info
-        
-        conversion_rate = Decimal(str(rate_info['rate'])).quantize(
-            Decimal('0.000001'), rounding=ROUND_HALF_UP
-        )
+        Args:
+            priced: price_conversion result for the same conversion, if already priced
+        """
+        if priced is None:
+            priced = cls.price_conversion(from_currency, to_currency, amount)
         
-        converted_amount = (amount * conversion_rate).quantize(
-            Decimal('0.01'), rounding=ROUND_HALF_UP
-        )
+        if 'error' in priced:
+            return priced
         
         return {
             'from_currency': from_currency,
             'to_currency': to_currency,
             'amount_sent': float(amount),
-            'converted_amount': float(converted_amount),
-            'exchange_rate': float(conversion_rate),
-            'rate_info': rate_info,
+            'converted_amount': float(priced['converted_amount']),
+            'exchange_rate': float(priced['exchange_rate']),
+            'rate_info': priced['rate_info'],
+            'calculation_time': timezone.now().isoformat(),
+            'service_provider': 'quidax'
+        }
+    
+    @classmethod
+    def calculate_conversions(cls, items: List[Tuple[str, str, Decimal]],
+                              errors: Optional[Dict[int, str]] = None) -> Dict:
+        """
+        Price many (from_currency, to_currency, amount) items in one pass
+        
+        Items are grouped by pair so each rate is resolved once; every
+        amount is then one tier lookup plus one fixed-scale multiply, the
+        same pipeline as calculate_conversion. Results are column arrays
+        aligned with the input.
+        
+        Args:
+            items: (from_currency, to_currency, amount) tuples
+            errors: Already rejected item indices (e.g. invalid input), left unpriced
+        
+        Returns:
+            Dict of columns plus per-pair rate info and per-index errors
+        """
+        count = len(items)
+        converted_amounts: List[Optional[float]] = [None] * count
+        exchange_rates: List[Optional[float]] = [None] * count
+        errors = dict(errors or {})
+        pairs: Dict[str, Dict] = {}
+        
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        for index, (from_currency, to_currency, _) in enumerate(items):
+            if index in errors:
+                continue
+            groups.setdefault((from_currency, to_currency), []).append(index)
+        
+        for (from_currency, to_currency), indices in groups.items():
+            pair = f"{from_currency}_{to_currency}"
+            entry = None
+            if from_currency == to_currency:
+                error = 'Cannot exchange the same currency'
+            else:
+                entry = cls._get_rate_entry(from_currency, to_currency)
+                error = f'Exchange rate not available for {from_currency} to {to_currency}'
+            if entry is None:
+                for index in indices:
+                    errors[index] = error
+                continue
+            
+            pairs[pair] = {
+                'rate': entry.info['rate'],
+                'source': entry.info.get('source', 'unknown'),
+                'timestamp': entry.info.get('timestamp'),
+                'margin_applied': entry.margin,
+            }
+            
+            # Tier conversion rates are already at the fixed pricing scale
+            for index in indices:
+                amount = items[index][2]
+                conversion_rate = entry.tier(amount)[4] if amount else entry.conversion_rate
+                exchange_rates[index] = float(conversion_rate)
+                converted_amounts[index] = float(convert_amount(amount, conversion_rate))
+        
+        return {
+            'count': count,
+            'from_currency': [item[0] for item in items],
+            'to_currency': [item[1] for item in items],
+            'amount_sent': [float(item[2]) for item in items],
+            'converted_amount': converted_amounts,
+            'exchange_rate': exchange_rates,
+            'pairs': pairs,
+            'errors': errors,
             'calculation_time': timezone.now().isoformat(),
             'service_provider': 'quidax'
         }
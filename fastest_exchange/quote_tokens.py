@@ -0,0 +1,162 @@
+"""
+Signed Quote Tokens
+
+A conversion quote requested by a signed-in user is returned together
+with a signed, time-limited token carrying the priced figures (as
+Decimal strings) and the user's id. SwapView accepts the token from that
+user and executes at the quoted rate without pricing the swap a second
+time, so the customer gets exactly the price they were shown.
+
+Verification is stateless (HMAC signature and timestamp check with
+django.core.signing). The only state is the replay store: the token's
+nonce is inserted as a RedeemedQuote (unique nonce) in the same
+transaction that creates the swap, so every worker process sees it and a
+swap that fails leaves the token unused. Once a token has expired it
+cannot be replayed, so its row is pruned (at most every
+QUOTE_PRUNE_INTERVAL seconds per process, after a claim commits).
+"""
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import RedeemedQuote
+from .money import to_decimal
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUOTE_SALT = 'fastest_exchange.quote'
+QUOTE_TTL = getattr(settings, 'EXCHANGE_QUOTE_TTL', 60)
+QUOTE_PRUNE_INTERVAL = getattr(settings, 'EXCHANGE_QUOTE_PRUNE_INTERVAL', 300)
+
+# Redeemed quotes are kept this long past the token lifetime (clock skew between workers)
+QUOTE_RETENTION_MARGIN = 300
+
+_next_prune = 0.0
+
+
+class QuoteError(Exception):
+    """
+    Raised when a quote token is invalid, expired, reused or does not match the swap
+    """
+
+
+def _decimal_string(value) -> Optional[str]:
+    return None if value is None else str(to_decimal(value))
+
+
+def issue_quote(user_id, from_currency: str, to_currency: str, amount: Decimal, priced: Dict) -> Dict:
+    """
+    Sign a priced conversion (as returned by price_conversion) for a user
+
+    Returns:
+        Dict with quote_token and quote_expires_at to add to the response
+    """
+    rate_info = priced.get('rate_info', {})
+    payload = {
+        'n': uuid.uuid4().hex,
+        'u': user_id,
+        'f': from_currency,
+        't': to_currency,
+        'a': str(amount),
+        'c': str(priced['converted_amount']),
+        'r': str(priced['exchange_rate']),
+        's': rate_info.get('source', 'unknown'),
+        'm': _decimal_string(rate_info.get('margin_applied')),
+        'v': _decimal_string(rate_info.get('volume_discount')),
+    }
+    return {
+        'quote_token': signing.dumps(payload, salt=QUOTE_SALT, compress=True),
+        'quote_expires_at': (timezone.now() + timedelta(seconds=QUOTE_TTL)).isoformat(),
+    }
+
+
+def redeem_quote(token: str, user_id, from_currency: str, to_currency: str, amount_sent) -> Dict:
+    """
+    Verify a quote token for a user's swap (claim it with claim_quote when creating the swap)
+
+    Returns:
+        Dict with the token's nonce, the quoted Decimal converted_amount
+        and exchange_rate, and rate_info
+
+    Raises:
+        QuoteError: If the token is tampered with, expired, or was issued
+            to another user or for a different pair or amount
+    """
+    try:
+        payload = signing.loads(token, salt=QUOTE_SALT, max_age=QUOTE_TTL)
+    except signing.SignatureExpired:
+        raise QuoteError('Quote has expired, please request a new quote')
+    except signing.BadSignature:
+        raise QuoteError('Invalid quote token')
+
+    try:
+        if payload['u'] is None or payload['u'] != user_id:
+            raise QuoteError('Quote was issued to a different user')
+        quoted_amount = Decimal(payload['a'])
+        matches = (payload['f'] == from_currency and payload['t'] == to_currency
+                   and quoted_amount == to_decimal(amount_sent))
+
+        rate_info = {'source': payload['s']}
+        if payload.get('m') is not None:
+            rate_info['margin_applied'] = float(Decimal(payload['m']))
+        if payload.get('v') is not None:
+            rate_info['volume_discount'] = float(Decimal(payload['v']))
+        quote = {
+            'nonce': payload['n'],
+            'converted_amount': Decimal(payload['c']),
+            'exchange_rate': Decimal(payload['r']),
+            'rate_info': rate_info,
+        }
+    except (KeyError, TypeError, InvalidOperation):
+        raise QuoteError('Invalid quote token')
+    if not matches:
+        raise QuoteError('Quote does not match the swap currencies or amount')
+    return quote
+
+
+def claim_quote(nonce: str, user, swap) -> RedeemedQuote:
+    """
+    Mark a redeemed quote as used by a swap
+
+    Call inside the transaction.atomic() that creates the swap, so the
+    token stays unused if the swap is rolled back.
+
+    Raises:
+        QuoteError: If the token was already used
+    """
+    try:
+        with transaction.atomic():
+            redeemed = RedeemedQuote.objects.create(nonce=nonce, user=user, swap=swap)
+    except IntegrityError:
+        raise QuoteError('Quote has already been used')
+    _schedule_prune()
+    return redeemed
+
+
+def prune_redeemed_quotes() -> int:
+    """
+    Delete redeemed quotes whose tokens have expired (they can no longer be replayed)
+    """
+    cutoff = timezone.now() - timedelta(seconds=QUOTE_TTL + QUOTE_RETENTION_MARGIN)
+    deleted, _ = RedeemedQuote.objects.filter(redeemed_at__lt=cutoff).delete()
+    if deleted:
+        logger.info(f"Pruned {deleted} expired redeemed quote(s)")
+    return deleted
+
+
+def _schedule_prune():
+    global _next_prune
+
+    now = time.monotonic()
+    if now >= _next_prune:
+        _next_prune = now + QUOTE_PRUNE_INTERVAL
+        # After the swap commits, outside its transaction; a failed prune does not fail the swap
+        transaction.on_commit(prune_redeemed_quotes, robust=True)
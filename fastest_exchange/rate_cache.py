@@ -0,0 +1,148 @@
+"""
+Stale-while-revalidate Rate Cache
+
+Wraps the Django cache for rate lookups so that expiry never sends every
+concurrent request to the database and providers at once:
+
+- Fresh values are served directly.
+- Stale values (past their TTL but inside the staleness ceiling) are
+  served immediately while one background thread recomputes them.
+- Misses and values past the ceiling are loaded synchronously, with
+  concurrent misses for the same key coalesced into one in-flight load.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+import logging
+
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time; concurrent callers share its result
+    """
+
+    class _Call:
+        __slots__ = ('event', 'result', 'error')
+
+        def __init__(self):
+            self.event = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self, wait_timeout: float = 30):
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._calls: Dict[str, 'SingleFlight._Call'] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            if call.event.wait(self.wait_timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            logger.warning(f"Timed out waiting for in-flight load of {key}; loading directly")
+            return func()
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+
+class StaleWhileRevalidateCache:
+    """
+    Rate cache storing {value, fresh_until, stale_until} envelopes
+
+    Args:
+        prefix: Cache key prefix (kept compatible with existing keys)
+        stale_ttl: Seconds a value may be served stale after its TTL
+            before a synchronous reload is forced
+    """
+
+    def __init__(self, prefix: str, stale_ttl: int):
+        self.prefix = prefix
+        self.stale_ttl = stale_ttl
+        self._flight = SingleFlight()
+
+    def cache_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def get(self, key: str, loader: Callable[[], Optional[Tuple[Any, int]]],
+            on_refresh: Optional[Callable[[Any, int], Any]] = None) -> Optional[Tuple[Any, float]]:
+        """
+        Return (value, seconds of freshness left) or None if nothing could be loaded
+
+        Args:
+            key: Cache key (without prefix)
+            loader: Computes the value; returns (value, ttl) or None
+            on_refresh: Called with (value, ttl) when a background refresh completes
+        """
+        envelope = cache.get(self.cache_key(key))
+        now = time.time()
+
+        if isinstance(envelope, dict) and 'fresh_until' in envelope:
+            fresh_for = envelope['fresh_until'] - now
+            if fresh_for > 0:
+                return envelope['value'], fresh_for
+            if now < envelope['stale_until']:
+                self._refresh_async(key, loader, on_refresh)
+                return envelope['value'], fresh_for
+
+        return self._flight.do(key, lambda: self._load(key, loader))
+
+    def set(self, key: str, value: Any, ttl: int):
+        now = time.time()
+        cache.set(self.cache_key(key), {
+            'value': value,
+            'fresh_until': now + ttl,
+            'stale_until': now + ttl + self.stale_ttl,
+        }, ttl + self.stale_ttl)
+
+    def delete(self, key: str):
+        cache.delete(self.cache_key(key))
+
+    def delete_many(self, keys):
+        cache.delete_many([self.cache_key(key) for key in keys])
+
+    def _load(self, key: str, loader) -> Optional[Tuple[Any, int]]:
+        loaded = loader()
+        if loaded is not None:
+            value, ttl = loaded
+            self.set(key, value, ttl)
+        return loaded
+
+    def _refresh_async(self, key: str, loader, on_refresh):
+        if self._flight.in_flight(key):
+            return
+
+        def refresh():
+            try:
+                loaded = self._flight.do(key, lambda: self._load(key, loader))
+                if loaded is not None and on_refresh is not None:
+                    on_refresh(*loaded)
+            except Exception as e:
+                logger.error(f"Background refresh of {self.cache_key(key)} failed: {e}")
+            finally:
+                connections.close_all()
+
+        threading.Thread(target=refresh, name=f"refresh-{key}", daemon=True).start()
@@ -0,0 +1,230 @@
+"""
+Cross-rate Graph
+
+Directed graph of every known direct rate (currency -> currency) used to
+triangulate pairs that have no direct quote, e.g. UGX -> USD via NGN.
+
+Best paths between all currencies are precomputed (Floyd-Warshall) so a
+lookup is a single dictionary read. When one edge changes, only the
+affected results are recomputed: a rate-only change re-multiplies the
+paths that use the edge, a cheaper edge relaxes all pairs through it in
+O(n^2), and only a more expensive or removed edge triggers a full rebuild.
+"""
+import math
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Path cost per edge by rate source: prefer live/DB rates over last-known-good rates
+SOURCE_COSTS = {
+    'last_known_good': 5.0,
+}
+DEFAULT_EDGE_COST = 1.0
+
+# Extra cost for using the reciprocal of a direct rate
+IMPLIED_INVERSE_PENALTY = 0.5
+
+
+class CrossRate:
+    """
+    Best known conversion between two currencies
+    """
+
+    __slots__ = ('rate', 'cost', 'path')
+
+    def __init__(self, rate: float, cost: float, path: Tuple[str, ...]):
+        self.rate = rate
+        self.cost = cost
+        self.path = path
+
+    @property
+    def hops(self) -> int:
+        return len(self.path) - 1
+
+
+class RateGraph:
+    """
+    Direct-rate graph with precomputed all-pairs best paths
+    """
+
+    def __init__(self, max_hops: int = 3):
+        self.max_hops = max_hops
+        # (from, to) -> (rate, cost, implied)
+        self._edges: Dict[Tuple[str, str], Tuple[float, float, bool]] = {}
+        self._results = MappingProxyType({})
+        self._lock = threading.Lock()
+        self._seeded = False
+
+    @staticmethod
+    def edge_cost(source: Optional[str]) -> float:
+        return SOURCE_COSTS.get(source, DEFAULT_EDGE_COST)
+
+    def lookup(self, from_currency: str, to_currency: str) -> Optional[CrossRate]:
+        """
+        O(1) read of the precomputed best path between two currencies
+        """
+        result = self._results.get((from_currency, to_currency))
+        if result is not None and result.hops <= self.max_hops:
+            return result
+        return None
+
+    def has_edge(self, from_currency: str, to_currency: str) -> bool:
+        edge = self._edges.get((from_currency, to_currency))
+        return edge is not None and not edge[2]
+
+    def set_edge(self, from_currency: str, to_currency: str, rate: float, cost: float = DEFAULT_EDGE_COST):
+        """
+        Add or update a direct rate and its implied inverse
+        """
+        if from_currency == to_currency or not rate or rate <= 0:
+            return
+
+        with self._lock:
+            changed = [self._put((from_currency, to_currency), (float(rate), cost, False))]
+
+            inverse = self._edges.get((to_currency, from_currency))
+            if inverse is None or inverse[2]:
+                changed.append(self._put(
+                    (to_currency, from_currency),
+                    (1 / float(rate), cost + IMPLIED_INVERSE_PENALTY, True)
+                ))
+
+            if any(change == 'rebuild' for change in changed):
+                self._rebuild()
+            else:
+                results = dict(self._results)
+                for change in changed:
+                    if change is not None:
+                        self._apply_incremental(results, *change)
+                self._results = MappingProxyType(results)
+
+    def seed_once(self, load_edges: Callable[[], Iterable[Tuple[str, str, float, float]]]):
+        """
+        Load the initial (from, to, rate, cost) edges the first time it is called
+
+        Edges that are already present (e.g. published live rates) are kept.
+        """
+        if self._seeded:
+            return
+        self._seeded = True
+        for from_currency, to_currency, rate, cost in load_edges():
+            if not self.has_edge(from_currency, to_currency):
+                self.set_edge(from_currency, to_currency, rate, cost)
+
+    def remove_edge(self, from_currency: str, to_currency: str):
+        with self._lock:
+            if self._edges.pop((from_currency, to_currency), None) is not None:
+                inverse = self._edges.get((to_currency, from_currency))
+                if inverse is not None and inverse[2]:
+                    del self._edges[(to_currency, from_currency)]
+                self._rebuild()
+
+    def _put(self, key, value):
+        """
+        Store an edge and classify the change for the incremental update
+        """
+        old = self._edges.get(key)
+        self._edges[key] = value
+        if old is None or value[1] < old[1]:
+            return key, value, 'relax'
+        if value[1] > old[1]:
+            return 'rebuild'
+        if value[0] != old[0]:
+            return key, value, 'rate'
+        return None
+
+    def _apply_incremental(self, results, key, value, kind):
+        u, v = key
+        rate, cost, _ = value
+
+        if kind == 'rate':
+            # Same cost, new rate: re-multiply every best path using this edge
+            for pair, result in list(results.items()):
+                if self._path_uses(result.path, u, v):
+                    results[pair] = CrossRate(self._path_rate(result.path), result.cost, result.path)
+            return
+
+        # Cheaper or new edge: relax every (i, j) through u -> v
+        nodes = self._nodes()
+        to_u = {i: results.get((i, u)) for i in nodes}
+        from_v = {j: results.get((v, j)) for j in nodes}
+        to_u[u] = CrossRate(1.0, 0.0, (u,))
+        from_v[v] = CrossRate(1.0, 0.0, (v,))
+
+        for i, head in to_u.items():
+            if head is None:
+                continue
+            for j, tail in from_v.items():
+                if tail is None or i == j:
+                    continue
+                path = head.path + tail.path
+                if len(set(path)) != len(path):
+                    continue
+                total = head.cost + cost + tail.cost
+                current = results.get((i, j))
+                if current is None or total < current.cost or (current.path == path):
+                    results[(i, j)] = CrossRate(head.rate * rate * tail.rate, total, path)
+
+        # Paths already using the edge need the new rate too
+        for pair, result in list(results.items()):
+            if self._path_uses(result.path, u, v):
+                results[pair] = CrossRate(self._path_rate(result.path), result.cost, result.path)
+
+    def _rebuild(self):
+        """
+        Full Floyd-Warshall recomputation over the current edge set
+        """
+        nodes = self._nodes()
+        dist = {}
+        nxt = {}
+        for (u, v), (rate, cost, _) in self._edges.items():
+            dist[(u, v)] = cost
+            nxt[(u, v)] = v
+
+        for k in nodes:
+            for i in nodes:
+                d_ik = dist.get((i, k))
+                if d_ik is None:
+                    continue
+                for j in nodes:
+                    if i == j:
+                        continue
+                    d_kj = dist.get((k, j))
+                    if d_kj is None:
+                        continue
+                    if d_ik + d_kj < dist.get((i, j), math.inf):
+                        dist[(i, j)] = d_ik + d_kj
+                        nxt[(i, j)] = nxt[(i, k)]
+
+        results = {}
+        for (i, j), cost in dist.items():
+            if i == j:
+                continue
+            path = [i]
+            while path[-1] != j:
+                path.append(nxt[(path[-1], j)])
+            path = tuple(path)
+            results[(i, j)] = CrossRate(self._path_rate(path), cost, path)
+
+        self._results = MappingProxyType(results)
+        logger.debug(f"Rebuilt rate graph: {len(nodes)} currencies, {len(results)} reachable pairs")
+
+    def _nodes(self):
+        return sorted({c for pair in self._edges for c in pair})
+
+    def _path_rate(self, path: Tuple[str, ...]) -> float:
+        rate = 1.0
+        for u, v in zip(path, path[1:]):
+            rate *= self._edges[(u, v)][0]
+        return rate
+
+    @staticmethod
+    def _path_uses(path: Tuple[str, ...], u: str, v: str) -> bool:
+        return any(a == u and b == v for a, b in zip(path, path[1:]))
+
+
+# Shared graph fed by every rate service
+rate_graph = RateGraph()
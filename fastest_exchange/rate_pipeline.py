@@ -0,0 +1,473 @@
+"""
+Shared Rate Pipeline
+
+The one lookup path behind every rate service (ExchangeRateService for
+swaps, QuidaxExchangeRateService for public quotes):
+
+    snapshot -> stale-while-revalidate cache -> provider plugins -> triangulation
+
+Rates are resolved by walking the ProviderRegistry in order (stored
+rate, then the hedged upstream group, then the last-known-good rate) and are
+cached and published under one key per pair. A pair warmed by a swap is
+therefore served to the next public quote from memory, and vice versa.
+
+Resolved rates are also written to the host's shared snapshot file
+(fastest_exchange.shared_snapshot), so the other worker processes serve
+them without resolving them again. A starting worker warms up in the
+background (warm_up, started from FastestExchangeConfig.ready) and
+reports its state to the readiness probe. After warm-up a background
+refresher picks up changed pricing rules and other workers' rates, so a
+lookup itself only reads the snapshot.
+"""
+import os
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from .models import ExchangeRate
+from .pair_registry import PAIR_REGISTRY_CHECK_INTERVAL, PairRegistry
+from .pricing import PRICING_RULES_CHECK_INTERVAL, pricing_rules
+from .provider_fetcher import ProviderCall, fetch_first
+from .rate_cache import StaleWhileRevalidateCache
+from .rate_graph import rate_graph
+from .rate_providers import CACHE_TIMEOUT, ProviderRegistry, RateProvider, rate_providers
+from .rate_snapshot import RateEntry, RateSnapshotStore
+from .shared_snapshot import SharedRateSnapshot
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Hedged fan-out: fire the next provider after this many seconds,
+# and give up on all providers after the overall deadline
+PROVIDER_HEDGE_DELAY = getattr(settings, 'EXCHANGE_PROVIDER_HEDGE_DELAY', 0.3)
+PROVIDER_DEADLINE = getattr(settings, 'EXCHANGE_PROVIDER_DEADLINE', 5)
+
+# Stale values are served for up to this long past expiry while refreshing
+STALE_CACHE_TIMEOUT = 900
+# Snapshot lifetime for a stale value, until the background refresh lands
+STALE_SNAPSHOT_TTL = 5
+
+# Cross-process snapshot file and how often workers check it for changes
+RATE_SHARED_SNAPSHOT_PATH = getattr(settings, 'RATE_SHARED_SNAPSHOT_PATH', '')
+RATE_SHARED_SNAPSHOT_POLL = getattr(settings, 'RATE_SHARED_SNAPSHOT_POLL', 1)
+
+
+class RatePipeline:
+    """
+    Snapshot, cache and provider walk shared by the rate services
+    """
+
+    def __init__(self, name: str, providers: ProviderRegistry,
+                 hedge_delay: float = PROVIDER_HEDGE_DELAY, deadline: float = PROVIDER_DEADLINE,
+                 shared_path: Optional[str] = RATE_SHARED_SNAPSHOT_PATH):
+        self.providers = providers
+        self.hedge_delay = hedge_delay
+        self.deadline = deadline
+        # Stale-while-revalidate cache behind the snapshot
+        self.rate_cache = StaleWhileRevalidateCache(f'{name}_', STALE_CACHE_TIMEOUT)
+        # In-process snapshot of resolved rates (hot path for quotes)
+        self.snapshot = RateSnapshotStore(name)
+        # Supported pairs, with metadata, served from memory
+        self.pair_registry = PairRegistry(
+            name, self._fallback_pairs, providers.quoted_pairs, PAIR_REGISTRY_CHECK_INTERVAL
+        )
+        # Rates resolved by any worker process of the host
+        self.shared = SharedRateSnapshot(shared_path, RATE_SHARED_SNAPSHOT_POLL)
+        # Warm-up state reported by the readiness probe: cold, warming or warm
+        self.warm_state = 'cold'
+        self.warmed_at = None
+        # Background thread polling pricing rules and the shared snapshot
+        self.refresh_interval = min(RATE_SHARED_SNAPSHOT_POLL, PRICING_RULES_CHECK_INTERVAL)
+        self._refresher: Optional[threading.Thread] = None
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def get_rate_entry(self, from_currency: str, to_currency: str) -> Optional[RateEntry]:
+        """
+        Published snapshot entry for a pair, resolving and publishing it if needed
+        """
+        # Serve from the in-process snapshot when the pair is published
+        entry = self.snapshot.lookup(from_currency, to_currency)
+        if entry is not None:
+            return entry
+
+        # Shared cache: stale values are served while one background refresher
+        # recomputes them, and concurrent misses share a single load
+        cached = self.rate_cache.get(
+            f"{from_currency}_{to_currency}",
+            lambda: self._load(from_currency, to_currency),
+            on_refresh=self.publish
+        )
+        if cached:
+            rate_info, fresh_for = cached
+            return self.publish(rate_info, max(fresh_for, STALE_SNAPSHOT_TTL))
+        return None
+
+    def price(self, from_currency: str, to_currency: str, amount: Decimal) -> Dict:
+        """
+        Price a conversion in the fixed-scale Decimal pipeline (fastest_exchange.money)
+
+        Returns:
+            Dict with rate_info, the Decimal exchange_rate (6 dp) and
+            converted_amount (minor units), or error
+        """
+        if from_currency == to_currency:
+            return {'error': 'Cannot exchange the same currency'}
+
+        entry = self.get_rate_entry(from_currency, to_currency)
+        if entry is None:
+            return {
+                'error': f'Exchange rate not available for {from_currency} to {to_currency}'
+            }
+
+        rate_info, conversion_rate, converted_amount = entry.price(amount)
+        return {
+            'rate_info': rate_info,
+            'exchange_rate': conversion_rate,
+            'converted_amount': converted_amount,
+        }
+
+    def _load(self, from_currency: str, to_currency: str) -> Optional[Tuple[Dict, int]]:
+        """
+        Resolve a rate and share it with the other worker processes
+        """
+        resolved = self.resolve(from_currency, to_currency)
+        if resolved is not None:
+            self.shared.write([resolved])
+            self._remember([resolved[0]])
+        return resolved
+
+    def sync_shared(self, force: bool = False):
+        """
+        Publish rates other processes wrote to the shared snapshot and drop the pairs they invalidated
+        """
+        changes = self.shared.changes(force)
+        if changes is None:
+            return
+        fresh, removed = changes
+        if removed:
+            self.rate_cache.delete_many(removed)
+            self.snapshot.invalidate(*removed)
+        for rate_info, ttl in fresh:
+            self.publish(rate_info, ttl)
+
+    def refresh(self):
+        """
+        Pick up changed pricing rules and rates resolved by the other worker processes
+
+        Run by the background refresher; entries priced with replaced rules
+        stop being served once the new rules are loaded.
+        """
+        pricing_rules.check()
+        self.sync_shared()
+
+    def start_refresher(self):
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._refresher = threading.Thread(target=self._refresh_loop, name='rate-refresher', daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            if self.warm_state == 'cold':
+                # Retry a failed warm-up, so the worker can still become ready
+                self.warm_up()
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Rate pipeline refresh failed: {e}")
+            finally:
+                close_old_connections()
+
+    def resolve(self, from_currency: str, to_currency: str) -> Optional[Tuple[Dict, int]]:
+        """
+        Resolve a rate from the provider plugins in order, returning it with its cache TTL
+        """
+        for stage in self.providers.stages(from_currency, to_currency):
+            if stage[0].remote:
+                rate_info, provider = self._fetch_hedged(stage, from_currency, to_currency)
+            else:
+                provider = stage[0]
+                rate_info = provider.fetch(from_currency, to_currency)
+            if rate_info and 'error' not in rate_info:
+                return rate_info, provider.ttl
+
+        # Triangulate through other currencies as a last resort
+        cross_rate = self.triangulate(from_currency, to_currency)
+        if cross_rate:
+            return cross_rate, CACHE_TIMEOUT
+
+        return None
+
+    def fetch_remote(self, from_currency: str, to_currency: str) -> Optional[Dict]:
+        """
+        Fresh rate from the upstream plugins only (no stored or last-known-good rates)
+        """
+        remote = [provider for stage in self.providers.stages(from_currency, to_currency)
+                  for provider in stage if provider.remote]
+        return self._fetch_hedged(self.providers.by_cost(remote), from_currency, to_currency)[0]
+
+    def _fetch_hedged(self, providers: List[RateProvider], from_currency: str,
+                      to_currency: str) -> Tuple[Optional[Dict], Optional[RateProvider]]:
+        """
+        Query upstream plugins concurrently with hedging
+
+        The next plugin is fired when the previous one fails or is slower
+        than the hedge delay, and the first valid rate wins.
+        """
+        by_name = {provider.name: provider for provider in providers}
+        calls = [
+            ProviderCall(
+                provider.name,
+                lambda timeout, provider=provider: provider.fetch(from_currency, to_currency, timeout),
+                provider.timeout
+            )
+            for provider in providers
+        ]
+
+        result = fetch_first(calls, self.hedge_delay, self.deadline)
+        if not result:
+            return None, None
+
+        name, rate_info, latency = result
+        logger.info(f"Fetched {from_currency}->{to_currency} from {name} in {latency:.3f}s")
+        return rate_info, by_name[name]
+
+    def publish(self, rate_info: Dict, ttl: float) -> RateEntry:
+        """
+        Publish a resolved rate into the snapshot and return its entry
+
+        Direct rates also become edges of the shared cross-rate graph.
+        """
+        if rate_info.get('source') != 'triangulated':
+            from_currency, to_currency = rate_info['pair'].split('_')
+            rate_graph.set_edge(from_currency, to_currency, rate_info['rate'],
+                                rate_graph.edge_cost(rate_info.get('source')))
+        return self.snapshot.publish(rate_info, ttl, pricing_rules.for_pair(*rate_info['pair'].split('_')))
+
+    def push(self, rate_info: Dict, ttl: int) -> RateEntry:
+        """
+        Store a rate received outside a lookup (e.g. a ticker) in the cache and snapshot
+        """
+        self.rate_cache.set(rate_info['pair'], rate_info, ttl)
+        self.shared.write([(rate_info, ttl)])
+        self._remember([rate_info])
+        return self.publish(rate_info, ttl)
+
+    def triangulate(self, from_currency: str, to_currency: str) -> Optional[Dict]:
+        """
+        Derive a rate for a pair without a direct quote from the cross-rate graph
+        """
+        rate_graph.seed_once(self._rate_graph_edges)
+        cross_rate = rate_graph.lookup(from_currency, to_currency)
+        if cross_rate is None:
+            return None
+
+        return {
+            'rate': cross_rate.rate,
+            'source': 'triangulated',
+            'timestamp': timezone.now().isoformat(),
+            'pair': f"{from_currency}_{to_currency}",
+            'path': list(cross_rate.path)
+        }
+
+    def _rate_graph_edges(self):
+        """
+        Initial graph edges: last-known-good rates plus every stored rate
+        """
+        fallback = self.providers.get('last_known_good')
+        if fallback is not None:
+            for from_currency, to_currency in fallback.pairs:
+                rate_info = fallback.fetch(from_currency, to_currency)
+                yield from_currency, to_currency, rate_info['rate'], rate_graph.edge_cost('last_known_good')
+
+        database = self.providers.get('database')
+        try:
+            latest = database.stored_rates() if database is not None else {}
+        except Exception as e:
+            logger.error(f"Error loading stored rates for the rate graph: {e}")
+            latest = {}
+
+        for (from_currency, to_currency), rate in latest.items():
+            yield from_currency, to_currency, rate, rate_graph.edge_cost('database')
+
+    def fetch_rate_matrix(self, currencies: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch every pair between the given currencies with one upstream call per base
+
+        Only batch plugins are used. The first currency is used as the
+        base; further bases are only requested when the previous responses
+        did not cover every currency. All pairs, including inverses, are
+        derived as cross rates of the base row: rate(a -> b) = row[b] / row[a].
+
+        Returns:
+            Dict keyed by pair ("USD_NGN") with the same shape as fetch_remote
+        """
+        currencies = [c.upper() for c in currencies]
+        row: Dict[str, float] = {}  # units of each currency per 1 unit of the first base
+        sources = []
+        anchor = None
+
+        for base in currencies:
+            if anchor is not None and all(c in row for c in currencies):
+                break
+            if anchor is not None and base not in row:
+                # A new base is only useful if it can be tied back to the anchor
+                continue
+
+            symbols = [c for c in currencies if c != base]
+            calls = [
+                ProviderCall(
+                    provider.name,
+                    lambda timeout, provider=provider, base=base, symbols=symbols:
+                        provider.fetch_base_rates(base, symbols, timeout),
+                    provider.timeout
+                )
+                for provider in self.providers.batch_providers()
+            ]
+            result = fetch_first(calls, self.hedge_delay, self.deadline)
+            if not result:
+                logger.warning(f"No provider returned rates for base {base}")
+                continue
+
+            name, base_rates, _ = result
+            sources.append(name)
+            if anchor is None:
+                anchor = base
+                row[base] = 1.0
+            scale = row[base]
+            for symbol, value in base_rates.items():
+                if value and symbol not in row:
+                    row[symbol] = float(value) * scale
+
+        timestamp = timezone.now().isoformat()
+        source = '+'.join(dict.fromkeys(sources))
+        matrix = {}
+        for from_currency in currencies:
+            for to_currency in currencies:
+                if from_currency == to_currency or from_currency not in row or to_currency not in row:
+                    continue
+                pair = f"{from_currency}_{to_currency}"
+                matrix[pair] = {
+                    'rate': row[to_currency] / row[from_currency],
+                    'source': source,
+                    'timestamp': timestamp,
+                    'pair': pair,
+                    'base': anchor
+                }
+
+        logger.info(f"Derived {len(matrix)} pairs from {len(sources)} upstream call(s)")
+        return matrix
+
+    def record(self, rates: List[Dict]) -> List[ExchangeRate]:
+        """
+        Record many rate ticks in one transaction and invalidate caches once
+
+        Args:
+            rates: Dicts with currency_from, currency_to, rate and optionally
+                low_amount and low_amount_limit
+        """
+        ticks = ExchangeRate.objects.bulk_append(rates)
+        pairs = [f"{tick.currency_from}_{tick.currency_to}" for tick in ticks]
+
+        # Clear the cached rates and drop the pairs from the snapshot in one swap
+        if pairs:
+            self.invalidate(*pairs)
+        self._remember([
+            {'rate': float(tick.rate), 'source': 'database', 'timestamp': tick.created_at.isoformat(),
+             'pair': f"{tick.currency_from}_{tick.currency_to}"}
+            for tick in ticks
+        ])
+        for tick in ticks:
+            rate_graph.set_edge(tick.currency_from, tick.currency_to, float(tick.rate),
+                                rate_graph.edge_cost('database'))
+            logger.info(f"Recorded exchange rate: {tick.currency_from}->{tick.currency_to} @ {tick.rate}")
+
+        return ticks
+
+    def invalidate(self, *pairs: str):
+        """
+        Drop pair keys from the cache and the snapshot of every process and re-check the pair registry
+        """
+        self.rate_cache.delete_many(pairs)
+        self.snapshot.invalidate(*pairs)
+        self.shared.remove(pairs)
+        PairRegistry.invalidate_all()
+
+    def _fallback_pairs(self) -> List[Tuple[str, str]]:
+        fallback = self.providers.get('last_known_good')
+        return fallback.rates.pairs if fallback is not None else []
+
+    def _remember(self, rate_infos: List[Dict]):
+        """
+        Keep refreshed rates as last-known-good rates (degraded-mode source)
+        """
+        fallback = self.providers.get('last_known_good')
+        if fallback is not None:
+            fallback.rates.record(rate_infos)
+
+    def start_warm_up(self):
+        """
+        Warm this process in a background thread, so boot is not delayed
+        """
+        self.warm_state = 'warming'
+        threading.Thread(target=self.warm_up, name='rate-warm-up', daemon=True).start()
+
+    def warm_up(self):
+        """
+        Load last-known-good rates, pricing rules and the shared snapshot, then resolve missing pairs
+
+        With a warm shared snapshot this costs the pricing rule and pair
+        registry queries only; the first worker of a host resolves the
+        pairs (stored rates first) and shares them with the others.
+        """
+        started = time.monotonic()
+        try:
+            # Started from AppConfig.ready(): wait until every app is loaded
+            while not apps.ready:
+                time.sleep(0.05)
+            # The single read of the last-known-good file
+            self._fallback_pairs()
+            pricing_rules.check()
+            self.sync_shared(force=True)
+            rate_graph.seed_once(self._rate_graph_edges)
+            pairs = self.pair_registry.pairs()
+            for pair in pairs:
+                self.get_rate_entry(pair['from'], pair['to'])
+            self.warmed_at = timezone.now()
+            self.warm_state = 'warm'
+            logger.info(f"Rate pipeline warm: {len(self.snapshot.current)} of {len(pairs)} pair(s) "
+                        f"published in {time.monotonic() - started:.2f}s")
+        except Exception as e:
+            self.warm_state = 'cold'
+            logger.error(f"Rate pipeline warm-up failed: {e}")
+        finally:
+            connections.close_all()
+            self.start_refresher()
+
+    def warm_status(self) -> Dict:
+        return {
+            'state': self.warm_state,
+            'warmed_at': self.warmed_at,
+            'pairs': len(self.snapshot.current),
+            'snapshot_version': self.snapshot.version,
+            'shared_snapshot': self.shared.path or None,
+        }
+
+    def _after_fork(self):
+        # A forked worker inherits a warm snapshot, but not the warm-up or refresher threads
+        if self.warm_state == 'warming':
+            self.start_warm_up()
+        elif self._refresher is not None:
+            self.start_refresher()
+
+
+# The single pipeline every rate service reads through
+rate_pipeline = RatePipeline('exchange_rate', rate_providers)
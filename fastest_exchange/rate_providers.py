@@ -0,0 +1,483 @@
+"""
+Rate Provider Plugins
+
+Every source a rate can come from is a RateProvider plugin: the stored
+rates (database), the Quidax market tickers, the Fixer, ExchangeRate-API
+and CurrencyAPI feeds and the last-known-good rates (degraded mode). The ProviderRegistry
+keeps them in resolution order; the shared rate pipeline
+(fastest_exchange.rate_pipeline) walks that order for every service.
+
+Each plugin declares:
+
+- cost: relative cost of one lookup (0 in memory, 1 a local query,
+  higher for upstream calls; metered APIs cost most). Remote plugins of
+  one hedged group are tried cheapest first.
+- batch: whether one call returns many symbols for a base currency, so
+  a whole rate matrix can be derived from one response per base.
+- remote: whether it calls an upstream over the network. Consecutive
+  remote plugins are queried together with hedging (provider_fetcher).
+- ttl: how long its rates are cached.
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from .circuit_breaker import CircuitOpenError, provider_breakers
+from .http_client import http_client
+from .last_known_good import LastKnownGoodRates, last_known_good
+from .models import ExchangeRate
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cache timeouts in seconds
+CACHE_TIMEOUT = 300  # 5 minutes for live rates
+FALLBACK_CACHE_TIMEOUT = 300  # 5 minutes for last-known-good rates, so live sources are retried soon
+
+# Stored rates older than this are not served
+DATABASE_MAX_AGE = 3600
+
+# Quidax markets used to price fiat pairs: market -> (base, quote)
+QUIDAX_MARKET_PAIRS = {
+    'USDTNGN': ('USD', 'NGN'),
+}
+
+# Quidax client errors that every further call would repeat (revoked key, rate limited);
+# they count as failures so the circuit opens instead of hammering the API
+QUIDAX_FAILURE_STATUSES = (401, 403, 429)
+
+
+class RateProvider:
+    """
+    One rate source; subclasses implement fetch() and may implement fetch_base_rates()
+    """
+
+    name = ''
+    # Value of rate_info['source'] for rates from this provider
+    source = ''
+    cost = 0
+    batch = False
+    remote = False
+    ttl = CACHE_TIMEOUT
+    timeout = 10
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+
+    @property
+    def pairs(self) -> Optional[Set[Tuple[str, str]]]:
+        """
+        Pairs this provider quotes, or None for any pair
+        """
+        return None
+
+    def available(self) -> bool:
+        """
+        Whether the provider is configured and may be called
+        """
+        return self.enabled
+
+    def supports(self, from_currency: str, to_currency: str) -> bool:
+        pairs = self.pairs
+        return pairs is None or (from_currency, to_currency) in pairs
+
+    def fetch(self, from_currency: str, to_currency: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        Rate info for a pair, or None
+        """
+        raise NotImplementedError
+
+    def fetch_base_rates(self, base_currency: str, symbols: List[str],
+                         timeout: Optional[float] = None) -> Optional[Dict[str, float]]:
+        """
+        Rates of several symbols against one base currency (batch providers only)
+        """
+        raise NotImplementedError(f"{self.name} does not support batch lookups")
+
+    def as_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'source': self.source,
+            'cost': self.cost,
+            'batch': self.batch,
+            'remote': self.remote,
+            'available': self.available(),
+        }
+
+    def _rate_info(self, from_currency: str, to_currency: str, rate: float, **extra) -> Dict:
+        return {
+            'rate': rate,
+            'source': self.source,
+            'timestamp': timezone.now().isoformat(),
+            'pair': f"{from_currency}_{to_currency}",
+            **extra
+        }
+
+
+class DatabaseProvider(RateProvider):
+    """
+    Latest stored tick of a pair (one latest-pointer lookup), if recent enough
+    """
+
+    name = 'database'
+    source = 'database'
+    cost = 1
+
+    def __init__(self, max_age: float = DATABASE_MAX_AGE, enabled: bool = True):
+        super().__init__(enabled)
+        self.max_age = max_age
+
+    def fetch(self, from_currency: str, to_currency: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        try:
+            rate_obj = ExchangeRate.objects.latest_for_pair(from_currency, to_currency)
+            if not rate_obj:
+                return None
+
+            if (timezone.now() - rate_obj.created_at).total_seconds() > self.max_age:
+                logger.warning(f"Database rate for {from_currency}->{to_currency} is outdated")
+                return None
+
+            rate_info = self._rate_info(
+                from_currency, to_currency, float(rate_obj.rate),
+                low_amount=float(rate_obj.low_amount) if rate_obj.low_amount else None,
+                low_amount_limit=float(rate_obj.low_amount_limit) if rate_obj.low_amount_limit else None
+            )
+            rate_info['timestamp'] = rate_obj.created_at.isoformat()
+            return rate_info
+
+        except Exception as e:
+            logger.error(f"Error fetching DB rate for {from_currency}->{to_currency}: {e}")
+            return None
+
+    def stored_rates(self) -> Dict[Tuple[str, str], float]:
+        """
+        Latest stored rate of every pair (one query), regardless of age
+        """
+        return {pair: float(tick.rate) for pair, tick in ExchangeRate.objects.latest_for_pairs().items()}
+
+
+class QuidaxProvider(RateProvider):
+    """
+    Quidax market tickers; fiat pairs are approximated by a stablecoin market
+
+    Also the Quidax API client used by QuidaxExchangeRateService.
+    """
+
+    name = 'quidax'
+    source = 'quidax_api'
+    cost = 5
+    remote = True
+
+    def __init__(self, base_url: str, api_key: str, market_pairs: Dict[str, Tuple[str, str]],
+                 enabled: bool = True):
+        super().__init__(enabled)
+        self.base_url = base_url
+        self.api_key = api_key
+        self.market_pairs = market_pairs
+
+    @property
+    def pairs(self) -> Set[Tuple[str, str]]:
+        return {pair for base, quote in self.market_pairs.values() for pair in ((base, quote), (quote, base))}
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+        }
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        return headers
+
+    def request(self, path: str, timeout: Optional[float] = None) -> requests.Response:
+        """
+        GET a Quidax API path through the provider circuit breaker
+
+        Raises CircuitOpenError without touching the network while Quidax
+        is known to be down; see is_success() for what counts as a failure.
+        """
+        return provider_breakers.get(self.name).call(
+            lambda: http_client.get(f"{self.base_url}{path}", headers=self.headers(),
+                                    timeout=timeout or self.timeout),
+            is_success=self.is_success
+        )
+
+    @staticmethod
+    def is_success(response: requests.Response) -> bool:
+        """
+        Whether a response counts as a success for the circuit breaker
+
+        5xx responses and QUIDAX_FAILURE_STATUSES are failures; other client
+        errors (e.g. an unknown market) are answers about the request.
+        """
+        return response.status_code < 500 and response.status_code not in QUIDAX_FAILURE_STATUSES
+
+    def market_for(self, from_currency: str, to_currency: str) -> Optional[str]:
+        """
+        Quidax market quoting a currency pair in either direction
+        """
+        for market, pair in self.market_pairs.items():
+            if pair in ((from_currency, to_currency), (to_currency, from_currency)):
+                return market
+        return None
+
+    def rate_from_ticker(self, from_currency: str, to_currency: str, market: str, ticker: Dict) -> Optional[Dict]:
+        """
+        Build rate info for a pair from a market ticker
+        """
+        if 'last_price' not in ticker:
+            return None
+
+        rate = float(ticker['last_price'])
+        if rate <= 0:
+            return None
+
+        # The market quotes base -> quote; the other direction is the inverse
+        if (from_currency, to_currency) != self.market_pairs[market]:
+            rate = 1 / rate
+
+        return self._rate_info(from_currency, to_currency, rate, market=market, raw_data=ticker)
+
+    def fetch(self, from_currency: str, to_currency: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        try:
+            market = self.market_for(from_currency, to_currency)
+            if market is None:
+                logger.info(f"Quidax doesn't directly support {from_currency}/{to_currency} pair")
+                return None
+
+            response = self.request(f"/markets/{market}/tickers", timeout)
+            if response.status_code != 200:
+                logger.error(f"Quidax API returned status {response.status_code}: {response.text}")
+                return None
+
+            data = response.json()
+            rate_info = self.rate_from_ticker(from_currency, to_currency, market, data.get('data') or {})
+            if rate_info is None:
+                logger.error(f"Unexpected Quidax API response format: {data}")
+            return rate_info
+
+        except CircuitOpenError as e:
+            logger.info(f"Skipping Quidax: {e}")
+        except Exception as e:
+            logger.error(f"Error fetching rate from Quidax API: {e}")
+        return None
+
+
+class HttpRatesProvider(RateProvider):
+    """
+    Metered FX rates API returning every requested symbol for a base in one response
+    """
+
+    cost = 10
+    batch = True
+    remote = True
+    timeout = 3  # Per-provider budget in seconds
+
+    def __init__(self, url: str, key: str, enabled: bool = True):
+        super().__init__(enabled)
+        self.url = url
+        self.key = key
+
+    @property
+    def source(self) -> str:
+        return self.name
+
+    def available(self) -> bool:
+        return self.enabled and bool(self.key)
+
+    def fetch(self, from_currency: str, to_currency: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        rates = self.fetch_base_rates(from_currency, [to_currency], timeout)
+        if rates and rates.get(to_currency):
+            return self._rate_info(from_currency, to_currency, float(rates[to_currency]))
+        return None
+
+    def fetch_base_rates(self, base_currency: str, symbols: List[str],
+                         timeout: Optional[float] = None) -> Optional[Dict[str, float]]:
+        """
+        Calls go through the provider's circuit breaker; an empty or failed
+        response counts against its health.
+        """
+        try:
+            return provider_breakers.get(self.name).call(
+                lambda: self.request_base_rates(base_currency, symbols, timeout or self.timeout),
+                is_success=bool
+            )
+        except CircuitOpenError as e:
+            logger.info(f"Skipping API {self.name}: {e}")
+        except Exception as e:
+            logger.error(f"API {self.name} request failed: {e}")
+
+        return None
+
+    def request_base_rates(self, base_currency: str, symbols: List[str], timeout: float) -> Optional[Dict[str, float]]:
+        """
+        Perform one provider request for a base currency row
+        """
+        raise NotImplementedError
+
+
+class FixerProvider(HttpRatesProvider):
+    name = 'fixer'
+
+    def request_base_rates(self, base_currency, symbols, timeout):
+        response = http_client.get(
+            self.url,
+            params={
+                'access_key': self.key,
+                'base': base_currency,
+                'symbols': ','.join(symbols)
+            },
+            timeout=timeout
+        )
+        data = response.json()
+        if data.get('success'):
+            rates = data['rates']
+            return {symbol: rates[symbol] for symbol in symbols if symbol in rates}
+        return None
+
+
+class ExchangeRateApiProvider(HttpRatesProvider):
+    name = 'exchangerate_api'
+
+    def request_base_rates(self, base_currency, symbols, timeout):
+        response = http_client.get(f"{self.url}/{self.key}/latest/{base_currency}", timeout=timeout)
+        data = response.json()
+        if data.get('result') == 'success':
+            rates = data['conversion_rates']
+            return {symbol: rates[symbol] for symbol in symbols if symbol in rates}
+        return None
+
+
+class CurrencyApiProvider(HttpRatesProvider):
+    name = 'currencyapi'
+
+    def request_base_rates(self, base_currency, symbols, timeout):
+        response = http_client.get(
+            self.url,
+            params={
+                'apikey': self.key,
+                'base_currency': base_currency,
+                'currencies': ','.join(symbols)
+            },
+            timeout=timeout
+        )
+        data = response.json()
+        if 'data' in data:
+            rates = data['data']
+            return {symbol: rates[symbol]['value'] for symbol in symbols if symbol in rates}
+        return None
+
+
+class LastKnownGoodProvider(RateProvider):
+    """
+    Most recent real rate of each pair, from memory (degraded mode, no database access)
+    """
+
+    name = 'last_known_good'
+    source = 'last_known_good'
+    cost = 0
+    ttl = FALLBACK_CACHE_TIMEOUT
+
+    def __init__(self, rates: LastKnownGoodRates, enabled: bool = True):
+        super().__init__(enabled)
+        self.rates = rates
+
+    @property
+    def pairs(self) -> Set[Tuple[str, str]]:
+        return set(self.rates.pairs)
+
+    def supports(self, from_currency: str, to_currency: str) -> bool:
+        return f"{from_currency}_{to_currency}" in self.rates.rates
+
+    def fetch(self, from_currency: str, to_currency: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        return self.rates.get(from_currency, to_currency)
+
+
+class ProviderRegistry:
+    """
+    Rate provider plugins in resolution order
+    """
+
+    def __init__(self, providers: Iterable[RateProvider] = ()):
+        self._providers: List[RateProvider] = []
+        for provider in providers:
+            self.register(provider)
+
+    def register(self, provider: RateProvider, before: Optional[str] = None):
+        """
+        Add a plugin at the end, or before the named plugin (replacing one of the same name)
+        """
+        self._providers = [p for p in self._providers if p.name != provider.name]
+        names = [p.name for p in self._providers]
+        index = names.index(before) if before in names else len(self._providers)
+        self._providers.insert(index, provider)
+
+    def get(self, name: str) -> Optional[RateProvider]:
+        for provider in self._providers:
+            if provider.name == name:
+                return provider
+        return None
+
+    def __iter__(self):
+        return iter(list(self._providers))
+
+    def stages(self, from_currency: str, to_currency: str) -> List[List[RateProvider]]:
+        """
+        Available plugins for a pair, in order, with consecutive remote plugins grouped
+
+        Each group is queried together (hedged), cheapest and then healthiest first.
+        """
+        stages: List[List[RateProvider]] = []
+        for provider in self._providers:
+            if not provider.available() or not provider.supports(from_currency, to_currency):
+                continue
+            if provider.remote and stages and stages[-1][0].remote:
+                stages[-1].append(provider)
+            else:
+                stages.append([provider])
+        return [self.by_cost(stage) if stage[0].remote else stage for stage in stages]
+
+    def batch_providers(self) -> List[RateProvider]:
+        """
+        Available batch-capable plugins, cheapest and then healthiest first
+        """
+        return self.by_cost([p for p in self._providers if p.batch and p.available()])
+
+    @staticmethod
+    def by_cost(providers: List[RateProvider]) -> List[RateProvider]:
+        by_name = {p.name: p for p in providers}
+        healthiest = [by_name[name] for name in provider_breakers.ordered(list(by_name))]
+        return sorted(healthiest, key=lambda p: p.cost)
+
+    def quoted_pairs(self) -> Dict[str, Optional[Set[Tuple[str, str]]]]:
+        """
+        Pairs each available upstream plugin quotes (None for any), for PairRegistry
+
+        Plugins that are disabled or not configured (no API key) are left
+        out, so pairs are never advertised with a source that cannot answer.
+        """
+        return {p.name: p.pairs for p in self._providers if p.remote and p.available()}
+
+    def as_list(self) -> List[Dict]:
+        return [provider.as_dict() for provider in self._providers]
+
+
+quidax_provider = QuidaxProvider(
+    getattr(settings, 'QUIDAX_BASE_URL', 'https://www.quidax.com/api/v1'),
+    getattr(settings, 'QUIDAX_API_KEY', ''),
+    QUIDAX_MARKET_PAIRS,
+    # With ticker ingestion, the ingest_quidax_tickers worker keeps the cache
+    # filled and user requests never call Quidax directly
+    enabled=not getattr(settings, 'QUIDAX_TICKER_INGESTION', False)
+)
+
+# Resolution order shared by every rate service
+rate_providers = ProviderRegistry([
+    DatabaseProvider(),
+    quidax_provider,
+    FixerProvider('http://data.fixer.io/api/latest', getattr(settings, 'FIXER_API_KEY', '')),
+    ExchangeRateApiProvider('https://v6.exchangerate-api.com/v6', getattr(settings, 'EXCHANGERATE_API_KEY', '')),
+    CurrencyApiProvider('https://api.currencyapi.com/v3/latest', getattr(settings, 'CURRENCY_API_KEY', '')),
+    LastKnownGoodProvider(last_known_good),
+])
@@ -0,0 +1,232 @@
+"""
+In-process Rate Snapshot
+
+Immutable, versioned view of every known currency pair with margins and
+volume tiers (see fastest_exchange.pricing) already resolved. Quote
+lookups on the hot path become a plain dictionary read with no cache or
+database round-trip.
+
+Writers build a new snapshot and swap it in with a single reference
+assignment, so readers never take a lock.
+"""
+import hashlib
+import threading
+import time
+from bisect import bisect_right
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from .money import ONE, PRICING_CONTEXT, convert_amount, quantize_rate, to_decimal
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RateEntry:
+    """
+    A single published pair with every amount tier pre-resolved
+
+    The pair's compiled pricing (fastest_exchange.pricing.PairPricing) and
+    its low-amount limit are merged into one breakpoint list, so a quote is
+    a bisect plus a tuple read. Each tier carries its conversion rate
+    already at the fixed pricing scale (fastest_exchange.money).
+    """
+
+    __slots__ = ('pair', 'info', 'pricing', 'margin', 'low_amount', 'low_amount_limit',
+                 'breakpoints', 'tiers', 'quotes', 'conversion_rate', 'expires_at', '_etag')
+
+    def __init__(self, rate_info: Dict, pricing, ttl: float):
+        self.pair = rate_info['pair']
+        self.info = MappingProxyType(dict(rate_info))
+        self.pricing = pricing
+
+        self.low_amount = rate_info.get('low_amount') or None
+        self.low_amount_limit = rate_info.get('low_amount_limit') or None
+        if self.low_amount_limit is not None:
+            self.low_amount_limit = Decimal(str(self.low_amount_limit))
+        low_limit = self.low_amount_limit if self.low_amount else None
+
+        breakpoints = set(pricing.breakpoints)
+        if low_limit is not None:
+            breakpoints.add(low_limit)
+        self.breakpoints = tuple(sorted(breakpoints))
+        self.tiers = tuple(
+            self._resolve_tier(rate_info['rate'], lower, low_limit)
+            for lower in (Decimal('0'),) + self.breakpoints
+        )
+        # Rate info of each tier, copied out per quote
+        self.quotes = tuple(self._tier_quote(tier) for tier in self.tiers)
+        # Margin of the smallest amounts, reported for the pair as a whole
+        self.margin = self.tiers[0][1]
+        # Unpriced rate at the fixed scale, for quotes without an amount
+        self.conversion_rate = quantize_rate(to_decimal(rate_info['rate']))
+        self.expires_at = time.monotonic() + ttl
+        self._etag = None
+
+    def _resolve_tier(self, rate: float, lower: Decimal, low_limit: Optional[Decimal]) -> Tuple:
+        """
+        (base rate, margin, volume discount, final rate, conversion rate) from an amount breakpoint upwards
+        """
+        base_rate = self.low_amount if low_limit is not None and lower < low_limit else rate
+        margin, margin_factor, multiplier = self.pricing.at(lower)
+        final_rate = PRICING_CONTEXT.multiply(
+            PRICING_CONTEXT.multiply(to_decimal(base_rate), margin_factor), multiplier
+        )
+        return base_rate, float(margin), float(ONE - multiplier), float(final_rate), quantize_rate(final_rate)
+
+    @property
+    def etag(self) -> str:
+        """
+        Strong ETag of the published rate and its tiers
+
+        Derived from content rather than the snapshot version, which is
+        per process, so every worker serving the pair agrees on it.
+        """
+        if self._etag is None:
+            content = repr((self.pair, sorted(self.info.items()), self.tiers)).encode()
+            self._etag = f'"{hashlib.blake2b(content, digest_size=12).hexdigest()}"'
+        return self._etag
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        # Entries priced with replaced pricing rules are never served
+        return (now or time.monotonic()) < self.expires_at and not self.pricing.retired
+
+    def tier(self, amount: Decimal) -> Tuple[float, float, float, float, Decimal]:
+        """
+        (base rate, margin, volume discount, final rate, conversion rate) that applies to an amount
+        """
+        return self.tiers[bisect_right(self.breakpoints, amount)]
+
+    def quote(self, amount: Optional[Decimal] = None) -> Dict:
+        """
+        Build the rate info for an amount
+        """
+        if not amount:
+            return dict(self.info)
+        return dict(self.quotes[bisect_right(self.breakpoints, amount)])
+
+    def price(self, amount: Decimal) -> Tuple[Dict, Decimal, Decimal]:
+        """
+        (rate info, conversion rate, converted amount) for an amount, at the fixed pricing scale
+        """
+        if not amount:
+            return dict(self.info), self.conversion_rate, convert_amount(amount, self.conversion_rate)
+        index = bisect_right(self.breakpoints, amount)
+        conversion_rate = self.tiers[index][4]
+        return dict(self.quotes[index]), conversion_rate, convert_amount(amount, conversion_rate)
+
+    def _tier_quote(self, tier: Tuple) -> Dict:
+        base_rate, margin, volume_discount, final_rate, _ = tier
+        rate_info = dict(self.info)
+        rate_info.update({
+            'original_rate': base_rate,
+            'margin_applied': margin,
+            'volume_discount': volume_discount,
+            'final_rate': final_rate,
+            'rate': final_rate,
+        })
+        return rate_info
+
+
+class RateSnapshot:
+    """
+    Immutable mapping of pair key -> RateEntry tagged with a version number
+    """
+
+    __slots__ = ('version', 'entries', 'created_at')
+
+    def __init__(self, version: int, entries: Dict[str, RateEntry]):
+        self.version = version
+        self.entries = MappingProxyType(entries)
+        self.created_at = time.time()
+
+    def get(self, from_currency: str, to_currency: str) -> Optional[RateEntry]:
+        entry = self.entries.get(f"{from_currency}_{to_currency}")
+        if entry is not None and entry.is_fresh():
+            return entry
+        return None
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class RateSnapshotStore:
+    """
+    Holder for the current snapshot of one rate service
+
+    Reads are lock-free; writers serialise on a lock, copy the current
+    entries, apply their change and swap the new snapshot in.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._snapshot = RateSnapshot(0, {})
+        self._write_lock = threading.Lock()
+        self._listeners = []
+
+    @property
+    def current(self) -> RateSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def lookup(self, from_currency: str, to_currency: str) -> Optional[RateEntry]:
+        return self._snapshot.get(from_currency, to_currency)
+
+    def add_listener(self, callback: Callable[[Iterable[RateEntry]], None]):
+        """
+        Call callback(entries) with the entries of every publish, after the swap
+
+        Listeners run on the publishing thread and must not block.
+        """
+        self._listeners.append(callback)
+
+    def publish(self, rate_info: Dict, ttl: float, pricing) -> RateEntry:
+        """
+        Publish (or replace) a single pair, priced with its PairPricing, and return its entry
+        """
+        entry = RateEntry(rate_info, pricing, ttl)
+        self._swap([entry])
+        return entry
+
+    def publish_many(self, rate_infos: Iterable[Dict], ttl: float,
+                     pricing_for: Callable[[str, str], object]) -> RateSnapshot:
+        """
+        Publish several pairs as one new snapshot version
+
+        Args:
+            pricing_for: Returns the PairPricing of (from_currency, to_currency)
+        """
+        return self._swap([RateEntry(info, pricing_for(*info['pair'].split('_')), ttl)
+                           for info in rate_infos])
+
+    def _swap(self, new_entries) -> RateSnapshot:
+        with self._write_lock:
+            entries = dict(self._snapshot.entries)
+            for entry in new_entries:
+                entries[entry.pair] = entry
+            snapshot = RateSnapshot(self._snapshot.version + 1, entries)
+            self._snapshot = snapshot
+        logger.debug(f"Published {self.name} rate snapshot v{snapshot.version} "
+                     f"({len(new_entries)} pair(s))")
+        for listener in self._listeners:
+            try:
+                listener(new_entries)
+            except Exception as e:
+                logger.error(f"Error in {self.name} rate snapshot listener: {e}")
+        return snapshot
+
+    def invalidate(self, *pairs: str) -> RateSnapshot:
+        """
+        Drop the given pair keys, or every pair when none are given
+        """
+        with self._write_lock:
+            if pairs:
+                entries = {key: entry for key, entry in self._snapshot.entries.items()
+                           if key not in pairs}
+            else:
+                entries = {}
+            snapshot = RateSnapshot(self._snapshot.version + 1, entries)
+            self._snapshot = snapshot
+        return snapshot
@@ -0,0 +1,342 @@
+"""
+Server-Sent Events Rate Stream
+
+Clients subscribe once to the pairs they show and receive every rate
+change as it is published to the shared rate snapshot (rate_pipeline),
+instead of polling /api/exchange-rates/get/:
+
+    GET /api/exchange-rates/stream/?pairs=USD_NGN,NGN_USD
+
+    retry: 3000
+
+    event: rate
+    id: 42
+    data: {"pair": "USD_NGN", "exchange_rate": 1551.37, ...}
+
+One RateStreamHub per process is the single event source. Each change is
+serialised once and shared by every connection subscribed to the pair;
+idle connections cost one asyncio.Event and no timers (a single task
+drives heartbeats and re-reads subscribed pairs, so rates changed by
+other processes arrive once the snapshot entry expires). A slow client
+only ever gets the latest value of each pair, never a backlog.
+
+The stream is plain ASGI (RateStreamApp wraps the Django application in
+fastestexchange_apis/asgi.py), so it needs an ASGI server; it is not
+routed under WSGI.
+"""
+import asyncio
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+
+from .quidax_exchange_service import QuidaxExchangeRateService
+import logging
+
+logger = logging.getLogger(__name__)
+
+RATE_STREAM_PATH = '/api/exchange-rates/stream/'
+RATE_STREAM_HEARTBEAT = getattr(settings, 'RATE_STREAM_HEARTBEAT', 15)
+RATE_STREAM_REFRESH_INTERVAL = getattr(settings, 'RATE_STREAM_REFRESH_INTERVAL', 2)
+RATE_STREAM_MAX_PAIRS = getattr(settings, 'RATE_STREAM_MAX_PAIRS', 20)
+
+# Client reconnect delay (ms) sent as the first frame
+RECONNECT_DELAY_MS = 3000
+
+PAIR_PATTERN = re.compile(r'^([A-Z0-9]{2,10})_([A-Z0-9]{2,10})$')
+
+KEEPALIVE = b': keepalive\n\n'
+
+
+def event_frame(event: str, data: Dict, event_id: Optional[int] = None) -> bytes:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))}")
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+class _Subscriber:
+    """
+    One open stream: its pairs, the last version sent per pair and its wake-up event
+    """
+
+    __slots__ = ('pairs', 'sent', 'wake', 'heartbeat_due')
+
+    def __init__(self, pairs: List[str]):
+        self.pairs = pairs
+        self.sent = dict.fromkeys(pairs, 0)
+        self.wake = asyncio.Event()
+        self.heartbeat_due = False
+
+
+class RateStreamHub:
+    """
+    Fans snapshot publishes of one rate service out to the open streams of a process
+
+    publish() may be called from any thread; subscribers live on the event
+    loop of the ASGI server and are woken with call_soon_threadsafe.
+    """
+
+    def __init__(self, service, heartbeat: float, refresh_interval: float):
+        self.service = service
+        self.heartbeat = heartbeat
+        self.refresh_interval = refresh_interval
+        # pair -> (version, encoded frame, (rate, source))
+        self._latest: Dict[str, Tuple[int, bytes, Tuple]] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+        # Only touched on the event loop
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Dict[str, set] = {}
+        self._connections = set()
+        self._ticker: Optional[asyncio.Task] = None
+        # Rate lookups may hit the database or a provider
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='rate-stream')
+        service.snapshot.add_listener(self.publish)
+
+    @property
+    def connections(self) -> int:
+        return len(self._connections)
+
+    def publish(self, entries: Iterable):
+        """
+        Record published snapshot entries and wake the streams of pairs whose rate changed
+        """
+        changed = []
+        with self._lock:
+            for entry in entries:
+                info = entry.info
+                key = (info['rate'], info.get('source'))
+                current = self._latest.get(entry.pair)
+                if current is not None and current[2] == key:
+                    continue
+                self._version += 1
+                self._latest[entry.pair] = (self._version, self._frame(entry, self._version), key)
+                changed.append(entry.pair)
+
+        loop = self._loop
+        if changed and loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._wake, changed)
+            except RuntimeError:
+                # Event loop already closed
+                pass
+
+    @staticmethod
+    def _frame(entry, version: int) -> bytes:
+        # Same fields as /api/exchange-rates/get/ without an amount
+        info = entry.info
+        from_currency, to_currency = entry.pair.split('_')
+        return event_frame('rate', {
+            'pair': entry.pair,
+            'from_currency': from_currency,
+            'to_currency': to_currency,
+            'exchange_rate': info['rate'],
+            'rate_source': info.get('source', 'unknown'),
+            'timestamp': info.get('timestamp'),
+        }, version)
+
+    async def stream(self, pairs: List[str]):
+        """
+        Async iterator of SSE chunks for one connection, until it is closed
+        """
+        loop = asyncio.get_running_loop()
+        self._bind(loop)
+        subscriber = _Subscriber(pairs)
+        self._connections.add(subscriber)
+        for pair in pairs:
+            self._subscribers.setdefault(pair, set()).add(subscriber)
+        if self._ticker is None:
+            self._ticker = loop.create_task(self._tick())
+
+        try:
+            yield f"retry: {RECONNECT_DELAY_MS}\n\n".encode()
+
+            # Prime pairs this process has not published yet
+            missing = [pair for pair in pairs if pair not in self._latest]
+            if missing:
+                await loop.run_in_executor(self._executor, self._load, missing)
+                unavailable = [pair for pair in missing if pair not in self._latest]
+                if unavailable:
+                    # Not re-resolved on every refresh; clients reconnect to retry them
+                    subscriber.pairs = [pair for pair in pairs if pair not in unavailable]
+                    self._unsubscribe(subscriber, unavailable)
+                    yield event_frame('unavailable', {
+                        'pairs': unavailable,
+                        'error': 'Exchange rate not available',
+                    })
+
+            while True:
+                subscriber.wake.clear()
+                chunk = self._pending(subscriber)
+                if chunk:
+                    yield chunk
+                elif subscriber.heartbeat_due:
+                    yield KEEPALIVE
+                subscriber.heartbeat_due = False
+                await subscriber.wake.wait()
+        finally:
+            self._connections.discard(subscriber)
+            self._unsubscribe(subscriber, pairs)
+
+    def _unsubscribe(self, subscriber: _Subscriber, pairs: List[str]):
+        for pair in pairs:
+            subscribers = self._subscribers.get(pair)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[pair]
+
+    def _pending(self, subscriber: _Subscriber) -> bytes:
+        """
+        Latest frame of every pair that changed since it was last sent to the subscriber
+        """
+        frames = []
+        for pair in subscriber.pairs:
+            latest = self._latest.get(pair)
+            if latest is not None and latest[0] > subscriber.sent[pair]:
+                subscriber.sent[pair] = latest[0]
+                frames.append(latest[1])
+        return b''.join(frames)
+
+    def _bind(self, loop: asyncio.AbstractEventLoop):
+        if self._loop is not loop:
+            # Streams of a previous (closed) loop cannot be woken any more
+            self._loop = loop
+            self._subscribers = {}
+            self._connections = set()
+            self._ticker = None
+
+    def _wake(self, pairs: List[str]):
+        for pair in pairs:
+            for subscriber in self._subscribers.get(pair, ()):
+                subscriber.wake.set()
+
+    async def _tick(self):
+        """
+        Re-read subscribed pairs and send heartbeats while any stream is open
+        """
+        loop = asyncio.get_running_loop()
+        next_heartbeat = loop.time() + self.heartbeat
+        try:
+            while self._connections:
+                await asyncio.sleep(min(self.refresh_interval, self.heartbeat))
+                pairs = list(self._subscribers)
+                if pairs:
+                    # Expired snapshot entries are re-resolved and published
+                    await loop.run_in_executor(self._executor, self._load, pairs)
+                if loop.time() >= next_heartbeat:
+                    next_heartbeat = loop.time() + self.heartbeat
+                    for subscriber in self._connections:
+                        subscriber.heartbeat_due = True
+                        subscriber.wake.set()
+        except Exception as e:
+            logger.error(f"Rate stream refresher failed: {e}")
+        finally:
+            if self._ticker is asyncio.current_task():
+                self._ticker = None
+
+    def _load(self, pairs: List[str]):
+        """
+        Look pairs up through the rate service, which publishes them (runs in the executor)
+        """
+        try:
+            for pair in pairs:
+                try:
+                    entry = self.service._get_rate_entry(*pair.split('_'))
+                    if entry is not None:
+                        # Entries published before the hub subscribed are not seen by the listener
+                        self.publish([entry])
+                except Exception as e:
+                    logger.error(f"Error loading {pair} for rate stream: {e}")
+        finally:
+            close_old_connections()
+
+
+def parse_pairs(query_string: bytes) -> Tuple[List[str], Optional[str]]:
+    """
+    (pair keys, error) from ?pairs=USD_NGN,NGN_USD (the parameter may repeat)
+    """
+    values = parse_qs(query_string.decode('latin-1')).get('pairs', [])
+    pairs = []
+    for value in values:
+        for pair in value.split(','):
+            pair = pair.strip().upper()
+            if not pair:
+                continue
+            match = PAIR_PATTERN.match(pair)
+            if not match or match.group(1) == match.group(2):
+                return [], f'Invalid currency pair: {pair}. Use FORMAT: FROM_TO'
+            if pair not in pairs:
+                pairs.append(pair)
+    if not pairs:
+        return [], 'The pairs parameter is required (e.g. pairs=USD_NGN,NGN_USD)'
+    if len(pairs) > RATE_STREAM_MAX_PAIRS:
+        return [], f'At most {RATE_STREAM_MAX_PAIRS} pairs can be streamed per connection'
+    return pairs, None
+
+
+class RateStreamApp:
+    """
+    ASGI middleware serving the rate stream path and passing everything else to Django
+    """
+
+    def __init__(self, app, hub: RateStreamHub, path: str = RATE_STREAM_PATH):
+        self.app = app
+        self.hub = hub
+        self.path = path
+        self.headers = [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            # Keep nginx from buffering the stream
+            (b'x-accel-buffering', b'no'),
+        ]
+        if getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False):
+            self.headers.append((b'access-control-allow-origin', b'*'))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] != self.path:
+            return await self.app(scope, receive, send)
+
+        if scope['method'] != 'GET':
+            return await self._error(send, 405, 'Method not allowed')
+        pairs, error = parse_pairs(scope.get('query_string', b''))
+        if error:
+            return await self._error(send, 400, error)
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': self.headers})
+        events = self.hub.stream(pairs)
+
+        async def pump():
+            async for chunk in events:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+        async def watch_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(watch_disconnect())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await events.aclose()
+
+    async def _error(self, send, status: int, message: str):
+        body = json.dumps({'error': message}).encode()
+        headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+# Streams rates of the public rate endpoint's service
+rate_stream = RateStreamHub(QuidaxExchangeRateService, RATE_STREAM_HEARTBEAT, RATE_STREAM_REFRESH_INTERVAL)
@@ -248,6 +248,11 @@ class MobileMoneySerializer(serializers.ModelSerializer):
 
 
 class SwapSerializer(serializers.ModelSerializer):
+    quote_token = serializers.CharField(
+        write_only=True, required=False,
+        help_text="Token from /api/exchange-rates/convert/ to execute at the quoted price"
+    )
+
     class Meta:
         model = SwapEngine
         fields = [
@@ -255,6 +260,7 @@ class SwapSerializer(serializers.ModelSerializer):
             "exchange_rate", "receiver_account_name",
             "receiver_account_number", "receiver_bank", "converted_amount",
             "payment_method", "verification_mode", "status", "proof_of_payment",
+            "quote_token",
         ]
         read_only_fields = ["converted_amount", "proof_of_payment"]  # hides it from Swagger input
 
@@ -3,6 +3,7 @@ import requests
 import os
 from django.conf import settings
 from urllib.parse import urljoin
+from ..http_client import http_client
 
 class PremblyClient:
     def __init__(self):
@@ -18,7 +19,7 @@ class PremblyClient:
     def _make_request(self, endpoint, data):
         url = urljoin(self.base_url, endpoint)
         try:
-            response = requests.post(url, json=data, headers=self.headers, timeout=30)
+            response = http_client.post(url, json=data, headers=self.headers, timeout=30)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -0,0 +1,199 @@
+"""
+Cross-process Rate Snapshot
+
+Each worker process keeps its own in-memory rate snapshot, and with the
+default LocMem cache its own rate cache, so after a deploy or a worker
+recycle every worker used to resolve every pair again. The shared
+snapshot is one small JSON file (RATE_SHARED_SNAPSHOT_PATH) with every
+resolved rate and its expiry, read by all workers of the host:
+
+- A process that resolves a rate merges it into the file: read, update,
+  write a temporary file and os.replace() it, serialised by an flock on
+  a side lock file. Readers never see a partial file.
+- Every process stats the file at most every RATE_SHARED_SNAPSHOT_POLL
+  seconds and, when it changed, publishes the entries written by other
+  processes into its own snapshot. Pairs dropped from the file (after a
+  rate write) are dropped locally too.
+
+The file lives on local disk and is read from the page cache, so a
+freshly started worker is warm after one read.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def write_atomic(path: str, data: Dict):
+    """
+    Replace a JSON file in one step (temporary file in the same directory + os.replace)
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as tmp:
+            json.dump(data, tmp, cls=DjangoJSONEncoder, separators=(',', ':'))
+        # mkstemp creates the file private to its owner
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_json(path: str) -> Dict:
+    """
+    Parsed JSON file, or {} when it does not exist
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def update_locked(path: str, change: Callable[[Dict], Dict]):
+    """
+    Read, change and atomically replace a JSON file, serialised across processes by an flock
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.lock", 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        write_atomic(path, change(read_json(path)))
+
+
+class SharedRateSnapshot:
+    """
+    Rate entries shared between the processes of one host through a file
+
+    Args:
+        path: JSON file; an empty path disables sharing
+        poll_interval: Minimum seconds between two checks for changes
+    """
+
+    def __init__(self, path: Optional[str], poll_interval: float):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._mtime = None
+        self._next_poll = 0.0
+        # pair -> stamp of the entry this process wrote or applied
+        self._seen: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def changes(self, force: bool = False) -> Optional[Tuple[List[Tuple[Dict, float]], List[str]]]:
+        """
+        ([(rate_info, seconds left)], removed pairs) written by other processes since the last call
+
+        Returns None without touching the disk until poll_interval has
+        passed, or when the file did not change.
+        """
+        if not self.path or (not force and time.monotonic() < self._next_poll):
+            return None
+        if not self._lock.acquire(blocking=False):
+            # Another thread of this process is already syncing
+            return None
+        try:
+            self._next_poll = time.monotonic() + self.poll_interval
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime == self._mtime and not force:
+                return None
+            self._mtime = mtime
+
+            entries = self._read()
+            now = time.time()
+            fresh = []
+            for pair, entry in entries.items():
+                if self._seen.get(pair) == entry['stamp'] or entry['expires_at'] <= now:
+                    continue
+                self._seen[pair] = entry['stamp']
+                fresh.append((entry['info'], entry['expires_at'] - now))
+            removed = [pair for pair in self._seen if pair not in entries]
+            for pair in removed:
+                del self._seen[pair]
+            return fresh, removed
+        finally:
+            self._lock.release()
+
+    def write(self, rates: Iterable[Tuple[Dict, float]]):
+        """
+        Merge (rate_info, ttl) pairs into the file
+        """
+        now = time.time()
+        stamped = {
+            rate_info['pair']: {
+                'info': rate_info,
+                'expires_at': now + ttl,
+                'stamp': f"{os.getpid()}:{time.time_ns()}",
+            }
+            for rate_info, ttl in rates
+        }
+        if not stamped:
+            return
+
+        def merge(entries):
+            entries.update(stamped)
+        if self._update(merge):
+            for pair, entry in stamped.items():
+                self._seen[pair] = entry['stamp']
+
+    def remove(self, pairs: Iterable[str]):
+        """
+        Drop pairs from the file (every process drops them on its next poll)
+        """
+        pairs = set(pairs)
+        if not pairs:
+            return
+
+        def drop(entries):
+            for pair in pairs:
+                entries.pop(pair, None)
+        if self._update(drop):
+            for pair in pairs:
+                self._seen.pop(pair, None)
+
+    def _update(self, change: Callable[[Dict], None]) -> bool:
+        if not self.path:
+            return False
+
+        def apply(data):
+            now = time.time()
+            entries = {pair: entry for pair, entry in data.get('entries', {}).items() if entry['expires_at'] > now}
+            change(entries)
+            return {'written_at': now, 'entries': entries}
+        try:
+            update_locked(self.path, apply)
+            return True
+        except Exception as e:
+            logger.error(f"Error writing shared rate snapshot {self.path}: {e}")
+            return False
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            return read_json(self.path).get('entries', {})
+        except Exception as e:
+            logger.error(f"Error reading shared rate snapshot {self.path}: {e}")
+            return {}
@@ -1,14 +1,18 @@
 import os
 
 from django.contrib.auth.signals import user_logged_in
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
 from fastest_exchange.messaging.notification import Messenger
 from fastest_exchange.middleware import get_current_request
 
-from .models import ClientAccount, Notification, Profile, User
+from .models import (
+    ClientAccount, Notification, PricingRule, Profile, Transaction, TransactionSearchEntry, TransactionStats, User,
+)
+from .transaction_search import LINKED_RECORDS, transaction_search
 
 # Ignore list of items to check for within the signal
 IGNORE_SIGNAL_LIST = [
@@ -38,6 +42,61 @@ def create_user_client_account(sender, instance, created, **kwargs):
         ClientAccount.objects.create(owner=instance)
 
 
+@receiver(post_save, sender=PricingRule)
+@receiver(post_delete, sender=PricingRule)
+def recompile_pricing_rules(sender, instance, **kwargs):
+    from .pricing import pricing_rules
+
+    transaction.on_commit(pricing_rules.reload)
+
+
+@receiver(post_save, sender=Transaction)
+def update_transaction_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_state = TransactionStats.state_of(instance)
+    if created:
+        TransactionStats.objects.record_change(None, new_state)
+    elif instance._stats_state is None or new_state is None:
+        # Saved without knowing what it contributed before (not loaded from the database)
+        TransactionStats.objects.rebuild([instance.user_id])
+    else:
+        TransactionStats.objects.record_change(instance._stats_state, new_state)
+    instance._stats_state = new_state
+
+
+@receiver(post_delete, sender=Transaction)
+def remove_transaction_stats(sender, instance, **kwargs):
+    TransactionStats.objects.record_change(instance._stats_state or TransactionStats.state_of(instance), None)
+
+
+@receiver(post_save, sender=Transaction)
+def update_transaction_search(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    new_state = TransactionSearchEntry.state_of(instance)
+    if created or new_state is None or new_state != instance._search_state:
+        transaction_search.update([instance], using=using)
+    instance._search_state = new_state
+
+
+@receiver(post_delete, sender=Transaction)
+def remove_transaction_search(sender, instance, using=None, **kwargs):
+    transaction_search.remove([instance.pk], using=using)
+
+
+def update_linked_transaction_search(sender, instance, raw=False, using=None, **kwargs):
+    # Receiver and beneficiary details are part of the transactions' search documents
+    if raw:
+        return
+    transaction_search.reindex(Transaction.objects.using(using).filter(**{LINKED_RECORDS[sender]: instance}))
+
+
+for linked_model in LINKED_RECORDS:
+    post_save.connect(update_linked_transaction_search, sender=linked_model,
+                      dispatch_uid=f"transaction_search_{linked_model.__name__}")
+
+
 # @receiver(pre_save, sender=User)
 # def save_profile(sender, instance, **kwargs):
 #     instance.profile.save()
@@ -1,79 +1,1960 @@
-from django.test import TestCase
-# test_prembly.py
+import asyncio
+import json
 import os
-import django
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
 import requests
-from pathlib import Path
-import dotenv #type: ignore 
-
-# Load environment variables
-env_path = Path(__file__).resolve().parent / '.env'
-dotenv.load_dotenv(env_path)
-
-# Setup Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fastest_exchange.settings')
-try:
-    django.setup()
-    print("✅ Django setup successful")
-except Exception as e:
-    print(f"❌ Django setup failed: {e}")
-
-def test_prembly_credentials():
-    """Test if Prembly credentials are working"""
-    print("Testing Prembly credentials...")
-    
-    # Get credentials from environment
-    app_id = os.getenv('PREMBLY_APP_ID')
-    api_key = os.getenv('PREMBLY_API_KEY')
-    
-    print(f"App ID: {app_id}")
-    print(f"API Key: {api_key}")
-    
-    if not app_id or not api_key:
-        print("❌ Prembly credentials not found in environment variables")
-        print("Please check your .env file")
-        return
-
-    url = " https://api.prembly.com/identitypass/verification/vnin"
-
-    headers = {
-        'x-api-key': api_key,
-        'app_id': app_id,
-        'Content-Type': 'application/json'
-    }
-    
-    # Test data - use a valid test NIN
-    data = {
-        "number": "40270119123"
-    }
-
-
-    try:
-        print("Sending request to Prembly...")
-        response = requests.post(url, json=data, headers=headers, timeout=30)
-        
-        print(f"Status Code: {response.status_code}")
-        print(f"Response: {response.text}")
-        
-        if response.status_code == 401:
-            print("❌ Authentication failed - check your API keys")
-        elif response.status_code == 403:
-            print("❌ Forbidden - check your subscription/plan")
-        elif response.status_code == 200:
-            print("✅ Credentials are working!")
-            result = response.json()
-            print(f"Verification status: {result.get('status')}")
-            print(f"Message: {result.get('message')}")
-        else:
-            print(f"❌ Unexpected response: {response.status_code}")
-            
-    except requests.exceptions.ConnectionError:
-        print("❌ Connection error - check your internet connection")
-    except requests.exceptions.Timeout:
-        print("❌ Request timeout - Prembly API is not responding")
-    except Exception as e:
-        print(f"❌ Error: {e}")
-
-if __name__ == "__main__":
-    test_prembly_credentials()
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakerRegistry, CircuitOpenError
+from .conditional import make_etag
+from .http_client import DeadlineExceeded, HttpClient
+from .last_known_good import LastKnownGoodRates
+from .messaging.fx_rate import FX_RATE_NOTIFICATION_COOLDOWN, FxRateNotifier
+from .messaging.notification import MailPool
+from .models import (
+    ExchangeRate, LatestExchangeRate, Notification, PricingRule, RateCandle, RedeemedQuote, SwapEngine,
+    Transaction, TransactionSearchEntry, TransactionStats, TransactionStatus, TransactionType, User,
+)
+from .pricing import ANY, DEFAULT_MARGIN, PricingRules, PricingTable, _default_rules
+from .provider_fetcher import ProviderCall, fetch_first
+from .quidax_exchange_service import QuidaxExchangeRateService
+from .quote_tokens import (
+    QUOTE_PRUNE_INTERVAL, QUOTE_RETENTION_MARGIN, QUOTE_TTL, QuoteError, claim_quote, issue_quote,
+    prune_redeemed_quotes, redeem_quote,
+)
+from .rate_cache import SingleFlight, StaleWhileRevalidateCache
+from .rate_graph import IMPLIED_INVERSE_PENALTY, RateGraph
+from .rate_pipeline import PROVIDER_DEADLINE, PROVIDER_HEDGE_DELAY, RatePipeline, rate_pipeline
+from .rate_providers import (
+    FALLBACK_CACHE_TIMEOUT, QUIDAX_MARKET_PAIRS, DatabaseProvider, LastKnownGoodProvider, ProviderRegistry,
+    QuidaxProvider, RateProvider,
+)
+from .rate_stream import RATE_STREAM_PATH, RateStreamApp, RateStreamHub, parse_pairs
+from .shared_snapshot import SharedRateSnapshot
+from .transaction_search import transaction_search
+from .views import SwapView
+
+
+class FakeClock:
+    """
+    Stands in for the time module of the code under test
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.advance(seconds)
+
+
+class RateGraphTests(SimpleTestCase):
+    def setUp(self):
+        self.graph = RateGraph()
+        self.graph.set_edge('USD', 'NGN', 1500.0)
+        self.graph.set_edge('NGN', 'UGX', 2.5)
+
+    def assert_matches_rebuild(self):
+        """
+        Incrementally maintained results equal a full Floyd-Warshall rebuild
+        """
+        incremental = {pair: (round(r.rate, 9), r.cost) for pair, r in self.graph._results.items()}
+        self.graph._rebuild()
+        rebuilt = {pair: (round(r.rate, 9), r.cost) for pair, r in self.graph._results.items()}
+        self.assertEqual(incremental, rebuilt)
+
+    def test_triangulates_through_intermediate_currency(self):
+        cross = self.graph.lookup('USD', 'UGX')
+        self.assertEqual(cross.path, ('USD', 'NGN', 'UGX'))
+        self.assertAlmostEqual(cross.rate, 3750.0)
+        self.assertEqual(cross.cost, 2.0)
+
+    def test_implied_inverse_costs_more_than_direct(self):
+        inverse = self.graph.lookup('NGN', 'USD')
+        self.assertAlmostEqual(inverse.rate, 1 / 1500.0)
+        self.assertEqual(inverse.cost, 1.0 + IMPLIED_INVERSE_PENALTY)
+        self.assertFalse(self.graph.has_edge('NGN', 'USD'))
+
+        # A direct quote replaces the implied inverse
+        self.graph.set_edge('NGN', 'USD', 0.0007)
+        self.assertTrue(self.graph.has_edge('NGN', 'USD'))
+        self.assertAlmostEqual(self.graph.lookup('NGN', 'USD').rate, 0.0007)
+        self.assert_matches_rebuild()
+
+    def test_rate_only_change_remultiplies_paths_using_the_edge(self):
+        self.graph.set_edge('USD', 'NGN', 1600.0)
+        cross = self.graph.lookup('USD', 'UGX')
+        self.assertEqual(cross.path, ('USD', 'NGN', 'UGX'))
+        self.assertAlmostEqual(cross.rate, 4000.0)
+        self.assert_matches_rebuild()
+
+    def test_cheaper_edge_relaxes_paths_through_it(self):
+        self.graph.set_edge('UGX', 'KES', 0.035)
+        self.graph.set_edge('USD', 'UGX', 3700.0)
+        self.assertEqual(self.graph.lookup('USD', 'UGX').path, ('USD', 'UGX'))
+        # Pairs beyond the new edge are relaxed too
+        cross = self.graph.lookup('USD', 'KES')
+        self.assertEqual(cross.path, ('USD', 'UGX', 'KES'))
+        self.assertAlmostEqual(cross.rate, 3700.0 * 0.035)
+        self.assert_matches_rebuild()
+
+    def test_more_expensive_edge_rebuilds(self):
+        self.graph.set_edge('USD', 'UGX', 3700.0)
+        self.graph.set_edge('USD', 'UGX', 3800.0, cost=self.graph.edge_cost('last_known_good'))
+        cross = self.graph.lookup('USD', 'UGX')
+        self.assertEqual(cross.path, ('USD', 'NGN', 'UGX'))
+        self.assertAlmostEqual(cross.rate, 3750.0)
+        self.assert_matches_rebuild()
+
+    def test_remove_edge_drops_paths_and_implied_inverse(self):
+        self.graph.remove_edge('NGN', 'UGX')
+        self.assertIsNone(self.graph.lookup('USD', 'UGX'))
+        self.assertIsNone(self.graph.lookup('UGX', 'NGN'))
+        self.assertIsNotNone(self.graph.lookup('USD', 'NGN'))
+        self.assert_matches_rebuild()
+
+    def test_lookup_respects_max_hops(self):
+        graph = RateGraph(max_hops=2)
+        for from_currency, to_currency in (('A', 'B'), ('B', 'C'), ('C', 'D')):
+            graph.set_edge(from_currency, to_currency, 2.0)
+        self.assertAlmostEqual(graph.lookup('A', 'C').rate, 4.0)
+        self.assertIsNone(graph.lookup('A', 'D'))
+
+    def test_seed_once_keeps_published_edges(self):
+        graph = RateGraph()
+        graph.set_edge('USD', 'NGN', 1600.0)
+        loads = []
+
+        def load_edges():
+            loads.append(1)
+            return [('USD', 'NGN', 1500.0, 1.0), ('NGN', 'UGX', 2.5, 1.0)]
+
+        graph.seed_once(load_edges)
+        graph.seed_once(load_edges)
+        self.assertEqual(len(loads), 1)
+        self.assertAlmostEqual(graph.lookup('USD', 'NGN').rate, 1600.0)
+        self.assertAlmostEqual(graph.lookup('USD', 'UGX').rate, 4000.0)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('fastest_exchange.circuit_breaker.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test', consecutive_failures=3, reset_timeout=30, min_calls=5)
+
+    def fail(self, breaker=None):
+        with self.assertRaises(ZeroDivisionError):
+            (breaker or self.breaker).call(lambda: 1 / 0)
+
+    def trip(self):
+        for _ in range(3):
+            self.fail()
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_consecutive_failures_open_the_circuit(self):
+        self.fail()
+        self.fail()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.fail()
+        self.assertEqual(self.breaker.state, OPEN)
+
+        calls = []
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.breaker.call(lambda: calls.append(1))
+        self.assertEqual(calls, [])
+        self.assertEqual(raised.exception.retry_in, 30)
+        self.assertEqual(self.breaker.as_dict()['rejected_calls'], 1)
+        self.assertEqual(self.breaker.health_score(), 0.0)
+
+    def test_error_rate_opens_the_circuit(self):
+        for ok in (True, False, True, False, False):
+            if ok:
+                self.breaker.call(lambda: 'ok')
+            else:
+                self.fail()
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_unsuccessful_result_counts_as_failure(self):
+        for _ in range(3):
+            self.assertIsNone(self.breaker.call(lambda: None, is_success=bool))
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_half_open_admits_one_probe_and_closes_on_success(self):
+        self.trip()
+        self.clock.advance(30)
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+        def probe():
+            # A second call while the probe is in flight is rejected
+            with self.assertRaises(CircuitOpenError):
+                self.breaker.call(lambda: 'second')
+            return 'probe'
+
+        self.assertEqual(self.breaker.call(probe), 'probe')
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_reopens(self):
+        self.trip()
+        self.clock.advance(30)
+        self.fail()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.clock.advance(29)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.clock.advance(1)
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+    def test_late_normal_call_does_not_close_half_open_circuit(self):
+        # Admitted while closed, finishes after the circuit tripped and went half-open
+        admission = self.breaker._admit()
+        self.trip()
+        self.clock.advance(30)
+        self.breaker._record(True, 0.1, admission)
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+        # The probe budget is still available to a real probe
+        self.assertEqual(self.breaker.call(lambda: 'probe'), 'probe')
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_late_normal_failure_does_not_reopen_half_open_circuit(self):
+        admission = self.breaker._admit()
+        self.trip()
+        self.clock.advance(30)
+        self.breaker._record(False, 0.1, admission)
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+    def test_stale_probe_does_not_move_a_later_half_open_period(self):
+        self.trip()
+        self.clock.advance(30)
+        stale = self.breaker._admit()
+        # The circuit re-opens (e.g. reset and tripped again) before the probe returns
+        self.breaker.reset()
+        self.trip()
+        self.clock.advance(30)
+        self.breaker._record(True, 0.1, stale)
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.available())
+
+    def test_registry_orders_by_health_and_skips_open_circuits(self):
+        registry = CircuitBreakerRegistry()
+        registry.get('healthy').call(lambda: 'ok')
+        registry.get('healthy').call(lambda: 'ok')
+        self.fail(registry.get('flaky'))
+        registry.get('flaky').call(lambda: 'ok')
+        for _ in range(3):
+            self.fail(registry.get('down'))
+        self.assertEqual(registry.ordered(['flaky', 'down', 'healthy', 'new']), ['healthy', 'new', 'flaky'])
+
+
+class QuidaxBreakerTests(SimpleTestCase):
+    def setUp(self):
+        registry = CircuitBreakerRegistry()
+        patcher = mock.patch('fastest_exchange.rate_providers.provider_breakers', registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = registry.get('quidax')
+        self.provider = QuidaxProvider('https://quidax.test/api/v1', 'key', QUIDAX_MARKET_PAIRS)
+
+    def respond(self, status_code):
+        response = mock.Mock(status_code=status_code)
+        with mock.patch('fastest_exchange.rate_providers.http_client.get', return_value=response) as get:
+            for _ in range(3):
+                self.assertIs(self.provider.request('/markets/tickers/usdtngn'), response)
+        return get
+
+    def test_rejected_or_rate_limited_calls_open_the_circuit(self):
+        for status_code in (401, 403, 429, 503):
+            self.breaker.reset()
+            self.respond(status_code)
+            self.assertEqual(self.breaker.state, OPEN, status_code)
+
+        with mock.patch('fastest_exchange.rate_providers.http_client.get') as get:
+            with self.assertRaises(CircuitOpenError):
+                self.provider.request('/markets/tickers/usdtngn')
+        get.assert_not_called()
+
+    def test_other_answers_keep_it_closed(self):
+        for status_code in (200, 404, 422):
+            self.respond(status_code)
+            self.assertEqual(self.breaker.state, CLOSED, status_code)
+
+
+PRICED_USD_NGN = {
+    'rate_info': {'source': 'database', 'margin_applied': 0.02, 'volume_discount': 0.0},
+    'exchange_rate': Decimal('1530.123457'),
+    'converted_amount': Decimal('153012.35'),
+}
+
+
+class QuoteTokenTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='quote@example.com', password='secret-pass-1')
+        self.other = User.objects.create_user(email='other@example.com', password='secret-pass-1')
+        self.token = issue_quote(self.user.pk, 'USD', 'NGN', Decimal('100'), PRICED_USD_NGN)['quote_token']
+
+    def swap(self):
+        return SwapEngine.objects.create(
+            currency_from='USD', currency_to='NGN', amount_sent=Decimal('100'),
+            converted_amount=Decimal('153012.35'), exchange_rate=Decimal('1530.123457'),
+            receiver_account_name='Ada Obi', receiver_account_number='0123456789', receiver_bank='GTB',
+        )
+
+    def test_redeem_returns_the_signed_decimals(self):
+        quote = redeem_quote(self.token, self.user.pk, 'USD', 'NGN', Decimal('100.00'))
+        self.assertEqual(quote['exchange_rate'], Decimal('1530.123457'))
+        self.assertEqual(quote['converted_amount'], Decimal('153012.35'))
+        self.assertEqual(quote['rate_info'], {'source': 'database', 'margin_applied': 0.02, 'volume_discount': 0.0})
+
+    def test_tampered_token_is_rejected(self):
+        with self.assertRaisesMessage(QuoteError, 'Invalid quote token'):
+            redeem_quote(self.token[:-2] + 'xx', self.user.pk, 'USD', 'NGN', Decimal('100'))
+
+    def test_expired_token_is_rejected(self):
+        with mock.patch('fastest_exchange.quote_tokens.QUOTE_TTL', -1):
+            with self.assertRaisesMessage(QuoteError, 'Quote has expired'):
+                redeem_quote(self.token, self.user.pk, 'USD', 'NGN', Decimal('100'))
+
+    def test_token_is_bound_to_the_user(self):
+        with self.assertRaisesMessage(QuoteError, 'different user'):
+            redeem_quote(self.token, self.other.pk, 'USD', 'NGN', Decimal('100'))
+        anonymous = issue_quote(None, 'USD', 'NGN', Decimal('100'), PRICED_USD_NGN)['quote_token']
+        with self.assertRaisesMessage(QuoteError, 'different user'):
+            redeem_quote(anonymous, self.user.pk, 'USD', 'NGN', Decimal('100'))
+
+    def test_token_must_match_the_swap(self):
+        for from_currency, to_currency, amount in (('USD', 'UGX', '100'), ('USD', 'NGN', '100.01')):
+            with self.assertRaisesMessage(QuoteError, 'does not match'):
+                redeem_quote(self.token, self.user.pk, from_currency, to_currency, Decimal(amount))
+
+    def test_replayed_nonce_is_rejected(self):
+        nonce = redeem_quote(self.token, self.user.pk, 'USD', 'NGN', Decimal('100'))['nonce']
+        with transaction.atomic():
+            claim_quote(nonce, self.user, self.swap())
+        with self.assertRaisesMessage(QuoteError, 'already been used'):
+            with transaction.atomic():
+                claim_quote(nonce, self.user, self.swap())
+        self.assertEqual(RedeemedQuote.objects.count(), 1)
+
+    def test_rolled_back_swap_leaves_the_token_unused(self):
+        nonce = redeem_quote(self.token, self.user.pk, 'USD', 'NGN', Decimal('100'))['nonce']
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                claim_quote(nonce, self.user, self.swap())
+                raise RuntimeError('swap failed')
+        self.assertFalse(RedeemedQuote.objects.exists())
+        with transaction.atomic():
+            claim_quote(nonce, self.user, self.swap())
+
+
+    def claim(self, redeemed_minutes_ago=0):
+        token = issue_quote(self.user.pk, 'USD', 'NGN', Decimal('100'), PRICED_USD_NGN)['quote_token']
+        nonce = redeem_quote(token, self.user.pk, 'USD', 'NGN', Decimal('100'))['nonce']
+        redeemed = claim_quote(nonce, self.user, self.swap())
+        RedeemedQuote.objects.filter(pk=redeemed.pk).update(
+            redeemed_at=timezone.now() - timedelta(minutes=redeemed_minutes_ago)
+        )
+        return redeemed
+
+    def test_expired_redeemed_quotes_are_pruned(self):
+        kept = self.claim()
+        self.claim(redeemed_minutes_ago=(QUOTE_TTL + QUOTE_RETENTION_MARGIN) // 60 + 1)
+
+        self.assertEqual(prune_redeemed_quotes(), 1)
+        self.assertEqual(list(RedeemedQuote.objects.all()), [kept])
+
+    def test_claims_prune_at_most_every_interval(self):
+        clock = FakeClock()
+        with mock.patch('fastest_exchange.quote_tokens.time', clock), \
+                mock.patch('fastest_exchange.quote_tokens._next_prune', 0.0):
+            expired = self.claim(redeemed_minutes_ago=60)
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.claim()
+            self.assertEqual(callbacks, [])
+
+            clock.advance(QUOTE_PRUNE_INTERVAL)
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.claim()
+            self.assertEqual(callbacks, [prune_redeemed_quotes])
+        self.assertEqual(RedeemedQuote.objects.count(), 2)
+        self.assertFalse(RedeemedQuote.objects.filter(pk=expired.pk).exists())
+
+@mock.patch('fastest_exchange.quidax_exchange_service.QuidaxExchangeRateService.price_conversion',
+            return_value=PRICED_USD_NGN)
+class QuotedSwapTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='swapper@example.com', password='secret-pass-1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def quote(self, client):
+        return client.get('/api/exchange-rates/convert/',
+                          {'from_currency': 'USD', 'to_currency': 'NGN', 'amount': '100'}).json()
+
+    def swap(self, client, token):
+        return client.post('/api/swap', {
+            'currency_from': 'USD', 'currency_to': 'NGN', 'amount_sent': '100.00', 'exchange_rate': '1',
+            'receiver_account_name': 'Ada Obi', 'receiver_account_number': '0123456789',
+            'receiver_bank': 'GTB', 'payment_method': 'bank_transfer', 'quote_token': token,
+        }, format='json')
+
+    def test_quote_executes_once_at_the_quoted_price(self, price_conversion):
+        token = self.quote(self.client)['quote_token']
+
+        response = self.swap(self.client, token)
+        self.assertEqual(response.status_code, 201)
+        swap = SwapEngine.objects.get()
+        self.assertEqual(swap.exchange_rate, Decimal('1530.123457'))
+        self.assertEqual(swap.converted_amount, Decimal('153012.35'))
+        self.assertEqual(swap.quote.user, self.user)
+
+        response = self.swap(self.client, token)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Quote has already been used')
+        self.assertEqual(SwapEngine.objects.count(), 1)
+
+    def test_quote_of_another_user_is_rejected(self, price_conversion):
+        token = self.quote(self.client)['quote_token']
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(email='thief@example.com', password='secret-pass-1'))
+
+        response = self.swap(other, token)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(SwapEngine.objects.exists())
+
+    def test_anonymous_quote_has_no_token(self, price_conversion):
+        conversion = self.quote(APIClient())
+        self.assertEqual(conversion['converted_amount'], 153012.35)
+        self.assertNotIn('quote_token', conversion)
+
+
+class TickStoreTests(TestCase):
+    def pointer(self, currency_from='BWP', currency_to='ETB'):
+        return LatestExchangeRate.objects.get(currency_from=currency_from, currency_to=currency_to).tick
+
+    def test_append_moves_the_latest_pointer(self):
+        first = ExchangeRate.objects.append('BWP', 'ETB', Decimal('9.5'), Decimal('500'), Decimal('1000'))
+        second = ExchangeRate.objects.append('BWP', 'ETB', Decimal('9.75'))
+
+        self.assertEqual(ExchangeRate.objects.count(), 2)
+        self.assertEqual(self.pointer(), second)
+        self.assertEqual(ExchangeRate.objects.latest_for_pair('BWP', 'ETB'), second)
+        self.assertNotEqual(first.pk, second.pk)
+
+    def test_low_amount_fields_carry_over(self):
+        ExchangeRate.objects.append('BWP', 'ETB', Decimal('9.5'), Decimal('500'), Decimal('1000'))
+        tick = ExchangeRate.objects.append('BWP', 'ETB', Decimal('9.75'))
+        self.assertEqual((tick.low_amount, tick.low_amount_limit), (Decimal('500'), Decimal('1000')))
+
+        tick = ExchangeRate.objects.append('BWP', 'ETB', Decimal('9.8'), low_amount=Decimal('450'))
+        self.assertEqual((tick.low_amount, tick.low_amount_limit), (Decimal('450'), Decimal('1000')))
+
+    def test_backfill_does_not_move_the_pointer(self):
+        now = timezone.now()
+        current = ExchangeRate.objects.append('BWP', 'ETB', Decimal('9.75'), created_at=now)
+        ExchangeRate.objects.append('BWP', 'ETB', Decimal('9.1'), created_at=now - timedelta(hours=1))
+        self.assertEqual(self.pointer(), current)
+
+    def test_bulk_append_points_each_pair_at_its_newest_tick(self):
+        now = timezone.now()
+        ticks = ExchangeRate.objects.bulk_append([
+            {'currency_from': 'BWP', 'currency_to': 'ETB', 'rate': Decimal('9.9'), 'created_at': now},
+            {'currency_from': 'BWP', 'currency_to': 'ETB', 'rate': Decimal('9.5'),
+             'created_at': now - timedelta(minutes=5)},
+            {'currency_from': 'GHC', 'currency_to': 'RMB', 'rate': Decimal('0.6'), 'created_at': now},
+        ])
+
+        self.assertEqual(self.pointer(), ticks[0])
+        self.assertEqual(self.pointer('GHC', 'RMB'), ticks[2])
+        self.assertEqual(LatestExchangeRate.objects.count(), 2)
+        self.assertEqual(ExchangeRate.objects.latest_for_pairs(), {('BWP', 'ETB'): ticks[0], ('GHC', 'RMB'): ticks[2]})
+
+
+@mock.patch.object(rate_pipeline, 'record', side_effect=ExchangeRate.objects.bulk_append)
+class ExchangeRateAdminTests(TestCase):
+    def setUp(self):
+        admin_user = User.objects.create_superuser(email='admin@example.com', password='secret-pass-1')
+        self.client.force_login(admin_user, backend='django.contrib.auth.backends.ModelBackend')
+
+    def test_add_appends_a_tick_through_the_pipeline(self, record):
+        response = self.client.post(reverse('admin:fastest_exchange_exchangerate_add'), {
+            'currency_from': 'BWP', 'currency_to': 'ETB', 'rate': '9.75',
+            'low_amount': '500', 'low_amount_limit': '1000',
+        })
+
+        self.assertEqual(response.status_code, 302)
+        record.assert_called_once()
+        tick = ExchangeRate.objects.get()
+        self.assertEqual(tick.rate, Decimal('9.75'))
+        self.assertEqual(ExchangeRate.objects.latest_for_pair('BWP', 'ETB'), tick)
+        self.assertEqual(RateCandle.objects.count(), len(RateCandle.Resolution.values))
+
+    def test_recorded_ticks_are_read_only(self, record):
+        tick = ExchangeRate.objects.append('BWP', 'ETB', Decimal('9.75'))
+
+        response = self.client.post(reverse('admin:fastest_exchange_exchangerate_change', args=[tick.pk]), {
+            'currency_from': 'BWP', 'currency_to': 'ETB', 'rate': '1.00',
+            'low_amount': '0', 'low_amount_limit': '0',
+        })
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(reverse('admin:fastest_exchange_exchangerate_delete', args=[tick.pk]),
+                                    {'post': 'yes'})
+        self.assertEqual(response.status_code, 403)
+        tick.refresh_from_db()
+        self.assertEqual(tick.rate, Decimal('9.75'))
+
+
+class RateCandleTests(TestCase):
+    start = datetime(2026, 3, 2, 10, 15, tzinfo=dt_timezone.utc)
+
+    def tick(self, rate, seconds):
+        return ExchangeRate(currency_from='BWP', currency_to='ETB', rate=Decimal(rate),
+                            created_at=self.start + timedelta(seconds=seconds))
+
+    def candle(self, resolution, bucket_start):
+        return RateCandle.objects.get(resolution=resolution, bucket_start=bucket_start)
+
+    def ohlc(self, candle):
+        return candle.open, candle.high, candle.low, candle.close, candle.tick_count
+
+    def test_bucket_boundaries(self):
+        moment = datetime(2026, 3, 2, 10, 15, 42, 123, tzinfo=dt_timezone.utc)
+        self.assertEqual(RateCandle.bucket_for(moment, '1m'), datetime(2026, 3, 2, 10, 15, tzinfo=dt_timezone.utc))
+        self.assertEqual(RateCandle.bucket_for(moment, '1h'), datetime(2026, 3, 2, 10, tzinfo=dt_timezone.utc))
+        self.assertEqual(RateCandle.bucket_for(moment, '1d'), datetime(2026, 3, 2, tzinfo=dt_timezone.utc))
+
+    def test_batch_is_folded_per_bucket(self):
+        written = RateCandle.objects.record_ticks([
+            self.tick('9.50', 0), self.tick('9.90', 20), self.tick('9.40', 40), self.tick('9.60', 59),
+            self.tick('9.70', 60),
+        ])
+
+        # Two minutes, one hour, one day
+        self.assertEqual(written, 4)
+        self.assertEqual(self.ohlc(self.candle('1m', self.start)),
+                         (Decimal('9.50'), Decimal('9.90'), Decimal('9.40'), Decimal('9.60'), 4))
+        self.assertEqual(self.ohlc(self.candle('1m', self.start + timedelta(minutes=1))),
+                         (Decimal('9.70'), Decimal('9.70'), Decimal('9.70'), Decimal('9.70'), 1))
+        self.assertEqual(self.ohlc(self.candle('1h', self.start.replace(minute=0))),
+                         (Decimal('9.50'), Decimal('9.90'), Decimal('9.40'), Decimal('9.70'), 5))
+
+    def test_later_batches_merge_into_stored_candles(self):
+        RateCandle.objects.record_ticks([self.tick('9.50', 10), self.tick('9.60', 30)])
+        RateCandle.objects.record_ticks([self.tick('9.20', 50)])
+
+        self.assertEqual(RateCandle.objects.count(), 3)
+        self.assertEqual(self.ohlc(self.candle('1m', self.start)),
+                         (Decimal('9.50'), Decimal('9.60'), Decimal('9.20'), Decimal('9.20'), 3))
+
+    def test_backfilled_tick_only_moves_open_when_earlier(self):
+        RateCandle.objects.record_ticks([self.tick('9.50', 10), self.tick('9.60', 30)])
+        RateCandle.objects.record_ticks([self.tick('9.00', 5), self.tick('9.55', 20)])
+
+        candle = self.candle('1m', self.start)
+        self.assertEqual(self.ohlc(candle), (Decimal('9.00'), Decimal('9.60'), Decimal('9.00'), Decimal('9.60'), 4))
+        self.assertEqual(candle.first_tick_at, self.start + timedelta(seconds=5))
+        self.assertEqual(candle.last_tick_at, self.start + timedelta(seconds=30))
+
+    def test_series_is_oldest_first(self):
+        RateCandle.objects.record_ticks([self.tick('9.50', 0), self.tick('9.70', 60), self.tick('9.90', 120)])
+
+        series = RateCandle.objects.series('BWP', 'ETB', '1m', since=self.start + timedelta(seconds=30))
+        self.assertEqual([candle.close for candle in series], [Decimal('9.50'), Decimal('9.70'), Decimal('9.90')])
+        series = RateCandle.objects.series('BWP', 'ETB', '1m', since=self.start + timedelta(minutes=1),
+                                           until=self.start + timedelta(minutes=1))
+        self.assertEqual([candle.close for candle in series], [Decimal('9.70')])
+
+
+MARGIN, VOLUME_DISCOUNT = PricingRule.Kind.MARGIN, PricingRule.Kind.VOLUME_DISCOUNT
+
+
+class PricingTableTests(SimpleTestCase):
+    def test_defaults_pick_the_margin_side_of_the_pair(self):
+        table = PricingTable(_default_rules())
+        # Selling local currency: we buy, so the rate is lowered
+        margin, factor, volume = table.for_pair('NGN', 'USD').at(Decimal('100'))
+        self.assertEqual((margin, factor, volume), (Decimal('0.02'), Decimal('0.98'), Decimal('1')))
+        margin, factor, _ = table.for_pair('USD', 'UGX').at(Decimal('100'))
+        self.assertEqual((margin, factor), (Decimal('0.025'), Decimal('1.025')))
+        # Pairs without a margin rule
+        self.assertEqual(table.for_pair('BWP', 'ETB').at(Decimal('100'))[0], DEFAULT_MARGIN)
+
+    def test_tiers_apply_from_their_breakpoint_upwards(self):
+        pricing = PricingTable(_default_rules()).for_pair('USD', 'NGN')
+        self.assertEqual(pricing.breakpoints, (Decimal('5000'), Decimal('10000')))
+        self.assertEqual(pricing.at(Decimal('4999.99'))[2], Decimal('1'))
+        self.assertEqual(pricing.at(Decimal('5000'))[2], Decimal('0.998'))
+        self.assertEqual(pricing.at(Decimal('250000'))[2], Decimal('0.995'))
+
+    def test_margin_and_discount_breakpoints_are_merged(self):
+        table = PricingTable({
+            (MARGIN, 'USD', 'NGN'): [(Decimal('1000'), Decimal('0.01')), (Decimal('0'), Decimal('0.03'))],
+            (VOLUME_DISCOUNT, ANY, ANY): [(Decimal('5000'), Decimal('0.002'))],
+        })
+        pricing = table.for_pair('USD', 'NGN')
+        self.assertEqual(pricing.breakpoints, (Decimal('1000'), Decimal('5000')))
+        self.assertEqual([segment[0] for segment in pricing.segments],
+                         [Decimal('0.03'), Decimal('0.01'), Decimal('0.01')])
+        self.assertEqual([segment[2] for segment in pricing.segments],
+                         [Decimal('1'), Decimal('1'), Decimal('0.998')])
+
+    def test_most_specific_scope_wins(self):
+        table = PricingTable({
+            (MARGIN, ANY, ANY): [(Decimal('0'), Decimal('0.05'))],
+            (MARGIN, ANY, 'NGN'): [(Decimal('0'), Decimal('0.04'))],
+            (MARGIN, 'USD', ANY): [(Decimal('0'), Decimal('0.03'))],
+            (MARGIN, 'USD', 'NGN'): [(Decimal('0'), Decimal('0.01'))],
+        })
+        self.assertEqual(table.for_pair('USD', 'NGN').at(Decimal('1'))[0], Decimal('0.01'))
+        self.assertEqual(table.for_pair('USD', 'UGX').at(Decimal('1'))[0], Decimal('0.03'))
+        self.assertEqual(table.for_pair('GHC', 'NGN').at(Decimal('1'))[0], Decimal('0.04'))
+        self.assertEqual(table.for_pair('GHC', 'UGX').at(Decimal('1'))[0], Decimal('0.05'))
+
+    def test_margin_below_the_first_tier_is_the_default(self):
+        table = PricingTable({(MARGIN, 'USD', 'NGN'): [(Decimal('1000'), Decimal('0.01'))]})
+        pricing = table.for_pair('USD', 'NGN')
+        self.assertEqual(pricing.at(Decimal('999'))[0], DEFAULT_MARGIN)
+        self.assertEqual(pricing.at(Decimal('1000'))[0], Decimal('0.01'))
+
+    def test_pair_tables_are_compiled_once(self):
+        table = PricingTable(_default_rules())
+        self.assertIs(table.for_pair('USD', 'NGN'), table.for_pair('USD', 'NGN'))
+
+
+class PricingRulesTests(TestCase):
+    def test_active_rules_replace_the_defaults_of_their_scope(self):
+        PricingRule.objects.create(kind=MARGIN, currency_from='usd', currency_to='ngn', value=Decimal('0.01'))
+        PricingRule.objects.create(kind=MARGIN, currency_from='USD', currency_to='UGX', value=Decimal('0.09'),
+                                   is_active=False)
+
+        rules = PricingRules(check_interval=60)
+        self.assertEqual(rules.for_pair('USD', 'NGN').at(Decimal('100'))[0], Decimal('0.01'))
+        self.assertEqual(rules.for_pair('USD', 'UGX').at(Decimal('100'))[0], Decimal('0.025'))
+        # Volume discounts still come from the defaults
+        self.assertEqual(rules.for_pair('USD', 'NGN').at(Decimal('10000'))[2], Decimal('0.995'))
+
+    def test_reload_swaps_and_retires_the_table(self):
+        rules = PricingRules(check_interval=60)
+        pricing = rules.for_pair('USD', 'NGN')
+
+        rules.reload()
+        self.assertIs(rules.for_pair('USD', 'NGN'), pricing)
+
+        PricingRule.objects.create(kind=MARGIN, currency_from='USD', currency_to='NGN', value=Decimal('0.01'))
+        rules.reload()
+        self.assertTrue(pricing.retired)
+        self.assertEqual(rules.for_pair('USD', 'NGN').at(Decimal('100'))[0], Decimal('0.01'))
+
+    def test_check_waits_for_the_interval(self):
+        clock = FakeClock()
+        with mock.patch('fastest_exchange.pricing.time', clock):
+            rules = PricingRules(check_interval=5)
+            table = rules.table
+            PricingRule.objects.create(kind=MARGIN, currency_from='USD', currency_to='NGN', value=Decimal('0.01'))
+
+            with self.assertNumQueries(0):
+                rules.check()
+            self.assertIs(rules.table, table)
+
+            clock.advance(5)
+            rules.check()
+            self.assertIsNot(rules.table, table)
+
+
+class TransactionStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='stats@example.com', password='secret-pass-1')
+
+    def create(self, user=None, **fields):
+        fields.setdefault('transaction_type', TransactionType.SWAP)
+        return Transaction.objects.create(user=user or self.user, **fields)
+
+    def counters(self, stats):
+        return (stats.total_count, stats.status_counts, stats.type_counts, stats.amount_sent_total,
+                stats.amount_sent_count, stats.daily_counts)
+
+    def assert_matches_rebuild(self, user=None):
+        user = user or self.user
+        incremental = self.counters(TransactionStats.objects.get(pk=user.pk))
+        rebuilt = self.counters(TransactionStats.objects.rebuild([user.pk])[user.pk])
+        self.assertEqual(incremental, rebuilt)
+        return incremental
+
+    def test_created_transactions_are_counted(self):
+        self.create(amount_sent=Decimal('100.00'))
+        self.create(amount_sent=Decimal('50.50'), transaction_type=TransactionType.BANK_TRANSFER,
+                    status=TransactionStatus.COMPLETED)
+        self.create()
+
+        total, status_counts, type_counts, amount_total, amount_count, daily = self.assert_matches_rebuild()
+        self.assertEqual(total, 3)
+        self.assertEqual(status_counts, {'INITIATED': 2, 'COMPLETED': 1})
+        self.assertEqual(type_counts, {'SWAP': 2, 'BANK_TRANSFER': 1})
+        self.assertEqual((amount_total, amount_count), (Decimal('150.50'), 2))
+        self.assertEqual(daily, {timezone.localdate().isoformat(): 3})
+
+    def test_updates_move_the_contribution(self):
+        first = self.create(amount_sent=Decimal('100.00'))
+        self.create(amount_sent=Decimal('20.00'))
+
+        first.mark_completed()
+        reloaded = Transaction.objects.get(pk=first.pk)
+        reloaded.amount_sent = Decimal('80.00')
+        reloaded.transaction_type = TransactionType.MOBILE_MONEY
+        reloaded.save()
+
+        _, status_counts, type_counts, amount_total, _, _ = self.assert_matches_rebuild()
+        self.assertEqual(status_counts, {'INITIATED': 1, 'COMPLETED': 1})
+        self.assertEqual(type_counts, {'SWAP': 1, 'MOBILE_MONEY': 1})
+        self.assertEqual(amount_total, Decimal('100.00'))
+
+    def test_moving_to_another_user_updates_both(self):
+        other = User.objects.create_user(email='stats-other@example.com', password='secret-pass-1')
+        self.create(user=other)
+        moved = self.create(amount_sent=Decimal('10.00'))
+
+        moved.user = other
+        moved.save()
+
+        self.assertEqual(self.assert_matches_rebuild()[0], 0)
+        self.assertEqual(self.assert_matches_rebuild(other)[0], 2)
+
+    def test_deleted_transactions_are_removed(self):
+        kept = self.create(amount_sent=Decimal('10.00'))
+        self.create(amount_sent=Decimal('5.00'), status=TransactionStatus.FAILED).delete()
+
+        total, status_counts, _, amount_total, _, _ = self.assert_matches_rebuild()
+        self.assertEqual((total, status_counts, amount_total), (1, {'INITIATED': 1}, Decimal('10.00')))
+        kept.delete()
+        self.assertEqual(self.assert_matches_rebuild()[0], 0)
+
+    def test_save_of_a_partially_loaded_row_rebuilds(self):
+        self.create(amount_sent=Decimal('10.00'))
+        partial = Transaction.objects.only('id', 'user', 'notes').get()
+        partial.notes = 'checked'
+        partial.save()
+
+        self.assertEqual(self.assert_matches_rebuild()[0], 1)
+
+    def test_stats_view_reads_one_row(self):
+        self.create(amount_sent=Decimal('100.00'), status=TransactionStatus.COMPLETED)
+        self.create(amount_sent=Decimal('50.00'))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with self.assertNumQueries(1):
+            response = client.get('/api/transactions/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_transactions'], 2)
+        self.assertEqual(response.data['completed_transactions'], 1)
+        self.assertEqual(response.data['total_amount_sent'], '150.00')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='pages@example.com', password='secret-pass-1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        start = timezone.now() - timedelta(days=1)
+        # Seven transactions on five timestamps, so pages split ties
+        for minutes in (0, 1, 1, 1, 2, 3, 3):
+            transaction_row = Transaction.objects.create(user=self.user, transaction_type=TransactionType.SWAP)
+            Transaction.objects.filter(pk=transaction_row.pk).update(created_at=start + timedelta(minutes=minutes))
+        self.newest_first = list(
+            Transaction.objects.order_by('-created_at', '-id').values_list('transaction_id', flat=True)
+        )
+
+    def page(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, page):
+        return [row['transaction_id'] for row in page['results']]
+
+    def test_walk_forward_and_back(self):
+        pages = [self.page('/api/transactions/', {'page_size': 2})]
+        while pages[-1]['next']:
+            pages.append(self.page(pages[-1]['next']))
+
+        self.assertEqual([self.ids(page) for page in pages],
+                         [self.newest_first[index:index + 2] for index in range(0, 7, 2)])
+        self.assertIsNone(pages[0]['previous'])
+        self.assertNotIn('count', pages[0])
+
+        back = pages[-1]
+        for index in (4, 2, 0):
+            back = self.page(back['previous'])
+            self.assertEqual(self.ids(back), self.newest_first[index:index + 2])
+        self.assertIsNone(back['previous'])
+        self.assertIsNotNone(back['next'])
+
+    def test_count_on_request(self):
+        page = self.page('/api/transactions/', {'page_size': 3, 'count': 'true'})
+        self.assertEqual(page['count'], 7)
+
+    def test_filters_apply_to_every_page(self):
+        Transaction.objects.filter(transaction_id__in=self.newest_first[1::2]).update(
+            status=TransactionStatus.COMPLETED
+        )
+        first = self.page('/api/transactions/', {'page_size': 2, 'status': TransactionStatus.COMPLETED})
+        second = self.page(first['next'])
+        self.assertEqual(self.ids(first) + self.ids(second), self.newest_first[1::2])
+        self.assertIsNone(second['next'])
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get('/api/transactions/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class TransactionSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='search@example.com', password='secret-pass-1')
+        self.other = User.objects.create_user(email='search-other@example.com', password='secret-pass-1')
+
+    def swap_transaction(self, user, transaction_id, receiver_name, **fields):
+        swap = SwapEngine.objects.create(
+            currency_from='USD', currency_to='NGN', amount_sent=Decimal('100'),
+            converted_amount=Decimal('153012.35'), exchange_rate=Decimal('1530.123457'),
+            receiver_account_name=receiver_name, receiver_account_number='0123456789', receiver_bank='GTB',
+        )
+        return Transaction.objects.create(
+            user=user, transaction_id=transaction_id, transaction_type=TransactionType.SWAP,
+            currency_from='USD', currency_to='NGN', swap_reference=swap, **fields
+        )
+
+    def search(self, query, user=None):
+        queryset = Transaction.objects.filter(user=user or self.user)
+        return set(transaction_search.search(queryset, (user or self.user).pk, query)
+                   .values_list('transaction_id', flat=True))
+
+    def test_terms_match_as_prefixes_of_linked_records(self):
+        self.swap_transaction(self.user, 'TXN00000001AAAA', 'Adaeze Okafor')
+        self.swap_transaction(self.user, 'TXN00000002BBBB', 'Bola Ade', notes='school fees')
+
+        self.assertEqual(self.search('ada'), {'TXN00000001AAAA'})
+        self.assertEqual(self.search('ADE'), {'TXN00000002BBBB'})
+        self.assertEqual(self.search('ada oka'), {'TXN00000001AAAA'})
+        self.assertEqual(self.search('school'), {'TXN00000002BBBB'})
+        self.assertEqual(self.search('0123'), {'TXN00000001AAAA', 'TXN00000002BBBB'})
+        self.assertEqual(self.search('zzz'), set())
+
+    def test_search_is_scoped_to_the_owner(self):
+        self.swap_transaction(self.user, 'TXN00000001AAAA', 'Adaeze Okafor')
+        self.swap_transaction(self.other, 'TXN00000002BBBB', 'Adaeze Okafor')
+
+        self.assertEqual(self.search('adaeze'), {'TXN00000001AAAA'})
+        self.assertEqual(self.search('adaeze', self.other), {'TXN00000002BBBB'})
+        # Another user's id in the query does not widen the scope
+        everyone = Transaction.objects.all()
+        found = transaction_search.search(everyone, self.user.pk, 'adaeze').values_list('transaction_id', flat=True)
+        self.assertEqual(list(found), ['TXN00000001AAAA'])
+
+    def test_reference_prefix(self):
+        self.swap_transaction(self.user, 'TXN00000001AAAA', 'Adaeze Okafor')
+        self.swap_transaction(self.user, 'TXN00000002BBBB', 'Bola Ade')
+        self.swap_transaction(self.other, 'TXN00000003CCCC', 'Bola Ade')
+
+        matches = transaction_search.match_reference(Transaction.objects.all(), self.user.pk, 'txn00000001')
+        self.assertEqual(list(matches.values_list('transaction_id', flat=True)), ['TXN00000001AAAA'])
+        matches = transaction_search.match_reference(Transaction.objects.all(), self.user.pk, 'TXN0000000')
+        self.assertEqual(set(matches.values_list('transaction_id', flat=True)),
+                         {'TXN00000001AAAA', 'TXN00000002BBBB'})
+
+    def test_entries_follow_writes(self):
+        transaction_row = self.swap_transaction(self.user, 'TXN00000001AAAA', 'Adaeze Okafor')
+
+        swap = transaction_row.swap_reference
+        swap.receiver_account_name = 'Chinedu Eze'
+        swap.save()
+        self.assertEqual(self.search('adaeze'), set())
+        self.assertEqual(self.search('chinedu'), {'TXN00000001AAAA'})
+
+        transaction_row.notes = 'rent'
+        transaction_row.save()
+        self.assertEqual(self.search('rent'), {'TXN00000001AAAA'})
+
+        transaction_row.delete()
+        self.assertFalse(TransactionSearchEntry.objects.exists())
+
+    def test_rebuild_command_refills_the_index(self):
+        self.swap_transaction(self.user, 'TXN00000001AAAA', 'Adaeze Okafor')
+        transaction_search.clear()
+        self.assertEqual(self.search('adaeze'), set())
+
+        call_command('rebuild_transaction_search', stdout=StringIO())
+        self.assertEqual(self.search('adaeze'), {'TXN00000001AAAA'})
+
+    def test_search_view_ranks_by_relevance(self):
+        self.swap_transaction(self.user, 'TXN00000001AAAA', 'Adaeze Okafor', notes='ada ada ada')
+        self.swap_transaction(self.user, 'TXN00000002BBBB', 'Adaeze Okafor')
+        self.swap_transaction(self.user, 'TXN00000003CCCC', 'Bola Ade')
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get('/api/transactions/search/', {'q': 'ada', 'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual([row['transaction_id'] for row in page['results']], ['TXN00000001AAAA'])
+        page = client.get(page['next']).json()
+        self.assertEqual([row['transaction_id'] for row in page['results']], ['TXN00000002BBBB'])
+        self.assertIsNone(page['next'])
+
+
+class TransactionAdminActionTests(TestCase):
+    def setUp(self):
+        admin_user = User.objects.create_superuser(email='ops@example.com', password='secret-pass-1')
+        self.client.force_login(admin_user, backend='django.contrib.auth.backends.ModelBackend')
+        self.owner = User.objects.create_user(email='owner@example.com', password='secret-pass-1')
+        self.api = APIClient()
+        self.api.force_authenticate(self.owner)
+        self.transaction = Transaction.objects.create(user=self.owner, transaction_type=TransactionType.SWAP)
+        # Rows last written in an earlier second than the bulk action
+        Transaction.objects.filter(pk=self.transaction.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+
+    def test_bulk_status_change_invalidates_conditional_gets(self):
+        urls = ['/api/transactions/', f'/api/transactions/{self.transaction.transaction_id}/']
+        validators = {url: self.api.get(url) for url in urls}
+        for url, response in validators.items():
+            self.assertEqual(self.api.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        for action, status in (('mark_as_failed', 'FAILED'), ('mark_as_pending', 'PENDING'),
+                               ('mark_as_completed', 'COMPLETED')):
+            response = self.client.post(reverse('admin:fastest_exchange_transaction_changelist'), {
+                'action': action, '_selected_action': [self.transaction.pk],
+            })
+            self.assertEqual(response.status_code, 302)
+
+            for url in urls:
+                response = self.api.get(url, HTTP_IF_NONE_MATCH=validators[url]['ETag'],
+                                        HTTP_IF_MODIFIED_SINCE=validators[url]['Last-Modified'])
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(status, response.content.decode())
+                validators[url] = response
+
+
+class CountingEvent(threading.Event):
+    """
+    Event that counts the threads blocked in wait()
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.waiting = 0
+        self._count_lock = threading.Lock()
+
+    def wait(self, timeout=None):
+        with self._count_lock:
+            self.waiting += 1
+        return super().wait(timeout)
+
+
+def counting_call_init(call):
+    call.event = CountingEvent()
+    call.result = None
+    call.error = None
+
+
+@mock.patch.object(SingleFlight._Call, '__init__', counting_call_init)
+class RateCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.cache = StaleWhileRevalidateCache('test_rates_', stale_ttl=60)
+        self.release = threading.Event()
+        self.loads = []
+
+    def loader(self, value='fresh', error=None):
+        def load():
+            self.loads.append(threading.current_thread().name)
+            self.release.wait(5)
+            if error is not None:
+                raise error
+            return value, 30
+        return load
+
+    def wait_until(self, condition):
+        for _ in range(500):
+            if condition():
+                return
+            time.sleep(0.01)
+        self.fail('condition not reached')
+
+    def concurrent_gets(self, count, loader):
+        """
+        Start count gets of one missing key; release the loader once all but the leader wait on it
+        """
+        outcomes = [None] * count
+
+        def get(index):
+            try:
+                outcomes[index] = self.cache.get('USD_NGN', loader)
+            except Exception as e:
+                outcomes[index] = e
+
+        threads = [threading.Thread(target=get, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        self.wait_until(lambda: self.cache._flight.in_flight('USD_NGN')
+                        and self.cache._flight._calls['USD_NGN'].event.waiting == count - 1)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        return outcomes
+
+    def test_concurrent_misses_load_once(self):
+        outcomes = self.concurrent_gets(8, self.loader())
+
+        self.assertEqual(len(self.loads), 1)
+        self.assertEqual(outcomes, [('fresh', 30)] * 8)
+        value, fresh_for = self.cache.get('USD_NGN', self.loader('unused'))
+        self.assertEqual(value, 'fresh')
+        self.assertEqual(len(self.loads), 1)
+
+    def test_stale_value_is_served_during_one_refresh(self):
+        self.cache.set('USD_NGN', 'stale', ttl=0)
+        refreshed = threading.Event()
+
+        value, fresh_for = self.cache.get('USD_NGN', self.loader(), lambda value, ttl: refreshed.set())
+        self.assertEqual(value, 'stale')
+        self.assertLessEqual(fresh_for, 0)
+        self.wait_until(lambda: self.loads)
+        for _ in range(5):
+            self.assertEqual(self.cache.get('USD_NGN', self.loader('other'))[0], 'stale')
+
+        self.release.set()
+        self.assertTrue(refreshed.wait(5))
+        self.assertEqual(len(self.loads), 1)
+        self.assertEqual(self.cache.get('USD_NGN', self.loader('unused'))[0], 'fresh')
+
+    def test_loader_error_reaches_every_waiter_without_poisoning_the_key(self):
+        error = ConnectionError('provider down')
+        outcomes = self.concurrent_gets(5, self.loader(error=error))
+
+        self.assertEqual(len(self.loads), 1)
+        self.assertTrue(all(outcome is error for outcome in outcomes))
+        self.assertFalse(self.cache._flight.in_flight('USD_NGN'))
+        self.assertIsNone(cache.get(self.cache.cache_key('USD_NGN')))
+
+        self.assertEqual(self.cache.get('USD_NGN', self.loader('recovered')), ('recovered', 30))
+        self.assertEqual(len(self.loads), 2)
+
+
+def rate_info(pair, rate, source='fixer'):
+    return {'rate': rate, 'source': source, 'timestamp': '2026-03-02T10:00:00+00:00', 'pair': pair}
+
+
+@mock.patch('fastest_exchange.rate_pipeline.rate_graph', RateGraph())
+class SharedSnapshotTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'rates.json')
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def worker(self, name):
+        # Separate cache prefixes stand in for the per-process LocMem caches
+        return RatePipeline(name, ProviderRegistry(), shared_path=self.path)
+
+    def test_rates_written_by_one_process_are_read_by_another(self):
+        writer = SharedRateSnapshot(self.path, poll_interval=60)
+        reader = SharedRateSnapshot(self.path, poll_interval=60)
+
+        writer.write([(rate_info('USD_NGN', 1530.5), 300), (rate_info('GHC_NGN', 101.2), 300)])
+        fresh, removed = reader.changes(force=True)
+        self.assertEqual(sorted((info['pair'], info['rate']) for info, _ in fresh),
+                         [('GHC_NGN', 101.2), ('USD_NGN', 1530.5)])
+        self.assertTrue(all(0 < ttl <= 300 for _, ttl in fresh))
+        self.assertEqual(removed, [])
+
+        # Own writes and entries already applied are not reported again
+        self.assertEqual(writer.changes(force=True), ([], []))
+        self.assertEqual(reader.changes(force=True), ([], []))
+
+    def test_expired_entries_are_not_shared(self):
+        SharedRateSnapshot(self.path, poll_interval=60).write([(rate_info('USD_NGN', 1530.5), -1)])
+        self.assertEqual(SharedRateSnapshot(self.path, poll_interval=60).changes(force=True), ([], []))
+
+    def test_polls_wait_for_the_interval(self):
+        writer = SharedRateSnapshot(self.path, poll_interval=60)
+        reader = SharedRateSnapshot(self.path, poll_interval=60)
+        writer.write([(rate_info('USD_NGN', 1530.5), 300)])
+        self.assertEqual(len(reader.changes()[0]), 1)
+
+        writer.write([(rate_info('GHC_NGN', 101.2), 300)])
+        self.assertIsNone(reader.changes())
+        self.assertEqual(len(reader.changes(force=True)[0]), 1)
+
+    def test_sync_publishes_other_workers_rates(self):
+        first, second = self.worker('worker_a'), self.worker('worker_b')
+
+        first.push(rate_info('USD_NGN', 1530.5), 300)
+        self.assertIsNone(second.snapshot.lookup('USD', 'NGN'))
+        second.sync_shared(force=True)
+        self.assertEqual(second.snapshot.lookup('USD', 'NGN').info['rate'], 1530.5)
+
+    def test_removal_invalidates_the_other_workers_snapshot_and_cache(self):
+        first, second = self.worker('worker_a'), self.worker('worker_b')
+        first.push(rate_info('USD_NGN', 1530.5), 300)
+        second.sync_shared(force=True)
+        second.rate_cache.set('USD_NGN', rate_info('USD_NGN', 1530.5), 300)
+
+        first.invalidate('USD_NGN')
+        self.assertIsNone(first.snapshot.lookup('USD', 'NGN'))
+        second.sync_shared(force=True)
+        self.assertIsNone(second.snapshot.lookup('USD', 'NGN'))
+        self.assertIsNone(cache.get(second.rate_cache.cache_key('USD_NGN')))
+
+
+@mock.patch('fastest_exchange.rate_pipeline.rate_graph', RateGraph())
+@mock.patch('fastest_exchange.rate_pipeline.connections')
+class RateReadinessTests(TestCase):
+    def setUp(self):
+        self.pipeline = RatePipeline('readiness', ProviderRegistry(), shared_path='')
+        self.pipeline.start_refresher = mock.Mock()
+        patcher = mock.patch('fastest_exchange.exchange_rate_views.rate_pipeline', self.pipeline)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def ready(self):
+        return self.client.get('/api/health/ready/')
+
+    def test_not_ready_until_warm_up_completes(self, connections):
+        self.assertEqual(self.ready().status_code, 503)
+        self.pipeline.warm_state = 'warming'
+        response = self.ready()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['state'], 'warming')
+
+        self.pipeline.warm_up()
+        response = self.ready()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['state'], 'warm')
+        self.pipeline.start_refresher.assert_called_once()
+
+    def test_failed_warm_up_stays_unready(self, connections):
+        with mock.patch.object(self.pipeline.pair_registry, 'pairs', side_effect=RuntimeError('db down')):
+            self.pipeline.warm_up()
+        response = self.ready()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['state'], 'cold')
+        # The refresher retries the warm-up
+        self.pipeline.start_refresher.assert_called_once()
+
+
+class DownUpstreamProvider(RateProvider):
+    """
+    Remote provider whose every call fails
+    """
+
+    name = 'down_upstream'
+    source = 'down_upstream'
+    remote = True
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def fetch(self, from_currency, to_currency, timeout=None):
+        self.calls += 1
+        raise ConnectionError('upstream down')
+
+
+class LastKnownGoodTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'last_known_good.json')
+
+    def rates(self, seed_rates=None):
+        return LastKnownGoodRates(self.path, seed_rates or {'USD_NGN': 1500.0})
+
+    def stored(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def test_missing_file_starts_from_stored_and_seed_rates(self):
+        ExchangeRate.objects.append('BWP', 'ETB', Decimal('9.75'))
+        rates = self.rates()
+
+        self.assertEqual(rates.get('USD', 'NGN')['last_source'], 'seed')
+        self.assertEqual(rates.get('BWP', 'ETB')['rate'], 9.75)
+        self.assertEqual(rates.pairs, [('BWP', 'ETB'), ('USD', 'NGN')])
+        # The stored rates are persisted, so the next load needs no query
+        self.assertEqual(list(self.stored()['rates']), ['BWP_ETB'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.rates().get('BWP', 'ETB')['rate'], 9.75)
+
+    def test_corrupt_file_falls_back_to_seed_rates(self):
+        with open(self.path, 'w') as f:
+            f.write('{"rates": {"USD_NGN"')
+        rates = self.rates()
+
+        self.assertEqual(rates.get('USD', 'NGN'), {
+            'rate': 1500.0, 'source': 'last_known_good', 'timestamp': None, 'pair': 'USD_NGN',
+            'last_source': 'seed',
+        })
+        self.assertIsNone(rates.get('GHC', 'NGN'))
+
+    def test_derived_rates_are_not_recorded(self):
+        rates = self.rates()
+        rates.record([
+            {'pair': 'USD_NGN', 'rate': 1.0, 'source': 'triangulated'},
+            {'pair': 'USD_NGN', 'rate': 2.0, 'source': 'last_known_good'},
+        ])
+        self.assertEqual(rates.get('USD', 'NGN')['rate'], 1500.0)
+
+    def test_writes_merge_with_other_processes(self):
+        first, second = self.rates(), self.rates()
+        first.load()
+        second.load()
+
+        first.record([{'pair': 'USD_NGN', 'rate': 1560.0, 'source': 'fixer',
+                       'timestamp': '2026-03-02T10:05:00+00:00'}])
+        # An older rate for the same pair does not replace the newer one; its other pair is kept
+        second.record([
+            {'pair': 'USD_NGN', 'rate': 1550.0, 'source': 'database', 'timestamp': '2026-03-02T10:00:00+00:00'},
+            {'pair': 'GHC_NGN', 'rate': 101.2, 'source': 'database', 'timestamp': '2026-03-02T10:00:00+00:00'},
+        ])
+
+        stored = self.stored()
+        self.assertEqual(stored['rates']['USD_NGN']['rate'], 1560.0)
+        self.assertEqual(stored['rates']['GHC_NGN']['rate'], 101.2)
+        self.assertEqual(stored['version'], second.version)
+
+    def test_concurrent_writers_do_not_lose_updates(self):
+        writers = [self.rates() for _ in range(8)]
+        for writer in writers:
+            writer.load()
+        threads = [
+            threading.Thread(target=writer.record, args=([{
+                'pair': f'C{index}_NGN', 'rate': float(index + 1), 'source': 'fixer',
+                'timestamp': '2026-03-02T10:00:00+00:00',
+            }],))
+            for index, writer in enumerate(writers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(sorted(self.stored()['rates']), sorted(f'C{index}_NGN' for index in range(8)))
+
+    @mock.patch('fastest_exchange.rate_pipeline.rate_graph', RateGraph())
+    def test_answers_when_every_upstream_is_down(self):
+        upstream = DownUpstreamProvider()
+        pipeline = RatePipeline('degraded', ProviderRegistry([
+            DatabaseProvider(), upstream, LastKnownGoodProvider(self.rates()),
+        ]), hedge_delay=0.01, deadline=1, shared_path='')
+
+        rate_info, ttl = pipeline.resolve('USD', 'NGN')
+        self.assertEqual(upstream.calls, 1)
+        self.assertEqual((rate_info['source'], rate_info['rate']), ('last_known_good', 1500.0))
+        self.assertEqual(ttl, FALLBACK_CACHE_TIMEOUT)
+
+    def test_swap_falls_back_to_the_last_known_good_rate(self):
+        with mock.patch('fastest_exchange.views.last_known_good', self.rates()), \
+                mock.patch('fastest_exchange.exchange_rate_service.ExchangeRateService.price_conversion',
+                           side_effect=RuntimeError('pricing down')):
+            result = SwapView().calculate_swap('USD', 'NGN', Decimal('100'))
+            unsupported = SwapView().calculate_swap('GHC', 'NGN', Decimal('100'))
+
+        self.assertEqual(result['rate_source'], 'last_known_good')
+        self.assertEqual(result['exchange_rate'], Decimal('1500.000000'))
+        self.assertEqual(result['converted_amount'], Decimal('150000.00'))
+        self.assertIn('not supported', unsupported['error'])
+        self.assertIn('USD→NGN', unsupported['error'])
+
+
+class StreamEntry:
+    def __init__(self, pair, rate, source='database'):
+        self.pair = pair
+        self.info = {'rate': rate, 'source': source, 'timestamp': '2026-03-02T10:00:00+00:00', 'pair': pair}
+
+
+class StreamService:
+    """
+    Rate service stand-in: answers the pairs in rates, None for the others
+    """
+
+    def __init__(self, **rates):
+        self.snapshot = mock.Mock()
+        self.rates = rates
+
+    def _get_rate_entry(self, from_currency, to_currency):
+        pair = f"{from_currency}_{to_currency}"
+        return StreamEntry(pair, self.rates[pair]) if pair in self.rates else None
+
+
+def stream_events(chunk):
+    """
+    (event, data) of every SSE event in a chunk
+    """
+    events = []
+    for frame in chunk.decode().strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in frame.split('\n') if not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+class RateStreamTests(SimpleTestCase):
+    def setUp(self):
+        self.hub = RateStreamHub(StreamService(USD_NGN=1530.5, NGN_USD=0.00065), heartbeat=60, refresh_interval=60)
+        self.addCleanup(self.hub._executor.shutdown)
+
+    async def next_chunk(self, stream):
+        return await asyncio.wait_for(anext(stream), 1)
+
+    async def open_stream(self, pairs):
+        stream = self.hub.stream(pairs)
+        self.assertEqual(await self.next_chunk(stream), b'retry: 3000\n\n')
+        return stream
+
+    async def close(self, *streams):
+        for stream in streams:
+            await stream.aclose()
+        if self.hub._ticker is not None:
+            self.hub._ticker.cancel()
+            await asyncio.gather(self.hub._ticker, return_exceptions=True)
+
+    def test_parse_pairs(self):
+        self.assertEqual(parse_pairs(b'pairs=usd_ngn,NGN_USD&pairs=USD_NGN'), (['USD_NGN', 'NGN_USD'], None))
+        for query in (b'', b'pairs=', b'pairs=USDNGN', b'pairs=USD_USD', b'pairs=USD_NGN,N$_USD'):
+            pairs, error = parse_pairs(query)
+            self.assertEqual(pairs, [])
+            self.assertTrue(error, query)
+        with mock.patch('fastest_exchange.rate_stream.RATE_STREAM_MAX_PAIRS', 1):
+            self.assertIn('At most 1', parse_pairs(b'pairs=USD_NGN,NGN_USD')[1])
+
+    async def test_publish_sends_one_frame_per_subscriber(self):
+        first = await self.open_stream(['USD_NGN'])
+        second = await self.open_stream(['USD_NGN', 'NGN_USD'])
+        self.assertEqual([data['exchange_rate'] for _, data in stream_events(await self.next_chunk(first))],
+                         [1530.5])
+        self.assertEqual([data['pair'] for _, data in stream_events(await self.next_chunk(second))],
+                         ['USD_NGN', 'NGN_USD'])
+
+        self.hub.publish([StreamEntry('USD_NGN', 1531.0)])
+        for stream in (first, second):
+            events = stream_events(await self.next_chunk(stream))
+            self.assertEqual([(event, data['pair'], data['exchange_rate']) for event, data in events],
+                             [('rate', 'USD_NGN', 1531.0)])
+        await self.close(first, second)
+
+    async def test_slow_subscribers_get_the_latest_value_per_pair(self):
+        stream = await self.open_stream(['USD_NGN', 'NGN_USD'])
+        await self.next_chunk(stream)
+
+        for rate in (1531.0, 1532.0, 1533.0):
+            self.hub.publish([StreamEntry('USD_NGN', rate)])
+        # An unchanged rate is not a change
+        self.hub.publish([StreamEntry('NGN_USD', 0.00065)])
+
+        events = stream_events(await self.next_chunk(stream))
+        self.assertEqual([(data['pair'], data['exchange_rate']) for _, data in events], [('USD_NGN', 1533.0)])
+        await self.close(stream)
+
+    async def test_unavailable_pairs_are_reported_and_dropped(self):
+        stream = await self.open_stream(['USD_NGN', 'GHC_NGN'])
+
+        self.assertEqual(stream_events(await self.next_chunk(stream)), [
+            ('unavailable', {'pairs': ['GHC_NGN'], 'error': 'Exchange rate not available'}),
+        ])
+        self.assertEqual([data['pair'] for _, data in stream_events(await self.next_chunk(stream))], ['USD_NGN'])
+        self.assertEqual(set(self.hub._subscribers), {'USD_NGN'})
+        await self.close(stream)
+
+    async def call_app(self, scope, disconnect):
+        sent = []
+        body_sent = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            if message['type'] == 'http.response.body':
+                body_sent.set()
+
+        inner = mock.AsyncMock()
+        app = RateStreamApp(inner, self.hub)
+        task = asyncio.ensure_future(app({'type': 'http', 'method': 'GET', 'path': RATE_STREAM_PATH, **scope},
+                                         receive, send))
+        return task, sent, body_sent, inner
+
+    async def test_invalid_requests_are_rejected(self):
+        disconnect = asyncio.Event()
+        for scope, status in (({'query_string': b'pairs=USD_USD'}, 400), ({'query_string': b''}, 400),
+                              ({'method': 'POST', 'query_string': b'pairs=USD_NGN'}, 405)):
+            task, sent, _, _ = await self.call_app(scope, disconnect)
+            await asyncio.wait_for(task, 1)
+            self.assertEqual(sent[0]['status'], status)
+            self.assertIn('error', json.loads(sent[1]['body']))
+
+        task, sent, _, inner = await self.call_app({'path': '/api/exchange-rates/get/'}, disconnect)
+        await asyncio.wait_for(task, 1)
+        inner.assert_awaited_once()
+        self.assertEqual(sent, [])
+
+    async def test_disconnect_cleans_up_subscriptions(self):
+        disconnect = asyncio.Event()
+        task, sent, body_sent, _ = await self.call_app({'query_string': b'pairs=USD_NGN,NGN_USD'}, disconnect)
+        await asyncio.wait_for(body_sent.wait(), 1)
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream; charset=utf-8'), sent[0]['headers'])
+        self.assertEqual(self.hub.connections, 1)
+        self.assertEqual(set(self.hub._subscribers), {'USD_NGN', 'NGN_USD'})
+
+        disconnect.set()
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(self.hub.connections, 0)
+        self.assertEqual(self.hub._subscribers, {})
+        await self.close()
+
+
+RATE_ROWS = [{'currency_from': 'USD', 'currency_to': 'NGN', 'rate': 1530.5}]
+
+
+class FlakyConnection:
+    """
+    Mail connection that fails to send to the addresses in failing
+    """
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.opened = 0
+        self.closed = 0
+        self.is_open = False
+
+    def open(self):
+        if not self.is_open:
+            self.is_open = True
+            self.opened += 1
+
+    def close(self):
+        self.is_open = False
+        self.closed += 1
+
+    def send_messages(self, messages):
+        if not self.is_open:
+            raise AssertionError('sent on a closed connection')
+        if messages[0].to[0] in self.failing:
+            raise ConnectionError('mail server dropped the connection')
+        return len(messages)
+
+
+class FxRateNotificationTests(TestCase):
+    def subscriber(self, email, notified_hours_ago=None, **user_fields):
+        user = User.objects.create_user(email=email, password='secret-pass-1', **user_fields)
+        notified_at = timezone.now() - timedelta(hours=notified_hours_ago) if notified_hours_ago else None
+        Notification.objects.filter(user=user).update(fx_rate=True, fx_rate_notified_at=notified_at)
+        return user
+
+    def notified_at(self, user):
+        return Notification.objects.get(user=user).fx_rate_notified_at
+
+    def recipients(self):
+        return sorted(message.to[0] for message in mail.outbox)
+
+    def test_cooldown_excludes_recently_notified_users(self):
+        self.subscriber('never@example.com')
+        self.subscriber('long-ago@example.com', notified_hours_ago=FX_RATE_NOTIFICATION_COOLDOWN // 3600 + 1)
+        recent = self.subscriber('recent@example.com', notified_hours_ago=1)
+        self.subscriber('inactive@example.com', is_active=False)
+        User.objects.create_user(email='unsubscribed@example.com', password='secret-pass-1')
+
+        self.assertEqual(FxRateNotifier.broadcast(RATE_ROWS, dry_run=True)['recipients'], 2)
+        result = FxRateNotifier.broadcast(RATE_ROWS, workers=2, batch_size=1)
+
+        self.assertEqual(result, {'recipients': 2, 'sent': 2, 'failed': 0})
+        self.assertEqual(self.recipients(), ['long-ago@example.com', 'never@example.com'])
+        self.assertEqual(mail.outbox[0].subject, 'Exchange rate update: USD/NGN 1530.5')
+        self.assertLess(self.notified_at(recent), timezone.now() - timedelta(minutes=59))
+        # Everyone is inside the cool-down now
+        self.assertEqual(FxRateNotifier.broadcast(RATE_ROWS)['recipients'], 0)
+
+    def test_only_delivered_messages_start_the_cooldown(self):
+        delivered = self.subscriber('ok@example.com')
+        failed = self.subscriber('bounce@example.com')
+        connection = FlakyConnection(failing=['bounce@example.com'])
+
+        with mock.patch('fastest_exchange.messaging.notification.get_connection', return_value=connection):
+            result = FxRateNotifier.broadcast(RATE_ROWS, workers=1)
+
+        self.assertEqual(result, {'recipients': 2, 'sent': 1, 'failed': 1})
+        self.assertIsNotNone(self.notified_at(delivered))
+        self.assertIsNone(self.notified_at(failed))
+        self.assertEqual(FxRateNotifier.broadcast(RATE_ROWS, dry_run=True)['recipients'], 1)
+
+    def test_workers_and_connections_stay_bounded(self):
+        for index in range(25):
+            self.subscriber(f'user{index}@example.com')
+        senders = set()
+        connections = []
+        real_send_batch = MailPool._send_batch
+
+        def send_batch(connection, batch):
+            senders.add(threading.current_thread().name)
+            return real_send_batch(connection, batch)
+
+        def get_connection():
+            connections.append(mail.get_connection())
+            return connections[-1]
+
+        with mock.patch.object(MailPool, '_send_batch', staticmethod(send_batch)), \
+                mock.patch('fastest_exchange.messaging.notification.get_connection', get_connection):
+            result = FxRateNotifier.broadcast(RATE_ROWS, workers=3, batch_size=2)
+
+        self.assertEqual(result['sent'], 25)
+        self.assertEqual(len(mail.outbox), 25)
+        self.assertLessEqual(len(senders), 3)
+        self.assertEqual(len(connections), 3)
+        self.assertFalse([thread for thread in threading.enumerate() if thread.name.startswith('mail-pool-')])
+
+    def test_send_failure_continues_on_a_fresh_connection(self):
+        connection = FlakyConnection(failing=['b@example.com'])
+        delivered = []
+        messages = [EmailMessage(subject='Rates', body='...', to=[email])
+                    for email in ('a@example.com', 'b@example.com', 'c@example.com')]
+
+        with mock.patch('fastest_exchange.messaging.notification.get_connection', return_value=connection):
+            with MailPool(workers=1, on_sent=lambda batch, sent: delivered.extend(sent)) as pool:
+                pool.submit(messages)
+
+        self.assertEqual((pool.sent, pool.failed), (2, 1))
+        self.assertEqual([message.to[0] for message in delivered], ['a@example.com', 'c@example.com'])
+        # Closed after the failure and once by the worker, reopened for the next message
+        self.assertEqual((connection.opened, connection.closed), (2, 2))
+
+
+class StubPairRegistry:
+    def __init__(self, pairs):
+        self.swap(pairs)
+
+    def swap(self, pairs):
+        self._pairs = pairs
+        self.etag = make_etag('stub', pairs)
+
+    def pairs(self):
+        return self._pairs
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='etags@example.com', password='secret-pass-1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.transaction = Transaction.objects.create(user=self.user, transaction_type=TransactionType.SWAP)
+
+    def assert_not_modified(self, response, headers):
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertIn('Cache-Control', response.headers)
+        for header, value in headers.items():
+            self.assertEqual(response.headers.get(header), value)
+
+    def test_transaction_list_validators(self):
+        response = self.client.get('/api/transactions/')
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+        self.assertEqual(response.headers['Cache-Control'], 'private, no-cache')
+        self.assertIn('Authorization', response.headers['Vary'])
+
+        for conditions in ({'HTTP_IF_NONE_MATCH': etag}, {'HTTP_IF_MODIFIED_SINCE': last_modified}):
+            with self.subTest(conditions=conditions):
+                response = self.client.get('/api/transactions/', **conditions)
+                self.assert_not_modified(response, {'ETag': etag, 'Last-Modified': last_modified})
+                self.assertIn('Authorization', response.headers['Vary'])
+
+    def test_change_revalidates_to_200(self):
+        response = self.client.get('/api/transactions/')
+        etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+        # Move updated_at past the one-second resolution of Last-Modified
+        Transaction.objects.filter(pk=self.transaction.pk).update(
+            status=TransactionStatus.COMPLETED, updated_at=timezone.now() + timedelta(seconds=5)
+        )
+
+        for conditions in ({'HTTP_IF_NONE_MATCH': etag}, {'HTTP_IF_MODIFIED_SINCE': last_modified}):
+            with self.subTest(conditions=conditions):
+                response = self.client.get('/api/transactions/', **conditions)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response.headers['ETag'], etag)
+                self.assertEqual(response.json()['results'][0]['status'], TransactionStatus.COMPLETED)
+
+        # A new transaction changes the count as well
+        etag = self.client.get('/api/transactions/').headers['ETag']
+        Transaction.objects.create(user=self.user, transaction_type=TransactionType.SWAP)
+        self.assertEqual(self.client.get('/api/transactions/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_transaction_detail(self):
+        url = f'/api/transactions/{self.transaction.transaction_id}/'
+        etag = self.client.get(url).headers['ETag']
+
+        self.assert_not_modified(self.client.get(url, HTTP_IF_NONE_MATCH=etag), {'ETag': etag})
+
+        self.transaction.status = TransactionStatus.COMPLETED
+        self.transaction.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], TransactionStatus.COMPLETED)
+
+    def test_errors_carry_no_validators(self):
+        response = self.client.get('/api/transactions/TXN-MISSING/', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response.headers)
+
+    def test_public_pairs_route(self):
+        registry = StubPairRegistry([{'from_currency': 'USD', 'to_currency': 'NGN'}])
+        client = APIClient()
+        with mock.patch.object(QuidaxExchangeRateService, 'pair_registry', registry):
+            response = client.get('/api/exchange-rates/pairs/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['ETag'], registry.etag)
+            self.assertEqual(response.headers['Cache-Control'], 'public, max-age=300')
+
+            etag = response.headers['ETag']
+            self.assert_not_modified(client.get('/api/exchange-rates/pairs/', HTTP_IF_NONE_MATCH=etag),
+                                     {'ETag': etag, 'Cache-Control': 'public, max-age=300'})
+
+            registry.swap([{'from_currency': 'USD', 'to_currency': 'GHS'}])
+            response = client.get('/api/exchange-rates/pairs/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['supported_pairs'], registry.pairs())
+
+
+class StubCall:
+    """
+    Provider callable that records when it ran, optionally blocking on a gate
+    """
+
+    def __init__(self, result=None, error=None, gate=None, barrier=None):
+        self.result = result
+        self.error = error
+        self.gate = gate
+        self.barrier = barrier
+        self.started = None
+        self.timeouts = []
+
+    def __call__(self, timeout):
+        self.started = time.monotonic()
+        self.timeouts.append(timeout)
+        if self.barrier is not None:
+            self.barrier.wait()
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class ProviderFetcherTests(SimpleTestCase):
+    def setUp(self):
+        # Released at the end so blocked provider threads drain from the shared pool
+        self.gate = threading.Event()
+        self.addCleanup(self.gate.set)
+
+    def fetch(self, hedge_delay=1, deadline=2, **stubs):
+        calls = [ProviderCall(name, stub, timeout=3) for name, stub in stubs.items()]
+        started = time.monotonic()
+        return fetch_first(calls, hedge_delay, deadline), started
+
+    def test_hedge_fires_after_the_delay(self):
+        slow, fast, spare = StubCall(gate=self.gate), StubCall({'rate': 2.0}), StubCall({'rate': 3.0})
+
+        result, started = self.fetch(hedge_delay=0.05, slow=slow, fast=fast, spare=spare)
+
+        self.assertEqual(result[:2], ('fast', {'rate': 2.0}))
+        self.assertGreaterEqual(fast.started - started, 0.05)
+        self.assertEqual(fast.timeouts, [3])
+        # The answer arrived before the third provider was due
+        self.assertIsNone(spare.started)
+
+    def test_no_hedge_when_the_first_provider_answers_in_time(self):
+        primary, secondary = StubCall({'rate': 1.0}), StubCall({'rate': 2.0})
+
+        result, _ = self.fetch(primary=primary, secondary=secondary)
+
+        self.assertEqual(result[0], 'primary')
+        self.assertIsNone(secondary.started)
+
+    def test_failure_fires_the_next_provider_at_once(self):
+        for failed in (StubCall(error=ConnectionError('down')), StubCall(result=None)):
+            with self.subTest(failed=failed.error):
+                backup = StubCall({'rate': 2.0})
+
+                result, started = self.fetch(hedge_delay=5, deadline=10, failed=failed, backup=backup)
+
+                self.assertEqual(result[0], 'backup')
+                self.assertLess(backup.started - started, 1)
+
+    def test_first_valid_result_wins(self):
+        empty, late = StubCall({}), StubCall(gate=self.gate)
+        valid = StubCall({'rate': 2.0})
+
+        result, _ = self.fetch(hedge_delay=0, empty=empty, valid=valid, late=late)
+
+        self.assertEqual(result[:2], ('valid', {'rate': 2.0}))
+        self.assertIsNotNone(late.started)
+
+    def test_zero_hedge_delay_fires_every_provider_at_once(self):
+        # Each call only returns once all three are running concurrently
+        barrier = threading.Barrier(3, timeout=2)
+        stubs = {name: StubCall({'rate': 1.0}, barrier=barrier) for name in ('a', 'b', 'c')}
+
+        result, _ = self.fetch(hedge_delay=0, **stubs)
+
+        self.assertIsNotNone(result)
+        self.assertFalse(barrier.broken)
+
+    def test_deadline_returns_none(self):
+        first, second, third = (StubCall({'rate': 1.0}, gate=self.gate) for _ in range(3))
+
+        with self.assertLogs('fastest_exchange.provider_fetcher', 'WARNING') as logs:
+            result, started = self.fetch(hedge_delay=0.1, deadline=0.15, first=first, second=second, third=third)
+
+        self.assertIsNone(result)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertIsNotNone(second.started)
+        self.assertIsNone(third.started)
+        self.assertIn('first, second outstanding', logs.output[0])
+
+    def test_no_calls(self):
+        self.assertIsNone(fetch_first([], 0.1, 1))
+
+
+class StubUpstreamProvider(RateProvider):
+    """
+    Remote provider answering through a StubCall
+    """
+
+    remote = True
+
+    def __init__(self, name, cost, call, ttl=60):
+        super().__init__()
+        self.name = self.source = name
+        self.cost = cost
+        self.ttl = ttl
+        self.call = call
+
+    def fetch(self, from_currency, to_currency, timeout=None):
+        rate = self.call(timeout)
+        return self._rate_info(from_currency, to_currency, rate) if rate else None
+
+
+@mock.patch('fastest_exchange.rate_pipeline.rate_graph', RateGraph())
+class RatePipelineHedgingTests(SimpleTestCase):
+    def setUp(self):
+        self.gate = threading.Event()
+        self.addCleanup(self.gate.set)
+
+    def pipeline(self, *providers, **options):
+        return RatePipeline('hedging', ProviderRegistry(list(providers)), shared_path='', **options)
+
+    def test_slow_cheap_provider_is_hedged(self):
+        cheap = StubUpstreamProvider('hedge_cheap', 1, StubCall(1500.0, gate=self.gate))
+        fast = StubUpstreamProvider('hedge_fast', 5, StubCall(1510.0), ttl=30)
+
+        rate_info, ttl = self.pipeline(fast, cheap, hedge_delay=0.05, deadline=2).resolve('USD', 'NGN')
+
+        self.assertEqual((rate_info['source'], rate_info['rate'], ttl), ('hedge_fast', 1510.0, 30))
+        # Cheapest first, the next one only after the hedge delay
+        self.assertGreaterEqual(fast.call.started - cheap.call.started, 0.05)
+
+    def test_invalid_answer_falls_through_to_the_next_provider(self):
+        empty = StubUpstreamProvider('hedge_empty', 1, StubCall(None))
+        backup = StubUpstreamProvider('hedge_backup', 2, StubCall(1505.0))
+
+        rate_info, _ = self.pipeline(empty, backup, hedge_delay=5, deadline=10).resolve('USD', 'NGN')
+
+        self.assertEqual(rate_info['source'], 'hedge_backup')
+
+    def test_deadline_leaves_the_pair_unresolved(self):
+        stalled = StubUpstreamProvider('hedge_stalled', 1, StubCall(1500.0, gate=self.gate))
+
+        with self.assertLogs('fastest_exchange.provider_fetcher', 'WARNING'):
+            self.assertIsNone(self.pipeline(stalled, hedge_delay=0.05, deadline=0.1).resolve('USD', 'NGN'))
+
+    def test_defaults_come_from_settings(self):
+        provider = StubUpstreamProvider('hedge_default', 1, StubCall(1500.0))
+
+        with mock.patch('fastest_exchange.rate_pipeline.fetch_first', wraps=fetch_first) as fetch:
+            self.pipeline(provider).resolve('USD', 'NGN')
+
+        calls, hedge_delay, deadline = fetch.call_args.args
+        self.assertEqual((hedge_delay, deadline), (PROVIDER_HEDGE_DELAY, PROVIDER_DEADLINE))
+        self.assertEqual(PROVIDER_HEDGE_DELAY, getattr(settings, 'EXCHANGE_PROVIDER_HEDGE_DELAY', 0.3))
+        self.assertEqual([(call.name, call.timeout) for call in calls], [('hedge_default', provider.timeout)])
+
+
+def http_response(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    response.raw = BytesIO(b'')
+    return response
+
+
+class HttpClientRetryTests(SimpleTestCase):
+    url = 'https://rates.example.com/v1/latest'
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('fastest_exchange.http_client.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = HttpClient(max_connections_per_host=2, retries=2, backoff=0.2)
+        self.session = self.client._pool(HttpClient._host(self.url)).session
+        self.session.request = mock.Mock()
+
+    def metrics(self):
+        return self.client.metrics()['https://rates.example.com']
+
+    def test_retries_retryable_statuses_with_backoff(self):
+        self.session.request.side_effect = [http_response(503), http_response(429), http_response(200)]
+
+        response = self.client.get(self.url, timeout=5)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.session.request.call_count, 3)
+        # Exponential backoff with jitter between half and the full delay
+        first, second = self.clock.sleeps
+        self.assertTrue(0.1 <= first <= 0.2 and 0.2 <= second <= 0.4, self.clock.sleeps)
+        self.assertEqual(self.metrics()['retries'], 2)
+        self.assertEqual(self.metrics()['statuses'], {503: 1, 429: 1, 200: 1})
+
+    def test_other_statuses_are_returned_at_once(self):
+        for status_code in (200, 400, 404, 500):
+            with self.subTest(status_code=status_code):
+                self.session.request.reset_mock()
+                self.session.request.side_effect = [http_response(status_code)]
+
+                self.assertEqual(self.client.get(self.url).status_code, status_code)
+                self.assertEqual(self.session.request.call_count, 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_last_retryable_response_is_returned(self):
+        self.session.request.side_effect = [http_response(503)] * 3
+
+        self.assertEqual(self.client.get(self.url, timeout=5).status_code, 503)
+        self.assertEqual(self.session.request.call_count, 3)
+
+    def test_connection_errors_are_retried_then_raised(self):
+        self.session.request.side_effect = requests.ConnectionError('reset')
+
+        with self.assertRaises(requests.ConnectionError):
+            self.client.get(self.url, timeout=5)
+        self.assertEqual(self.session.request.call_count, 3)
+        self.assertEqual(self.metrics()['errors'], 3)
+
+    def test_post_is_only_retried_when_it_never_connected(self):
+        cases = [
+            ([http_response(503)], 1),
+            ([requests.ReadTimeout('slow'), http_response(200)], 1),
+            ([requests.ConnectTimeout('unreachable'), http_response(200)], 2),
+        ]
+        for side_effect, calls in cases:
+            with self.subTest(first=side_effect[0]):
+                self.session.request.reset_mock()
+                self.session.request.side_effect = side_effect
+                try:
+                    self.client.post(self.url, json={'amount': 1}, timeout=5)
+                except requests.ReadTimeout:
+                    pass
+                self.assertEqual(self.session.request.call_count, calls)
+
+    def test_no_retry_when_the_backoff_would_pass_the_deadline(self):
+        self.session.request.side_effect = [http_response(503), http_response(200)]
+
+        response = self.client.get(self.url, timeout=5, deadline=0.05)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_per_call_retry_override(self):
+        self.session.request.side_effect = [http_response(503), http_response(200)]
+
+        self.assertEqual(self.client.get(self.url, retries=0).status_code, 503)
+        self.assertEqual(self.session.request.call_count, 1)
+
+
+class HttpClientConcurrencyTests(SimpleTestCase):
+    def setUp(self):
+        self.client = HttpClient(max_connections_per_host=2, retries=0)
+        self.gate = threading.Event()
+        self.addCleanup(self.gate.set)
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.peak = {}
+
+    def stub_session(self, host):
+        def request(method, url, **kwargs):
+            with self.lock:
+                self.in_flight[host] = self.in_flight.get(host, 0) + 1
+                self.peak[host] = max(self.peak.get(host, 0), self.in_flight[host])
+            self.gate.wait(5)
+            with self.lock:
+                self.in_flight[host] -= 1
+            return http_response(200)
+        self.client._pool(host).session.request = request
+
+    def wait_for_in_flight(self, host, count):
+        for _ in range(200):
+            if self.in_flight.get(host) == count:
+                return
+            time.sleep(0.01)
+        self.fail(f'{host} never reached {count} requests in flight')
+
+    def test_concurrency_is_bounded_per_host(self):
+        busy, other = 'https://busy.example.com', 'https://other.example.com'
+        self.stub_session(busy)
+        self.stub_session(other)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.client.get(f'{busy}/rates', timeout=5)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        self.wait_for_in_flight(busy, 2)
+
+        # A third caller waits for a slot until its deadline runs out
+        with self.assertRaises(DeadlineExceeded):
+            self.client.get(f'{busy}/rates', timeout=5, deadline=0.1)
+        # Other hosts have their own slots
+        other_thread = threading.Thread(target=self.client.get, args=(f'{other}/rates',), kwargs={'timeout': 5})
+        other_thread.start()
+        self.wait_for_in_flight(other, 1)
+
+        self.gate.set()
+        for thread in threads + [other_thread]:
+            thread.join(5)
+        self.assertEqual([response.status_code for response in results], [200] * 4)
+        self.assertEqual(self.peak[busy], 2)
+        metrics = self.client.metrics()[busy]
+        self.assertEqual((metrics['requests'], metrics['errors'], metrics['in_flight']), (4, 1, 0))
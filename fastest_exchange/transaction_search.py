@@ -0,0 +1,293 @@
+"""
+Transaction Search Index
+
+Free-text transaction search used to filter with leading-wildcard
+LIKEs (icontains) over the transaction table, which scan every row of a
+user. Each transaction now has one search entry (TransactionSearchEntry):
+
+    reference  the transaction id
+    document   transaction id, notes, currencies, receiver names and
+               numbers of the linked swap / transfer / mobile money /
+               cash pickup, beneficiary names and account number
+
+stored in a dedicated index per database backend (created by migration
+0008):
+
+- SQLite: an FTS5 table with prefix indexes. Every search term is a
+  prefix query ("ada" finds "Adaeze"), the user's own entries are
+  selected inside the index (owner column) and results are ranked by
+  bm25.
+- PostgreSQL: a table with pg_trgm GIN indexes. Terms are matched as
+  substrings through the trigram index and ranked by word_similarity.
+
+Migration 0008 indexes the existing transactions. Entries are then
+rewritten when a transaction is saved with changed search fields or when
+one of its linked records is saved (see signals.py), and removed with
+the transaction. rebuild_transaction_search refills the index from
+scratch.
+"""
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import connections, router
+from django.db.models import F, FloatField, Func, Lookup, Q, Value
+
+from .models import (
+    BankTransfer, Beneficiary, MobileMoney, ReceiveCash, SavedBeneficiary, SwapEngine, Transaction,
+    TransactionSearchEntry,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = TransactionSearchEntry._meta.db_table
+
+# Terms of one query that are used (the rest are ignored)
+MAX_SEARCH_TERMS = 8
+
+# Linked records whose fields are part of the document
+DOCUMENT_RELATIONS = (
+    'swap_reference', 'bank_transfer_reference', 'mobile_money_reference', 'cash_pickup_reference',
+    'beneficiary_reference__beneficiary',
+)
+
+# Linked record model -> Transaction lookup of the transactions that embed it
+LINKED_RECORDS = {
+    SwapEngine: 'swap_reference',
+    BankTransfer: 'bank_transfer_reference',
+    MobileMoney: 'mobile_money_reference',
+    ReceiveCash: 'cash_pickup_reference',
+    SavedBeneficiary: 'beneficiary_reference',
+    Beneficiary: 'beneficiary_reference__beneficiary',
+}
+
+
+def search_terms(query: str) -> List[str]:
+    """
+    Lower-cased word terms of a user query (punctuation and operators dropped)
+    """
+    return re.findall(r'\w+', (query or '').lower())[:MAX_SEARCH_TERMS]
+
+
+def document_of(transaction: Transaction) -> str:
+    parts = [transaction.transaction_id, transaction.notes, transaction.currency_from, transaction.currency_to]
+    swap = transaction.swap_reference
+    if swap is not None:
+        parts += [swap.receiver_account_name, swap.receiver_account_number, swap.receiver_bank]
+    transfer = transaction.bank_transfer_reference
+    if transfer is not None:
+        parts += [transfer.receiver_account_name, transfer.account_name, transfer.receiver_account_number,
+                  transfer.account_number, transfer.receiver_bank, transfer.bank]
+    mobile_money = transaction.mobile_money_reference
+    if mobile_money is not None:
+        parts += [mobile_money.receiver_name, mobile_money.receiver_number]
+    cash_pickup = transaction.cash_pickup_reference
+    if cash_pickup is not None:
+        parts += [cash_pickup.receiver_name, cash_pickup.receiver_phone_number]
+    saved = transaction.beneficiary_reference
+    if saved is not None:
+        parts += [saved.beneficiary_full_name, saved.beneficiary_account_number]
+        if saved.beneficiary is not None:
+            beneficiary = saved.beneficiary
+            parts += [beneficiary.name, beneficiary.first_name, beneficiary.last_name,
+                      str(beneficiary.account_number or '')]
+    return ' '.join(str(part) for part in parts if part)
+
+
+def owner_token(user_id) -> str:
+    return f"u{user_id}"
+
+
+class Match(Lookup):
+    """
+    FTS5 MATCH against the entry's table (SQLite)
+    """
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{compiler.quote_name_unless_alias(self.lhs.alias)} MATCH {rhs}", rhs_params
+
+
+class Bm25Rank(Func):
+    """
+    bm25() of the matched FTS5 table, negated so that higher ranks first (SQLite)
+    """
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        table = compiler.quote_name_unless_alias(self.get_source_expressions()[0].alias)
+        return f"-bm25({table})", []
+
+
+TransactionSearchEntry._meta.get_field('document').register_lookup(Match)
+
+
+class SqliteSearchBackend:
+    """
+    FTS5 table; the entry's primary key is the table's rowid
+    """
+
+    def write(self, cursor, rows: List[Tuple]):
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(rows))})",
+                       [row[0] for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, owner, reference, document) VALUES (%s, %s, %s, %s)", rows
+        )
+
+    def delete(self, cursor, ids: List[int]):
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(ids))})", ids)
+
+    def clear(self, cursor):
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+    def search(self, queryset, user_id, terms: List[str]):
+        prefixes = ' '.join(f'"{term}"*' for term in terms)
+        expression = f'owner : "{owner_token(user_id)}" AND {{reference document}} : ({prefixes})'
+        return queryset.filter(search_entry__document__match=expression).annotate(
+            search_rank=Bm25Rank(F('search_entry__document'))
+        )
+
+    def match_reference(self, queryset, user_id, prefix: str):
+        expression = f'owner : "{owner_token(user_id)}" AND reference : "{prefix}"*'
+        return queryset.filter(search_entry__document__match=expression)
+
+
+class PostgresSearchBackend:
+    """
+    Plain table with trigram GIN indexes (pg_trgm)
+    """
+
+    def write(self, cursor, rows: List[Tuple]):
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, owner, reference, document) VALUES (%s, %s, %s, %s) "
+            "ON CONFLICT (rowid) DO UPDATE SET owner = EXCLUDED.owner, "
+            "reference = EXCLUDED.reference, document = EXCLUDED.document",
+            rows
+        )
+
+    def delete(self, cursor, ids: List[int]):
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = ANY(%s)", [ids])
+
+    def clear(self, cursor):
+        cursor.execute(f"TRUNCATE {SEARCH_TABLE}")
+
+    def search(self, queryset, user_id, terms: List[str]):
+        match = Q()
+        for term in terms:
+            match &= Q(search_entry__document__icontains=term)
+        return queryset.filter(match).annotate(
+            search_rank=Func(Value(' '.join(terms)), F('search_entry__document'),
+                             function='word_similarity', output_field=FloatField())
+        )
+
+    def match_reference(self, queryset, user_id, prefix: str):
+        return queryset.filter(search_entry__reference__istartswith=prefix)
+
+
+class UnindexedSearchBackend:
+    """
+    Other databases: no index, the old substring filters over the transaction
+    """
+
+    def write(self, cursor, rows: List[Tuple]):
+        pass
+
+    def delete(self, cursor, ids: List[int]):
+        pass
+
+    def clear(self, cursor):
+        pass
+
+    def search(self, queryset, user_id, terms: List[str]):
+        match = Q()
+        for term in terms:
+            match &= (Q(transaction_id__icontains=term) | Q(notes__icontains=term)
+                      | Q(currency_from__icontains=term) | Q(currency_to__icontains=term))
+        return queryset.filter(match).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def match_reference(self, queryset, user_id, prefix: str):
+        return queryset.filter(transaction_id__istartswith=prefix)
+
+
+class TransactionSearchIndex:
+    """
+    Writes and queries the transaction search entries of the backend in use
+    """
+
+    backends = {
+        'sqlite': SqliteSearchBackend(),
+        'postgresql': PostgresSearchBackend(),
+    }
+
+    def backend(self, vendor: str):
+        return self.backends.get(vendor, UnindexedSearchBackend())
+
+    def update(self, transactions: Iterable[Transaction], using: Optional[str] = None) -> int:
+        """
+        Rewrite the entries of transactions (one batched write)
+        """
+        rows = [
+            (transaction.pk, owner_token(transaction.user_id), transaction.transaction_id, document_of(transaction))
+            for transaction in transactions
+        ]
+        if rows:
+            using = using or router.db_for_write(Transaction)
+            with connections[using].cursor() as cursor:
+                self.backend(connections[using].vendor).write(cursor, rows)
+        return len(rows)
+
+    def reindex(self, transactions) -> int:
+        """
+        Rewrite the entries of a transaction queryset (one read with the linked records)
+        """
+        return self.update(transactions.select_related(*DOCUMENT_RELATIONS).order_by(), using=transactions.db)
+
+    def rebuild(self, transactions, chunk_size: int = 2000) -> int:
+        """
+        Write the entries of a transaction queryset chunk by chunk (rebuild_transaction_search, migration 0008)
+        """
+        transactions = transactions.select_related(*DOCUMENT_RELATIONS).order_by('pk')
+        total = 0
+        last_id = 0
+        while True:
+            # Walk the primary key so every chunk is an index range read
+            chunk = list(transactions.filter(pk__gt=last_id)[:chunk_size])
+            if not chunk:
+                return total
+            total += self.update(chunk, using=transactions.db)
+            last_id = chunk[-1].pk
+
+    def remove(self, ids: Iterable[int], using: Optional[str] = None):
+        ids = list(ids)
+        if not ids:
+            return
+        using = using or router.db_for_write(Transaction)
+        with connections[using].cursor() as cursor:
+            self.backend(connections[using].vendor).delete(cursor, ids)
+
+    def clear(self, using: Optional[str] = None):
+        using = using or router.db_for_write(Transaction)
+        with connections[using].cursor() as cursor:
+            self.backend(connections[using].vendor).clear(cursor)
+
+    def search(self, queryset, user_id, query: str):
+        """
+        Transactions of a user matching every term of query, annotated with search_rank (higher is better)
+        """
+        terms = search_terms(query)
+        if not terms:
+            return queryset
+        return self.backend(connections[queryset.db].vendor).search(queryset, user_id, terms)
+
+    def match_reference(self, queryset, user_id, prefix: str):
+        """
+        Transactions of a user whose transaction id starts with prefix
+        """
+        terms = search_terms(prefix)
+        if not terms:
+            return queryset
+        return self.backend(connections[queryset.db].vendor).match_reference(queryset, user_id, terms[0].upper())
+
+
+transaction_search = TransactionSearchIndex()
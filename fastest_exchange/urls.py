@@ -36,6 +36,7 @@ from fastest_exchange.views import (
 from fastest_exchange.exchange_rate_views import (
     get_exchange_rate,
     calculate_conversion,
+    calculate_conversion_batch,
     get_supported_pairs,
     ExchangeRateManagementView,
     ExchangeRateListView,
@@ -44,6 +45,7 @@ from fastest_exchange.exchange_rate_views import (
     get_rate_service_config,
     get_quidax_markets,
     get_market_ticker,
+    rate_readiness,
 )
 app_name = "expense_tracker"
 # Routers provide an easy way of automatically determining the URL conf.
@@ -73,13 +75,14 @@ urlpatterns = [
     # Core transaction management
     path("api/transactions/create/", TransactionCreateView.as_view(), name="transaction-create"),
     path("api/transactions/", TransactionListView.as_view(), name="transaction-list"),
-    path("api/transactions/<str:transaction_id>/", TransactionDetailView.as_view(), name="transaction-detail"),
-    path("api/transactions/<str:transaction_id>/status/", TransactionUpdateStatusView.as_view(), name="transaction-update-status"),
     
-    # Transaction analytics and search
+    # Transaction analytics and search (before the detail route, which would capture them)
     path("api/transactions/stats/", TransactionStatsView.as_view(), name="transaction-stats"),
     path("api/transactions/search/", TransactionSearchView.as_view(), name="transaction-search"),
     
+    path("api/transactions/<str:transaction_id>/", TransactionDetailView.as_view(), name="transaction-detail"),
+    path("api/transactions/<str:transaction_id>/status/", TransactionUpdateStatusView.as_view(), name="transaction-update-status"),
+    
     # ==================================================
     # EXCHANGE RATE MANAGEMENT ENDPOINTS
     # ==================================================
@@ -87,6 +90,7 @@ urlpatterns = [
     # Public exchange rate endpoints (anyone can check rates)
     path("api/exchange-rates/get/", get_exchange_rate, name="get-exchange-rate"),
     path("api/exchange-rates/convert/", calculate_conversion, name="calculate-conversion"),
+    path("api/exchange-rates/convert/batch/", calculate_conversion_batch, name="calculate-conversion-batch"),
     path("api/exchange-rates/pairs/", get_supported_pairs, name="supported-currency-pairs"),
     
     # Admin-only exchange rate management
@@ -100,6 +104,9 @@ urlpatterns = [
     path("api/quidax/markets/", get_quidax_markets, name="quidax-markets"),
     path("api/quidax/ticker/", get_market_ticker, name="quidax-ticker"),
     
+    # Readiness probe (warm rate snapshot)
+    path("api/health/ready/", rate_readiness, name="rate-readiness"),
+    
     # Auth Token generation
     path("api/", include("rest_framework.urls", namespace="rest_framework")),
     path("api/", include(router.urls)),
@@ -6,6 +6,8 @@ import os
 
 from django.conf import settings
 
+from .http_client import http_client
+
 # Get Termii credentials from Django settings (which loads from environment variables)
 TERMII_API_KEY = settings.TERMII_API_KEY
 TERMII_SENDER_ID = settings.TERMII_SENDER_ID
@@ -67,7 +69,7 @@ def send_otp_to_phone(phone_number: str, otp_code: str):
 
     try:
         print(f"[DEBUG] Sending SMS to {formatted_phone} with OTP: {otp_code}")
-        response = requests.post(url, json=payload, timeout=30)
+        response = http_client.post(url, json=payload, timeout=30)
         print(f"[DEBUG] Termii API Response Status: {response.status_code}")
         print(f"[DEBUG] Termii API Response: {response.text}")
         
@@ -109,7 +111,7 @@ def get_live_rates():
         # Using exchangerate-api.com free tier (1500 requests/month)
         # You can replace this with any other exchange rate API
         url = "https://api.exchangerate-api.com/v4/latest/USD"
-        response = requests.get(url, timeout=10)
+        response = http_client.get(url, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
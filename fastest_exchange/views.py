@@ -3,12 +3,13 @@ from django.shortcuts import render
 # Create your views here.
 import os
 from datetime import datetime, timedelta
+from decimal import Decimal
 from typing import Dict, List, Type
 
 from django.contrib.auth import update_session_auth_hash, get_user_model, authenticate
 from django.db import IntegrityError 
 # from django.db import models 
-from django.db.models import ProtectedError 
+from django.db.models import Count, Max, ProtectedError 
 from django.shortcuts import render, get_object_or_404
 from django.http import FileResponse 
 
@@ -36,6 +37,10 @@ from django.utils.decorators import method_decorator
 from django.conf import settings 
 from django.urls import reverse 
 from .utils import send_otp_to_phone, get_live_rates
+from .quote_tokens import QuoteError, claim_quote, redeem_quote
+from .money import convert_amount, quantize_rate, to_decimal
+from .last_known_good import last_known_good
+from .conditional import ConditionalGetMixin, make_etag
 
 from drf_spectacular.utils import extend_schema
 
@@ -493,38 +498,54 @@ class SwapView(APIView):
         
         from_currency = data["currency_from"].upper()
         to_currency = data["currency_to"].upper()
-        amount_sent = float(data["amount_sent"])
+        amount_sent = data["amount_sent"]
         payment_method = data["payment_method"]
 
         # Validate currency pair
         if from_currency == to_currency:
             return Response({"error": "Cannot exchange the same currency."}, status=400)
         
-        # Calculate conversion using swap engine logic
-        swap_result = self.calculate_swap(
-            from_currency=from_currency,
-            to_currency=to_currency,
-            amount_sent=amount_sent
-        )
+        if data.get("quote_token"):
+            # Execute at the signed quote's price without re-pricing
+            try:
+                swap_result = self.redeem_swap_quote(
+                    data["quote_token"], user, from_currency, to_currency, amount_sent
+                )
+            except QuoteError as e:
+                return Response({"error": str(e)}, status=400)
+        else:
+            # Calculate conversion using swap engine logic
+            swap_result = self.calculate_swap(
+                from_currency=from_currency,
+                to_currency=to_currency,
+                amount_sent=amount_sent
+            )
         
         if "error" in swap_result:
             return Response({"error": swap_result["error"]}, status=400)
         
         # Create swap transaction record
-        transaction = SwapEngine.objects.create(
-            currency_from=from_currency,
-            currency_to=to_currency,
-            amount_sent=amount_sent,
-            converted_amount=round(swap_result["converted_amount"], 2),
-            exchange_rate=round(swap_result["exchange_rate"], 6),
-            receiver_account_name=data["receiver_account_name"],
-            receiver_account_number=data["receiver_account_number"],
-            receiver_bank=data["receiver_bank"],
-            payment_method=payment_method,
-            verification_mode=data.get("verification_mode", "manual"),
-            proof_of_payment=data.get("proof_of_payment"),
-            status=data.get("status", "pending"),
-        )
+        try:
+            with db_transaction.atomic():
+                transaction = SwapEngine.objects.create(
+                    currency_from=from_currency,
+                    currency_to=to_currency,
+                    amount_sent=amount_sent,
+                    converted_amount=swap_result["converted_amount"],
+                    exchange_rate=swap_result["exchange_rate"],
+                    receiver_account_name=data["receiver_account_name"],
+                    receiver_account_number=data["receiver_account_number"],
+                    receiver_bank=data["receiver_bank"],
+                    payment_method=payment_method,
+                    verification_mode=data.get("verification_mode", "manual"),
+                    proof_of_payment=data.get("proof_of_payment"),
+                    status=data.get("status", "pending"),
+                )
+                # The quote is only used up if the swap is committed
+                if swap_result.get("quote_nonce"):
+                    claim_quote(swap_result["quote_nonce"], user, transaction)
+        except QuoteError as e:
+            return Response({"error": str(e)}, status=400)
         
         # Create corresponding Transaction Engine record for tracking
         try:
@@ -568,9 +589,9 @@ class SwapView(APIView):
             "swap_details": {
                 "from_currency": from_currency,
                 "to_currency": to_currency,
-                "amount_sent": amount_sent,
-                "amount_to_receive": round(swap_result["converted_amount"], 2),
-                "exchange_rate": round(swap_result["exchange_rate"], 6),
+                "amount_sent": float(amount_sent),
+                "amount_to_receive": float(swap_result["converted_amount"]),
+                "exchange_rate": float(swap_result["exchange_rate"]),
                 "rate_type": swap_result["rate_type"]
             },
             "status": transaction.status,
@@ -582,65 +603,44 @@ class SwapView(APIView):
             "payment_method": payment_method
         }, status=201)
     
-    def calculate_swap(self, from_currency: str, to_currency: str, amount_sent: float) -> dict:
+    def calculate_swap(self, from_currency: str, to_currency: str, amount_sent: Decimal) -> dict:
         """
         Dynamic Swap Engine Logic Implementation
         
         Uses ExchangeRateService for dynamic rate calculation with:
         - Database rates (most recent)
         - Third-party API rates (live market rates) 
-        - Fallback static rates
+        - Last-known-good rates
         - Amount-based pricing
         - Margin and volume discounts
+        
+        converted_amount and exchange_rate are Decimals at the fixed pricing
+        scale (2 and 6 dp), ready for the swap's DecimalFields.
         """
         from .exchange_rate_service import ExchangeRateService
-        from decimal import Decimal
         
         try:
-            # Convert amount to Decimal for precise calculations
-            amount_decimal = Decimal(str(amount_sent))
-            
             # Get dynamic exchange rate
-            conversion_result = ExchangeRateService.calculate_conversion(
+            conversion_result = ExchangeRateService.price_conversion(
                 from_currency=from_currency,
                 to_currency=to_currency, 
-                amount=amount_decimal
+                amount=to_decimal(amount_sent)
             )
             
             if 'error' in conversion_result:
                 return conversion_result
             
             # Extract rate info for response
-            rate_info = conversion_result.get('rate_info', {})
+            rate_info = conversion_result['rate_info']
             rate_source = rate_info.get('source', 'unknown')
             
-            # Build rate type description
-            rate_descriptions = {
-                'database': 'Live Database Rate',
-                'fixer': 'Live Market Rate (Fixer.io)',
-                'exchangerate_api': 'Live Market Rate (ExchangeRate-API)', 
-                'currencyapi': 'Live Market Rate (CurrencyAPI)',
-                'fallback_static': 'Static Fallback Rate'
-            }
-            
-            rate_type = f"{from_currency} to {to_currency} - {rate_descriptions.get(rate_source, 'Unknown Source')}"
-            
-            # Add margin and volume discount info if available
-            if 'margin_applied' in rate_info:
-                margin_pct = rate_info['margin_applied'] * 100
-                rate_type += f" (Margin: {margin_pct:.1f}%)"
-            
-            if 'volume_discount' in rate_info and rate_info['volume_discount'] > 0:
-                discount_pct = rate_info['volume_discount'] * 100
-                rate_type += f" (Volume Discount: {discount_pct:.1f}%)"
-            
             return {
                 "converted_amount": conversion_result['converted_amount'],
                 "exchange_rate": conversion_result['exchange_rate'],
-                "rate_type": rate_type,
+                "rate_type": self.describe_rate(from_currency, to_currency, rate_info),
                 "rate_source": rate_source,
                 "rate_info": rate_info,
-                "calculation_timestamp": conversion_result.get('calculation_time')
+                "calculation_timestamp": timezone.now().isoformat()
             }
             
         except Exception as e:
@@ -649,73 +649,72 @@ class SwapView(APIView):
             logger = logging.getLogger(__name__)
             logger.error(f"Error in dynamic rate calculation: {e}")
             
-            # Fallback to static calculation for reliability
+            # Fall back to the last-known-good rate for reliability
             return self._calculate_swap_fallback(from_currency, to_currency, amount_sent)
     
-    def _calculate_swap_fallback(self, from_currency: str, to_currency: str, amount_sent: float) -> dict:
+    def redeem_swap_quote(self, quote_token: str, user, from_currency: str, to_currency: str, amount_sent) -> dict:
+        """
+        Swap result from a signed quote token (raises QuoteError if it is not valid for the user)
+        """
+        quote = redeem_quote(quote_token, user.pk, from_currency, to_currency, amount_sent)
+        rate_info = quote['rate_info']
+        return {
+            "quote_nonce": quote['nonce'],
+            "converted_amount": quote['converted_amount'],
+            "exchange_rate": quote['exchange_rate'],
+            "rate_type": self.describe_rate(from_currency, to_currency, rate_info) + " (Quoted)",
+            "rate_source": rate_info['source'],
+            "rate_info": rate_info,
+        }
+    
+    @staticmethod
+    def describe_rate(from_currency: str, to_currency: str, rate_info: dict) -> str:
         """
-        Fallback to original static rate calculation if dynamic rates fail
+        Human-readable rate type: source, margin and volume discount
         """
-        # Define exchange rates
-        EXCHANGE_RATES = {
-            'NGN_TO_USD': 1610,  # Divide NGN by 1610 to get USD
-            'USD_TO_NGN': 1550,  # Multiply USD by 1550 to get NGN
-            'UGX_TO_NGN': 2.35,    # Example rate, adjust as needed
-            'NGN_TO_UGX': 2.27,  # Example rate, adjust as needed
+        rate_source = rate_info.get('source', 'unknown')
+        
+        # Build rate type description
+        rate_descriptions = {
+            'database': 'Live Database Rate',
+            'fixer': 'Live Market Rate (Fixer.io)',
+            'exchangerate_api': 'Live Market Rate (ExchangeRate-API)', 
+            'currencyapi': 'Live Market Rate (CurrencyAPI)',
+            'last_known_good': 'Last Known Good Rate'
         }
         
-        # Supported currency pairs
-        SUPPORTED_PAIRS = [
-            ('NGN', 'USD'),
-            ('USD', 'NGN'),
-            ('NGN', 'UGX'),
-            ('UGX', 'NGN'),
-        ]
+        rate_type = f"{from_currency} to {to_currency} - {rate_descriptions.get(rate_source, 'Unknown Source')}"
+        
+        # Add margin and volume discount info if available
+        if 'margin_applied' in rate_info:
+            margin_pct = rate_info['margin_applied'] * 100
+            rate_type += f" (Margin: {margin_pct:.1f}%)"
+        
+        if 'volume_discount' in rate_info and rate_info['volume_discount'] > 0:
+            discount_pct = rate_info['volume_discount'] * 100
+            rate_type += f" (Volume Discount: {discount_pct:.1f}%)"
         
-        # Check if currency pair is supported
-        if (from_currency, to_currency) not in SUPPORTED_PAIRS:
+        return rate_type
+    
+    def _calculate_swap_fallback(self, from_currency: str, to_currency: str, amount_sent) -> dict:
+        """
+        Last-known-good rate for the pair if dynamic pricing fails (served from memory)
+        """
+        rate_info = last_known_good.get(from_currency, to_currency)
+        if rate_info is None:
+            supported = ', '.join(f"{pair_from}→{pair_to}" for pair_from, pair_to in last_known_good.pairs)
             return {
                 "error": f"Currency pair {from_currency} to {to_currency} is not supported. "
-                        "Supported pairs: NGN↔USD, NGN↔UGX"
+                        f"Supported pairs: {supported}"
             }
         
-        # Calculate conversion based on direction
-        if from_currency == 'NGN' and to_currency == 'USD':
-            # NGN to USD: NGN / 1610 = USD
-            rate = EXCHANGE_RATES['NGN_TO_USD']
-            converted_amount = amount_sent / rate
-            exchange_rate = 1 / rate  # Rate per 1 NGN
-            rate_type = "NGN to USD (Static Fallback)"
-
-        elif from_currency == 'UGX' and to_currency == 'NGN':
-            # UGX to NGN: UGX * 2.35 = NGN
-            rate = EXCHANGE_RATES['UGX_TO_NGN']
-            converted_amount = amount_sent * rate
-            exchange_rate = rate  # Rate per 1 UGX
-            rate_type = "UGX to NGN (Static Fallback)"
-            
-        elif from_currency == 'NGN' and to_currency == 'UGX':
-            # NGN to UGX: NGN * 2.27 = UGX
-            rate = EXCHANGE_RATES['NGN_TO_UGX']
-            converted_amount = amount_sent * rate
-            exchange_rate = rate  # Rate per 1 NGN
-            rate_type = "NGN to UGX (Static Fallback)"
-
-        elif from_currency == 'USD' and to_currency == 'NGN':
-            # USD to NGN: USD * 1550 = NGN
-            rate = EXCHANGE_RATES['USD_TO_NGN']
-            converted_amount = amount_sent * rate
-            exchange_rate = rate  # Rate per 1 USD
-            rate_type = "USD to NGN (Static Fallback)"
-            
-        else:
-            return {"error": "Unsupported currency conversion"}
-        
+        exchange_rate = quantize_rate(to_decimal(rate_info['rate']))
         return {
-            "converted_amount": converted_amount,
+            "converted_amount": convert_amount(to_decimal(amount_sent), exchange_rate),
             "exchange_rate": exchange_rate,
-            "rate_type": rate_type,
-            "rate_source": "static_fallback"
+            "rate_type": f"{from_currency} to {to_currency} (Last Known Good Rate)",
+            "rate_source": "last_known_good",
+            "rate_info": rate_info
         }
     
     def get_client_ip(self, request):
@@ -983,6 +982,7 @@ def index(request):
 
 from .models import (
     Transaction, 
+    TransactionStats,
     TransactionStatusHistory, 
     TransactionType, 
     TransactionStatus,
@@ -994,11 +994,15 @@ from .models import (
     SavedBeneficiary
 )
 from django.db import transaction as db_transaction
-from rest_framework.pagination import PageNumberPagination
+from .pagination import KeysetPagination
+from .filters import TransactionSearchFilter
+from .transaction_search import search_terms, transaction_search
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 
-class TransactionPagination(PageNumberPagination):
+class TransactionPagination(KeysetPagination):
+    # Newest first on the (user, -created_at) index, id breaking ties
+    ordering = ('created_at', 'id')
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
@@ -1177,21 +1181,20 @@ class TransactionCreateView(APIView):
     tags=['Transaction Engine'],
     summary='List all transactions',
     description='''
-    Retrieve a paginated list of all transactions for the authenticated user.
-    Supports filtering by transaction_type, status, and date ranges.
+    Retrieve a paginated list of all transactions for the authenticated user, newest first.
+    Supports filtering by transaction_type, status, and date ranges. Pages are
+    cursor-based (follow the next / previous links); add count=true for the total.
     '''
 )
-class TransactionListView(generics.ListAPIView):
+class TransactionListView(ConditionalGetMixin, generics.ListAPIView):
     """List transactions with filtering and pagination"""
     
     serializer_class = TransactionListSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = TransactionPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # Ordering is the pagination cursor's (newest first); ?search= uses the transaction search index
+    filter_backends = [DjangoFilterBackend, TransactionSearchFilter]
     filterset_fields = ['transaction_type', 'status']
-    search_fields = ['transaction_id', 'notes', 'currency_from', 'currency_to']
-    ordering_fields = ['created_at', 'updated_at', 'amount_sent']
-    ordering = ['-created_at']
     
     def get_queryset(self):
         queryset = Transaction.objects.filter(user=self.request.user)
@@ -1206,13 +1209,22 @@ class TransactionListView(generics.ListAPIView):
             queryset = queryset.filter(created_at__date__lte=date_to)
         
         return queryset
+    
+    def get_validators(self, request, *args, **kwargs):
+        # Any change to the user's transactions moves MAX(updated_at) or the count
+        stamp = Transaction.objects.filter(user=request.user).aggregate(
+            count=Count('id'), last_modified=Max('updated_at')
+        )
+        etag = make_etag('transactions', request.user.pk, request.user.email,
+                         stamp['count'], stamp['last_modified'])
+        return etag, stamp['last_modified']
 
 @extend_schema(
     tags=['Transaction Engine'],
     summary='Get transaction details',
     description='Retrieve detailed information about a specific transaction including status history.'
 )
-class TransactionDetailView(generics.RetrieveAPIView):
+class TransactionDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """Get detailed transaction information"""
     
     serializer_class = TransactionSerializer
@@ -1221,6 +1233,17 @@ class TransactionDetailView(generics.RetrieveAPIView):
     
     def get_queryset(self):
         return Transaction.objects.filter(user=self.request.user)
+    
+    def get_validators(self, request, *args, **kwargs):
+        # Status changes save the transaction too (admin bulk actions set updated_at
+        # explicitly), so updated_at covers its history
+        updated_at = self.get_queryset().filter(
+            transaction_id=kwargs[self.lookup_field]
+        ).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return None, None
+        etag = make_etag('transaction', kwargs[self.lookup_field], request.user.email, updated_at)
+        return etag, updated_at
 
 @extend_schema(
     tags=['Transaction Engine'],
@@ -1323,56 +1346,42 @@ class TransactionStatsView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        user = request.user
-        queryset = Transaction.objects.filter(user=user)
+        # Maintained as transactions are written (TransactionStats): one row read
+        stats = TransactionStats.objects.for_user(request.user)
         
-        # Basic stats
-        total_transactions = queryset.count()
-        completed_transactions = queryset.filter(status=TransactionStatus.COMPLETED).count()
-        pending_transactions = queryset.filter(status=TransactionStatus.PENDING).count()
-        failed_transactions = queryset.filter(status=TransactionStatus.FAILED).count()
-        
-        # Amount stats
-        from django.db.models import Sum, Avg
-        total_amount_sent = queryset.aggregate(
-            total=Sum('amount_sent')
-        )['total'] or 0
-        
-        average_transaction_amount = queryset.aggregate(
-            avg=Avg('amount_sent')
-        )['avg'] or 0
+        total_transactions = stats.total_count
+        completed_transactions = stats.status_counts.get(TransactionStatus.COMPLETED, 0)
+        average_transaction_amount = (
+            stats.amount_sent_total / stats.amount_sent_count if stats.amount_sent_count else 0
+        )
         
         # Transaction type breakdown
-        type_breakdown = {}
-        for choice in TransactionType.choices:
-            type_code, type_name = choice
-            count = queryset.filter(transaction_type=type_code).count()
-            type_breakdown[type_code] = {
-                'name': type_name,
-                'count': count
-            }
-        
-        # Recent activity (last 30 days)
-        from datetime import date, timedelta
-        thirty_days_ago = date.today() - timedelta(days=30)
-        recent_transactions = queryset.filter(created_at__date__gte=thirty_days_ago).count()
+        type_breakdown = {
+            type_code: {'name': type_name, 'count': stats.type_counts.get(type_code, 0)}
+            for type_code, type_name in TransactionType.choices
+        }
         
         return Response({
             'total_transactions': total_transactions,
             'completed_transactions': completed_transactions,
-            'pending_transactions': pending_transactions,
-            'failed_transactions': failed_transactions,
+            'pending_transactions': stats.status_counts.get(TransactionStatus.PENDING, 0),
+            'failed_transactions': stats.status_counts.get(TransactionStatus.FAILED, 0),
             'completion_rate': (completed_transactions / total_transactions * 100) if total_transactions > 0 else 0,
-            'total_amount_sent': str(total_amount_sent),
+            'total_amount_sent': str(stats.amount_sent_total),
             'average_transaction_amount': str(round(average_transaction_amount, 2)),
             'transaction_type_breakdown': type_breakdown,
-            'recent_activity_30_days': recent_transactions
+            'recent_activity_30_days': stats.recent_count
         }, status=status.HTTP_200_OK)
 
 @extend_schema(
     tags=['Transaction Engine'],
     summary='Search transactions',
-    description='Advanced search functionality for transactions with multiple criteria.'
+    description='''
+    Advanced search functionality for transactions with multiple criteria.
+    q matches word prefixes of the transaction id, notes, currencies, receiver
+    and beneficiary details (results ranked by relevance); transaction_id
+    matches a transaction id prefix.
+    '''
 )
 class TransactionSearchView(generics.ListAPIView):
     """Advanced transaction search"""
@@ -1386,6 +1395,7 @@ class TransactionSearchView(generics.ListAPIView):
         queryset = Transaction.objects.filter(user=user)
         
         # Search parameters
+        query = self.request.query_params.get('q')
         transaction_id = self.request.query_params.get('transaction_id')
         transaction_type = self.request.query_params.get('transaction_type')
         status_param = self.request.query_params.get('status')
@@ -1396,17 +1406,19 @@ class TransactionSearchView(generics.ListAPIView):
         date_from = self.request.query_params.get('date_from')
         date_to = self.request.query_params.get('date_to')
         
-        # Apply filters
+        # Apply filters (text through the transaction search index)
+        if query:
+            queryset = transaction_search.search(queryset, user.pk, query)
         if transaction_id:
-            queryset = queryset.filter(transaction_id__icontains=transaction_id)
+            queryset = transaction_search.match_reference(queryset, user.pk, transaction_id)
         if transaction_type:
             queryset = queryset.filter(transaction_type=transaction_type)
         if status_param:
             queryset = queryset.filter(status=status_param)
         if currency_from:
-            queryset = queryset.filter(currency_from__icontains=currency_from)
+            queryset = queryset.filter(currency_from=currency_from.upper())
         if currency_to:
-            queryset = queryset.filter(currency_to__icontains=currency_to)
+            queryset = queryset.filter(currency_to=currency_to.upper())
         if amount_min:
             queryset = queryset.filter(amount_sent__gte=amount_min)
         if amount_max:
@@ -1417,4 +1429,10 @@ class TransactionSearchView(generics.ListAPIView):
             queryset = queryset.filter(created_at__date__lte=date_to)
         
         return queryset.order_by('-created_at')
+    
+    def get_pagination_ordering(self):
+        # Best match first when searching by text, newest first otherwise
+        if search_terms(self.request.query_params.get('q')):
+            return ('search_rank', 'id')
+        return TransactionPagination.ordering
 
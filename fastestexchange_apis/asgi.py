@@ -2,6 +2,11 @@
 ASGI config for fastestexchange_apis project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Besides the Django application it serves the live rate stream
+(GET /api/exchange-rates/stream/, see fastest_exchange/rate_stream.py),
+which needs an ASGI server, e.g.:
+
+    gunicorn fastestexchange_apis.asgi:application -k uvicorn.workers.UvicornWorker
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +18,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fastestexchange_apis.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up
+from fastest_exchange.rate_stream import RateStreamApp, rate_stream  # noqa: E402
+
+application = RateStreamApp(django_application, rate_stream)
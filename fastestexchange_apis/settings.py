@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import locale
 import os
+import tempfile
 from datetime import timedelta
 import dj_database_url  
 from django.test.runner import DiscoverRunner 
@@ -268,3 +269,74 @@ QUIDAX_API_KEY = env("QUIDAX_API_KEY", default="")
 QUIDAX_SECRET_KEY = env("QUIDAX_SECRET_KEY", default="")
 QUIDAX_BASE_URL = env("QUIDAX_BASE_URL", default="https://www.quidax.com/api/v1")
 QUIDAX_SANDBOX_MODE = env.bool("QUIDAX_SANDBOX_MODE", default=True)
+# Set when `manage.py ingest_quidax_tickers` runs, so requests read pushed tickers
+QUIDAX_TICKER_INGESTION = env.bool("QUIDAX_TICKER_INGESTION", default=False)
+QUIDAX_TICKER_TTL = env.int("QUIDAX_TICKER_TTL", default=15)
+QUIDAX_TICKER_INTERVAL = env.float("QUIDAX_TICKER_INTERVAL", default=2)
+
+# External rate providers (hedged fan-out in ExchangeRateService)
+EXCHANGE_PROVIDER_HEDGE_DELAY = env.float("EXCHANGE_PROVIDER_HEDGE_DELAY", default=0.3)
+EXCHANGE_PROVIDER_DEADLINE = env.float("EXCHANGE_PROVIDER_DEADLINE", default=5)
+
+# Per-provider circuit breakers (fastest_exchange/circuit_breaker.py)
+PROVIDER_BREAKER_WINDOW = env.int("PROVIDER_BREAKER_WINDOW", default=20)
+PROVIDER_BREAKER_WINDOW_SECONDS = env.float("PROVIDER_BREAKER_WINDOW_SECONDS", default=300)
+PROVIDER_BREAKER_MIN_CALLS = env.int("PROVIDER_BREAKER_MIN_CALLS", default=5)
+PROVIDER_BREAKER_ERROR_RATE = env.float("PROVIDER_BREAKER_ERROR_RATE", default=0.5)
+PROVIDER_BREAKER_CONSECUTIVE_FAILURES = env.int("PROVIDER_BREAKER_CONSECUTIVE_FAILURES", default=3)
+PROVIDER_BREAKER_RESET_TIMEOUT = env.float("PROVIDER_BREAKER_RESET_TIMEOUT", default=30)
+PROVIDER_BREAKER_LATENCY_BUDGET = env.float("PROVIDER_BREAKER_LATENCY_BUDGET", default=1.0)
+
+# Shared outbound HTTP client (fastest_exchange/http_client.py)
+OUTBOUND_HTTP_MAX_CONNECTIONS_PER_HOST = env.int("OUTBOUND_HTTP_MAX_CONNECTIONS_PER_HOST", default=10)
+OUTBOUND_HTTP_RETRIES = env.int("OUTBOUND_HTTP_RETRIES", default=2)
+OUTBOUND_HTTP_BACKOFF = env.float("OUTBOUND_HTTP_BACKOFF", default=0.2)
+
+# Signed conversion quotes accepted by SwapView (fastest_exchange/quote_tokens.py)
+EXCHANGE_QUOTE_TTL = env.int("EXCHANGE_QUOTE_TTL", default=60)
+# Expired redeemed quotes are pruned at most this often (seconds) per process
+EXCHANGE_QUOTE_PRUNE_INTERVAL = env.int("EXCHANGE_QUOTE_PRUNE_INTERVAL", default=300)
+
+# Rate history endpoint (OHLC candles in fastest_exchange.models.RateCandle)
+EXCHANGE_RATE_HISTORY_MAX_POINTS = env.int("EXCHANGE_RATE_HISTORY_MAX_POINTS", default=1000)
+
+# Seconds between checks for changed PricingRule rows (fastest_exchange/pricing.py)
+PRICING_RULES_CHECK_INTERVAL = env.float("PRICING_RULES_CHECK_INTERVAL", default=5)
+
+# Live rate stream served by fastestexchange_apis/asgi.py (fastest_exchange/rate_stream.py)
+RATE_STREAM_HEARTBEAT = env.float("RATE_STREAM_HEARTBEAT", default=15)
+RATE_STREAM_REFRESH_INTERVAL = env.float("RATE_STREAM_REFRESH_INTERVAL", default=2)
+RATE_STREAM_MAX_PAIRS = env.int("RATE_STREAM_MAX_PAIRS", default=20)
+
+# Rate-change emails to subscribed users (fastest_exchange/messaging/fx_rate.py)
+FX_RATE_NOTIFICATION_COOLDOWN = env.int("FX_RATE_NOTIFICATION_COOLDOWN", default=6 * 3600)
+FX_RATE_NOTIFICATION_WORKERS = env.int("FX_RATE_NOTIFICATION_WORKERS", default=4)
+FX_RATE_NOTIFICATION_BATCH_SIZE = env.int("FX_RATE_NOTIFICATION_BATCH_SIZE", default=200)
+
+# Cache-Control max-age (seconds) of the public rate routes; responses also carry ETags
+EXCHANGE_RATE_HTTP_MAX_AGE = env.int("EXCHANGE_RATE_HTTP_MAX_AGE", default=5)
+EXCHANGE_PAIRS_HTTP_MAX_AGE = env.int("EXCHANGE_PAIRS_HTTP_MAX_AGE", default=300)
+QUIDAX_MARKETS_HTTP_MAX_AGE = env.int("QUIDAX_MARKETS_HTTP_MAX_AGE", default=60)
+
+# Supported pairs registry (fastest_exchange/pair_registry.py)
+PAIR_REGISTRY_CHECK_INTERVAL = env.float("PAIR_REGISTRY_CHECK_INTERVAL", default=5)
+# Advertised amount limits per pair, e.g. {"USD_NGN": (10, 50000)}
+EXCHANGE_PAIR_AMOUNT_LIMITS = {}
+
+# Rates shared by the worker processes of a host (fastest_exchange/shared_snapshot.py); empty disables it
+RATE_SHARED_SNAPSHOT_PATH = env("RATE_SHARED_SNAPSHOT_PATH", default=os.path.join(tempfile.gettempdir(), "fastest_exchange", "rate_snapshot.json"))
+RATE_SHARED_SNAPSHOT_POLL = env.float("RATE_SHARED_SNAPSHOT_POLL", default=1)
+# Warm the rate snapshot in the background when a server worker starts (fastest_exchange/apps.py)
+RATE_WARMUP_ON_START = env.bool("RATE_WARMUP_ON_START", default=True)
+
+# Degraded-mode rates, rewritten on every successful refresh (fastest_exchange/last_known_good.py); empty keeps them in memory
+EXCHANGE_LAST_KNOWN_GOOD_PATH = env("EXCHANGE_LAST_KNOWN_GOOD_PATH", default=str(BASE_DIR / "var" / "last_known_good_rates.json"))
+# Bootstrap rates (units of the second currency per first) until a pair has been quoted on this host
+EXCHANGE_SEED_RATES = {
+    "NGN_USD": 1 / 1610,
+    "USD_NGN": 1550,
+    "UGX_NGN": 2.35,
+    "NGN_UGX": 2.27,
+    "USD_UGX": 3700,
+    "UGX_USD": 1 / 3800,
+}